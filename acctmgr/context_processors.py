@@ -1,6 +1,16 @@
+import functools
 from django.http import HttpRequest, HttpResponse
-from .models import Account
+from ledger.models import LedgerVersion
+from . import sidebar
 
 
 def account_context(request: HttpRequest) -> HttpResponse:
-    return {"accounts": Account.objects.get_accounts()}
+    # Rendered, or read from the cache, only by the templates showing it. The
+    # account pages have read the tree's version already, to answer
+    # conditional requests.
+    versions = getattr(request, "ledger_versions", {})
+    return {
+        "account_sidebar": functools.partial(
+            sidebar.render, versions.get(LedgerVersion.ACCOUNTS)
+        )
+    }
@@ -13,3 +13,9 @@ class AccountCreateForm(forms.ModelForm):
             "parent",
             "placeholder",
         ]
+
+
+class AccountMergeForm(forms.Form):
+    target = forms.ModelChoiceField(
+        Account.objects.select_related("currency"), label="Merge into"
+    )
@@ -0,0 +1,61 @@
+from django.db import transaction
+
+from budgetmgr.models import BudgetLine
+from ledger.models import (
+    AccountSnapshot,
+    ArchivedTransactionEntry,
+    Change,
+    ChangeKind,
+    ClosedPeriod,
+    LedgerVersion,
+    TransactionEntry,
+)
+from ledger.recategorize import check_compatible, move_entries
+from ledger.retry import retry_on_contention
+from schedulemgr.models import RecurringSplit
+from .models import Account
+
+
+@retry_on_contention
+@transaction.atomic
+def merge_accounts(source: Account, target: Account) -> dict:
+    """Merge the source account into the target and delete it
+
+    Its entries and scheduled splits move to the target and its children are
+    reparented under it, each with one UPDATE. Its budget line moves too,
+    unless the target already has one.
+
+    Returns:
+    {"entries": int, "splits": int, "children": int}
+
+    Raises:
+    ValueError -- The accounts are incompatible, the target is inside the
+    source's subtree, or the source has closed history
+    """
+    has_entries = TransactionEntry.objects.filter(account=source).exists()
+    check_compatible(source.pk, target.pk, placeholder=not has_entries)
+    if target.pk in Account.objects.get_subtree_ids([source.pk])[source.pk]:
+        raise ValueError("An account can't be merged into its own descendant.")
+    closed_through = ClosedPeriod.objects.closed_through()
+    if (
+        AccountSnapshot.objects.filter(account=source).exists()
+        or ArchivedTransactionEntry.objects.filter(account=source).exists()
+        or (
+            closed_through is not None
+            and TransactionEntry.objects.filter(
+                account=source, transaction_id__xact_date__lte=closed_through
+            ).exists()
+        )
+    ):
+        raise ValueError(f"{source} has entries in a closed period.")
+
+    entries = move_entries(source, target) if has_entries else 0
+    splits = RecurringSplit.objects.filter(account=source).update(account=target)
+    if not BudgetLine.objects.filter(account=target).exists():
+        BudgetLine.objects.filter(account=source).update(account=target)
+    children = Account.objects.filter(parent=source)
+    Change.objects.record(ChangeKind.UPDATE, children)
+    children = children.update(parent=target)
+    LedgerVersion.objects.bump(LedgerVersion.ACCOUNTS, source.pk, target.pk)
+    source.delete()
+    return {"entries": entries, "splits": splits, "children": children}
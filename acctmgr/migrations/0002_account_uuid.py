@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:05
+
+import uuid
+from django.db import migrations, models
+
+
+def populate(apps, schema_editor):
+    connection = schema_editor.connection
+    random_uuid = (
+        "gen_random_uuid()"
+        if connection.vendor == "postgresql"
+        else "lower(hex(randomblob(16)))"
+    )
+    table = apps.get_model("acctmgr", "Account")._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"UPDATE {table} SET uuid = {random_uuid}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("acctmgr", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="uuid",
+            field=models.UUIDField(null=True),
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="account",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
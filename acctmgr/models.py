@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from functools import reduce
 import operator
+import uuid
 from currencymgr.models import Currency
 
 
@@ -14,32 +15,58 @@ class AccountTypes(models.TextChoices):
 
 
 class AccountManager(models.Manager):
-    def _build_account_tree(self, account: "Account"):
-        children = account.account_set.all()
-        if len(children) == 0:
-            return {account: []}
-
-        return {account: [self._build_account_tree(account) for account in children]}
+    def _build_account_tree(self, account: "Account", children: dict):
+        return {
+            account: [
+                self._build_account_tree(child, children)
+                for child in children.get(account.pk, [])
+            ]
+        }
 
     def get_accounts(self) -> dict:
         """Get a list of accounts structured
 
+        All accounts are loaded with one query and the trees built in memory.
+
         Returns:
         {"asset": QuerySet, "liability": QuerySet, "equity": QuerySet, "revenue": QuerySet, "expense": QuerySet}
         """
+        children: dict[int | None, list[Account]] = {}
+        for account in self.order_by("pk"):
+            children.setdefault(account.parent_id, []).append(account)
         types = [
             {
                 acct_type: [
-                    self._build_account_tree(account)
-                    for account in self.get_accounts_by_type(acct_type).filter(
-                        parent=None
-                    )
+                    self._build_account_tree(account, children)
+                    for account in children.get(None, [])
+                    if account.acct_type == acct_type
                 ]
             }
             for acct_type in AccountTypes
         ]
         return dict(reduce(operator.or_, types, {}))
 
+    def get_subtree_ids(self, account_ids) -> dict[int, set[int]]:
+        """Map each account id to the ids of itself and all of its descendants
+
+        The whole hierarchy is loaded with a single query of (id, parent) pairs
+        so the cost doesn't depend on the depth of the tree or number of roots.
+        """
+        children: dict[int, list[int]] = {}
+        for pk, parent_id in self.values_list("pk", "parent_id"):
+            children.setdefault(parent_id, []).append(pk)
+
+        subtrees = {}
+        for account_id in account_ids:
+            subtree = set()
+            pending = [account_id]
+            while pending:
+                current = pending.pop()
+                subtree.add(current)
+                pending.extend(children.get(current, []))
+            subtrees[account_id] = subtree
+        return subtrees
+
 
 class AccountQuerySet(models.QuerySet):
     def get_accounts_by_type(self, account_type: AccountTypes) -> models.QuerySet:
@@ -60,6 +87,8 @@ class Account(models.Model):
         "Account", blank=True, null=True, on_delete=models.CASCADE
     )
     placeholder = models.BooleanField(default=False)
+    # The same on every instance the ledger is synced to
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     objects = AccountManager.from_queryset(AccountQuerySet)()
 
     def __str__(self):
@@ -76,6 +105,9 @@ class Account(models.Model):
         self.validate_no_cycle()
         super().clean(*args, **kwargs)
 
+    # With the change log and versions the signals write
+    @transaction.atomic
     def save(self, *args, **kwargs):
-        self.full_clean()
+        # The uuid is generated, and unique by the database's constraint
+        self.full_clean(exclude=["uuid"])
         super().save(*args, **kwargs)
@@ -0,0 +1,81 @@
+from typing import NamedTuple
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.safestring import SafeString
+
+from ledger.models import LedgerVersion
+from .models import Account, AccountTypes
+
+# Under the version of LedgerVersion.ACCOUNTS it was rendered at
+SIDEBAR_CACHE_KEY = "acctmgr:sidebar:{}"
+
+
+class SidebarNode(NamedTuple):
+    depth: int
+    name: str
+    # The account page, or None for an account type
+    url: str | None
+    # Whether the node opens a collapsible group of its children
+    opens: bool
+    # How many groups close after the node
+    closes: int
+
+    @property
+    def closing(self) -> range:
+        return range(self.closes)
+
+
+def nodes() -> list[SidebarNode]:
+    """The account tree flattened in display order, under a node per
+    account type, from one query"""
+    children: dict[int | None, list[tuple[int, str, str]]] = {}
+    for pk, name, parent_id, acct_type in Account.objects.order_by("pk").values_list(
+        "pk", "name", "parent_id", "acct_type"
+    ):
+        children.setdefault(parent_id, []).append((pk, name, acct_type))
+    # Every account page's URL differs only by its trailing id
+    url = reverse("acctmgr:account-view", args=[0]).removesuffix("0") + "{}"
+
+    flat: list[SidebarNode] = []
+    for acct_type in AccountTypes:
+        flat.append(SidebarNode(0, acct_type.upper(), None, True, 0))
+        # (account, depth) still to visit, next on top
+        pending = [
+            (account, 1)
+            for account in reversed(children.get(None, []))
+            if account[2] == acct_type
+        ]
+        while pending:
+            (pk, name, _), depth = pending.pop()
+            has_children = pk in children
+            flat.append(SidebarNode(depth, name, url.format(pk), has_children, 0))
+            if has_children:
+                pending.extend((child, depth + 1) for child in reversed(children[pk]))
+            else:
+                # Close the groups between this node and the next one
+                next_depth = pending[-1][1] if pending else 1
+                flat[-1] = flat[-1]._replace(closes=depth - next_depth)
+        # and the account type's own group
+        last = flat[-1]
+        flat[-1] = last._replace(closes=last.closes + 1)
+    return flat
+
+
+def render(version: int | None = None) -> SafeString:
+    """The sidebar's account tree as HTML, cached until the tree changes
+
+    Cached under the version of LedgerVersion.ACCOUNTS, which every process
+    reads from the database, so a write in one is seen by all. Pass the
+    version if it was already read, to skip the query.
+    """
+    # Read before the tree, so a tree changing meanwhile is cached under a
+    # version that is already out of date
+    if version is None:
+        [(version, _)] = LedgerVersion.objects.current([LedgerVersion.ACCOUNTS])
+    key = SIDEBAR_CACHE_KEY.format(version)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string("acctmgr/sidebar.html", {"nodes": nodes()})
+        cache.set(key, html, None)
+    return SafeString(html)
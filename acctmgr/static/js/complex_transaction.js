@@ -63,10 +63,20 @@ $(document).ready(function() {
     }
   });
 
-  // Watch for input in any amount field
-  for (let i = 1; i <= totalSections; i++) {
-    $(`#id_amount_${i}`).on('input', function() {
-      showNextSectionIfNeeded();
-    });
-  }
+  // Watch for input in any amount field, including those of a swapped in form
+  $(document).on('input', '[id^="id_amount_"]', function() {
+    showNextSectionIfNeeded();
+  });
+
+  // A fresh or emptied form starts out simple
+  $(document).on('register:updated', function(event, update) {
+    if (update.emptied) {
+      $(`#id_memo_1`).attr('hidden', true)
+      $(`#id_transaction_group_1`).addClass('inline')
+      for (let i = 2; i <= totalSections; i++) {
+        hideSection(i);
+      }
+    }
+    show_complex = false;
+  });
 });
@@ -0,0 +1,41 @@
+$(document).ready(function() {
+  let latest = [];
+  let pending = null;
+
+  function prefill(splits) {
+    if (splits.length > 1 && $('#id_amount_2').is('[hidden]')) {
+      $('#show-complex').trigger('click');
+    }
+    splits.forEach((split, i) => {
+      const index = i + 1;
+      $(`#id_memo_${index}`).val(split.memo).removeAttr('hidden');
+      $(`#id_account_${index}`).val(split.account).removeAttr('hidden');
+      $(`#id_amount_${index}`).val(split.amount).removeAttr('hidden');
+    });
+  }
+
+  // Delegated, as the form is swapped out after each partial submit
+  $(document).on('input', '#id_description', function() {
+    const description = $(this);
+    const query = description.val();
+    const chosen = latest.find((suggestion) => suggestion.description === query);
+    // Picking a suggestion prefills the splits of a new transaction
+    if (chosen && !$('#id_selected_transaction').val() && !$('#id_amount_1').val()) {
+      $.getJSON(description.data('splits-url'), {transaction: chosen.transaction}, function(data) {
+        prefill(data.splits);
+      });
+      return;
+    }
+    if (pending) {
+      pending.abort();
+    }
+    pending = $.getJSON(description.data('autocomplete-url'), {q: query}, function(data) {
+      latest = data.suggestions;
+      const suggestions = $('#description-suggestions');
+      suggestions.empty();
+      latest.forEach((suggestion) => {
+        suggestions.append($('<option>').val(suggestion.description));
+      });
+    });
+  });
+});
@@ -0,0 +1,65 @@
+$(document).ready(function() {
+  const register = $('#register');
+
+  // Put the changed transaction's rows where the register's date order has them
+  function updateRows(update) {
+    register.children(`[data-transaction="${update.data('transaction')}"]`).remove();
+    update.children().each(function() {
+      const row = $(this);
+      const later = register.children().filter(function() {
+        return $(this).data('date') > row.data('date');
+      }).first();
+      if (later.length) {
+        row.insertBefore(later);
+      } else {
+        register.append(row);
+      }
+    });
+    $('#cleared-balance').replaceWith(update.siblings('#cleared-balance'));
+    // Like the redirect would, leave the transaction being edited
+    $('#transaction-delete-form').remove();
+    history.replaceState(null, '', update.data('account-url'));
+  }
+
+  // Empty the transaction form for the next one, keeping its account and date
+  function resetForm() {
+    $('#transaction-form-fields')
+      .find('input, select')
+      .not('[name="selected_account"], [name="date"]')
+      .val('');
+  }
+
+  function apply(html) {
+    const response = $('<div>').html(html);
+    const update = response.children('#register-update');
+    if (update.length) {
+      updateRows(update);
+    }
+    const fields = response.children('#transaction-form-fields');
+    if (fields.length) {
+      // The form with its errors
+      $('#transaction-form-fields').replaceWith(fields);
+    } else {
+      resetForm();
+    }
+    $(document).trigger('register:updated', [{emptied: !fields.length}]);
+  }
+
+  $(document).on('submit', 'form[data-partial]', function(event) {
+    event.preventDefault();
+    const form = this;
+    $.ajax({
+      url: $(form).attr('action'),
+      method: 'POST',
+      data: $(form).serialize(),
+      headers: {'X-Partial': 'register'},
+    }).done(apply).fail(function(xhr) {
+      if (xhr.status === 400 && xhr.responseText) {
+        apply(xhr.responseText);
+      } else {
+        // Fall back to the whole page
+        form.submit();
+      }
+    });
+  });
+});
@@ -1,4 +1,6 @@
 import pytest
+import decimal
+from datetime import date
 from functools import reduce
 import operator
 from django.core.exceptions import ValidationError
@@ -7,6 +9,12 @@ from django.test import Client
 from django.shortcuts import reverse
 from pytest_django.asserts import assertRedirects
 
+from budgetmgr.models import BudgetLine
+from ledger.models import LedgerVersion, TransactionEntry
+from ledger.tests import post_searchable_transaction
+from schedulemgr.models import RecurringSplit, RecurringTransaction
+from . import sidebar
+from .merge import merge_accounts
 from .models import Currency, Account, AccountTypes
 
 
@@ -74,6 +82,62 @@ def test_get_account_listing(setup_example_accounts):
         validate_child(account)
 
 
+@pytest.mark.django_db
+def test_sidebar(setup_example_accounts, django_assert_num_queries):
+    bank = Account.objects.get(name="Example Bank 1")
+    Account(
+        name="Joint",
+        currency=bank.currency,
+        acct_type=AccountTypes.ASSET,
+        description="Joint Account",
+        parent=bank,
+    ).save()
+    joint = Account.objects.get(name="Joint")
+    assert [
+        (node.depth, node.name, node.opens, node.closes) for node in sidebar.nodes()
+    ] == [
+        (0, "ASSET", True, 0),
+        (1, "Bank Accounts", True, 0),
+        (2, "Example Bank 1", True, 0),
+        (3, "Joint", False, 1),
+        (2, "Example Bank 2", False, 2),
+        (0, "LIABILITY", True, 0),
+        (1, "Student Loans", True, 0),
+        (2, "Loan A", False, 0),
+        (2, "Loan B", False, 2),
+        (0, "EQUITY", True, 0),
+        (1, "Opening Balances", False, 1),
+        (0, "REVENUE", True, 0),
+        (1, "Salary", False, 0),
+        (1, "Other Income", False, 1),
+        (0, "EXPENSE", True, 0),
+        (1, "Dining", False, 1),
+    ]
+
+    html = sidebar.render()
+    assert html.count("<div") == html.count("</div>")
+    assert f'href="{reverse("acctmgr:account-view", args=[joint.pk])}"' in html
+    # Only the tree's version is read, and not even that when it is known
+    with django_assert_num_queries(1):
+        assert sidebar.render() == html
+    [(version, _)] = LedgerVersion.objects.current([LedgerVersion.ACCOUNTS])
+    with django_assert_num_queries(0):
+        assert sidebar.render(version) == html
+
+    # Any change to the tree is rendered afresh
+    joint.name = "Shared"
+    joint.save()
+    assert "Shared" in sidebar.render()
+    # as is one made by another process, which only shares the database
+    Account.objects.filter(pk=joint.pk).update(name="Elsewhere")
+    LedgerVersion.objects.bump(LedgerVersion.ACCOUNTS)
+    assert "Elsewhere" in sidebar.render()
+    joint.delete()
+    assert "Shared" not in sidebar.render()
+    res = Client().get(reverse("acctmgr:account-index"))
+    assert "Example Bank 2" in res.content.decode()
+
+
 @pytest.mark.django_db
 def test_cycles_not_allowed(setup_example_accounts):
     savings_account = Account.objects.get(description__contains="Savings Account")
@@ -152,3 +216,73 @@ def test_account_delete_success(setup_example_accounts):
     assertRedirects(res, reverse("acctmgr:account-index"))
     with pytest.raises(Currency.DoesNotExist):
         Currency.objects.get(pk=2)
+
+
+@pytest.mark.django_db
+def test_merge_accounts(setup_example_accounts):
+    dining = Account.objects.get(name="Dining")
+    bank = Account.objects.get(name="Example Bank 1")
+    food = Account.objects.create(
+        name="Food",
+        currency=dining.currency,
+        acct_type=AccountTypes.EXPENSE,
+        description="Food",
+    )
+    takeout = Account.objects.create(
+        name="Takeout",
+        currency=dining.currency,
+        acct_type=AccountTypes.EXPENSE,
+        description="Food",
+        parent=dining,
+    )
+    post_searchable_transaction(date(2025, 1, 2), "Cafe", decimal.Decimal(3))
+    BudgetLine.objects.create(account=dining, amount=100)
+    recurring = RecurringTransaction.objects.create(
+        description="Lunch", frequency="monthly", start_date=date(2025, 1, 1)
+    )
+    RecurringSplit.objects.create(recurring=recurring, account=dining, amount=10)
+    RecurringSplit.objects.create(recurring=recurring, account=bank, amount=-10)
+
+    with pytest.raises(ValueError, match="descendant"):
+        merge_accounts(dining, takeout)
+    assert merge_accounts(dining, food) == {"entries": 1, "splits": 1, "children": 1}
+    assert not Account.objects.filter(name="Dining").exists()
+    takeout.refresh_from_db()
+    assert takeout.parent == food
+    assert TransactionEntry.objects.filter(account=food).count() == 1
+    assert BudgetLine.objects.get().account == food
+    assert set(recurring.splits.values_list("account__name", flat=True)) == {
+        "Food",
+        "Example Bank 1",
+    }
+
+
+@pytest.mark.django_db
+def test_account_delete_with_entries_offers_merge(setup_example_accounts):
+    dining = Account.objects.get(name="Dining")
+    post_searchable_transaction(date(2025, 1, 2), "Cafe", decimal.Decimal(3))
+    client = Client()
+    res = client.get(reverse("acctmgr:account-delete", args=[dining.pk]))
+    assertRedirects(res, reverse("acctmgr:account-merge", args=[dining.pk]))
+
+    url = reverse("acctmgr:account-merge", args=[dining.pk])
+    placeholder = Account.objects.get(name="Bank Accounts")
+    res = client.post(url, {"target": placeholder.pk})
+    assert res.context["account_merge_form"].errors["target"] == [
+        "Entries can't move to a placeholder account."
+    ]
+    euro = Account.objects.create(
+        name="Euro",
+        currency=Currency.objects.create(full_name="Euro", symbol="EUR"),
+        acct_type="asset",
+        description="Euro Account",
+    )
+    res = client.post(url, {"target": euro.pk})
+    assert "currency" in res.context["account_merge_form"].errors["target"][0]
+    res = client.post(url, {"target": ""})
+    assert res.context["account_merge_form"].errors["target"]
+    assert TransactionEntry.objects.filter(account=dining).count() == 1
+    bank = Account.objects.get(name="Example Bank 2")
+    res = client.post(url, {"target": bank.pk})
+    assertRedirects(res, reverse("acctmgr:account-view", args=[bank.pk]))
+    assert TransactionEntry.objects.filter(account=bank).count() == 1
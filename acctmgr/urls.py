@@ -15,4 +15,5 @@ urlpatterns = [
         r"^account-editor/(?P<pk>[0-9]+)?$", views.account_editor, name="account-editor"
     ),
     path("account-editor/<int:pk>/delete", views.account_delete, name="account-delete"),
+    path("account-editor/<int:pk>/merge", views.account_merge, name="account-merge"),
 ]
@@ -1,19 +1,31 @@
 from django.shortcuts import render, get_object_or_404, reverse
 from django.http import HttpRequest, HttpResponseRedirect
-from django.db.models import QuerySet
+from django.db.models import QuerySet, RestrictedError
 import decimal
 
+from .merge import merge_accounts
 from .models import Account
-from ledger.models import TransactionDetail, TransactionEntry
-from ledger.forms import TransactionCreateForm, TransactionDeleteForm
+from ledger.models import (
+    AccountSnapshot,
+    ClosedPeriod,
+    TransactionDetail,
+    TransactionEntry,
+)
+from ledger.conditional import account_scopes, versioned
+from ledger.forms import MoveEntriesForm, TransactionCreateForm, TransactionDeleteForm
 import acctmgr.forms
+from privatefinance.routers import replica_reads
 
 
+@replica_reads
+@versioned(lambda request, pk=None, transaction_pk=None: account_scopes(pk))
 def index(request: HttpRequest, pk=None, transaction_pk=None):
     context = {}
     if pk is not None:
         transaction_form_initial = {"selected_account": pk}
-        selected_account = get_object_or_404(Account, pk=pk)
+        selected_account = get_object_or_404(
+            Account.objects.select_related("currency", "cleared_balance"), pk=pk
+        )
         if transaction_pk is not None:
             transaction_to_edit = get_object_or_404(
                 TransactionDetail, pk=transaction_pk
@@ -26,7 +38,9 @@ def index(request: HttpRequest, pk=None, transaction_pk=None):
                 }
             )
             transaction_entries: QuerySet = (
-                transaction_to_edit.transactionentry_set.all().order_by("pk")
+                transaction_to_edit.transactionentry_set.select_related(
+                    "account__currency"
+                ).order_by("pk")
             )
             if (
                 len(transaction_entries) == 2
@@ -58,8 +72,23 @@ def index(request: HttpRequest, pk=None, transaction_pk=None):
             initial=transaction_form_initial
         )
         context["selected_account"] = selected_account
-        context["transaction_entries"] = TransactionEntry.objects.filter(
-            account=selected_account
+        transaction_entries = TransactionEntry.objects.filter(account=selected_account)
+        # Closed history is summarized by the snapshot rather than listed
+        if (closed_through := ClosedPeriod.objects.closed_through()) is not None:
+            transaction_entries = transaction_entries.filter(
+                transaction_id__xact_date__gt=closed_through
+            )
+            context["opening_balance"] = (
+                AccountSnapshot.objects.filter(
+                    period__end_date=closed_through, account=selected_account
+                )
+                .values_list("balance", flat=True)
+                .first()
+            ) or decimal.Decimal(0)
+            context["closed_through"] = closed_through
+        # The register shows each entry's transaction and currency
+        context["transaction_entries"] = transaction_entries.select_related(
+            "transaction_id", "account__currency"
         ).order_by("transaction_id__xact_date")
     return render(request, "acctmgr/account_list.html", context)
 
@@ -90,5 +119,32 @@ def account_editor(request: HttpRequest, pk=None):
 
 def account_delete(request: HttpRequest, pk: int):
     account: Account = get_object_or_404(Account, pk=pk)
-    account.delete()
+    try:
+        account.delete()
+    except RestrictedError:
+        # It still has entries, which have to be merged into another account
+        return HttpResponseRedirect(reverse("acctmgr:account-merge", args=[pk]))
     return HttpResponseRedirect(reverse("acctmgr:account-index"))
+
+
+def account_merge(request: HttpRequest, pk: int):
+    account: Account = get_object_or_404(Account, pk=pk)
+    if request.method == "POST":
+        form = acctmgr.forms.AccountMergeForm(request.POST)
+        if form.is_valid():
+            target = form.cleaned_data["target"]
+            try:
+                merge_accounts(account, target)
+                return HttpResponseRedirect(
+                    reverse("acctmgr:account-view", args=[target.pk])
+                )
+            except ValueError as e:
+                form.add_error("target", str(e))
+    else:
+        form = acctmgr.forms.AccountMergeForm()
+    context = {
+        "account": account,
+        "account_merge_form": form,
+        "move_entries_form": MoveEntriesForm(),
+    }
+    return render(request, "acctmgr/account_merge.html", context)
@@ -0,0 +1,15 @@
+from django import forms
+from acctmgr.models import Account, AccountTypes
+from .models import BudgetLine
+
+
+class BudgetLineForm(forms.ModelForm):
+    class Meta:
+        model = BudgetLine
+        fields = ["account", "amount"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["account"].queryset = Account.objects.filter(
+            acct_type__in=[AccountTypes.EXPENSE, AccountTypes.REVENUE]
+        )
@@ -0,0 +1,124 @@
+from django.db import models, transaction
+from django.db.models import Q, Sum
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from datetime import date
+import decimal
+
+from acctmgr.models import Account, AccountTypes
+from ledger.models import LedgerVersion, MonthlyRollup, month_start
+from privatefinance.routers import primary_reads
+
+# Under the ledger's version and the date it was computed at
+REPORT_CACHE_KEY = "budgetmgr:report:{}:{}"
+# Reports of versions moved past are left to expire
+REPORT_CACHE_SECONDS = 24 * 60 * 60
+
+
+class BudgetLineManager(models.Manager):
+    def _compute_report(self, today: date) -> list[dict]:
+        lines = list(self.select_related("account__currency").order_by("account__name"))
+        if not lines:
+            return []
+        subtrees = Account.objects.get_subtree_ids([line.account_id for line in lines])
+
+        current_month = month_start(today)
+        zero = decimal.Decimal(0)
+        actuals = {
+            cell["account_id"]: cell
+            for cell in MonthlyRollup.objects.filter(
+                account_id__in=set().union(*subtrees.values())
+            )
+            .between(today.replace(month=1), today)
+            .values("account_id")
+            .annotate(
+                month_debit=Sum("debit", filter=Q(month=current_month)),
+                month_credit=Sum("credit", filter=Q(month=current_month)),
+                ytd_debit=Sum("debit"),
+                ytd_credit=Sum("credit"),
+            )
+        }
+
+        report = []
+        for line in lines:
+            month_net = ytd_net = zero
+            for account_id in subtrees[line.account_id]:
+                cell = actuals.get(account_id)
+                if cell is None:
+                    continue
+                month_net += (cell["month_debit"] or zero) - (
+                    cell["month_credit"] or zero
+                )
+                ytd_net += cell["ytd_debit"] - cell["ytd_credit"]
+            # Revenue is credited, so flip the sign to report it as a positive
+            if line.account.acct_type == AccountTypes.REVENUE:
+                month_net, ytd_net = -month_net, -ytd_net
+            ytd_budget = line.amount * today.month
+            report.append(
+                {
+                    "line": line,
+                    "account": line.account,
+                    "month_budget": line.amount,
+                    "month_actual": month_net,
+                    "month_remaining": line.amount - month_net,
+                    "ytd_budget": ytd_budget,
+                    "ytd_actual": ytd_net,
+                    "ytd_remaining": ytd_budget - ytd_net,
+                }
+            )
+        return report
+
+    def report(
+        self, today: date | None = None, version: int | None = None
+    ) -> list[dict]:
+        """Budget vs actual for every budgeted account and its descendants
+
+        Runs a constant number of queries no matter how many accounts are
+        budgeted, and the result is cached under the ledger's version, which
+        every write to the ledger, the account tree or a budget moves on when
+        it commits. Pass the version if it was already read, to skip the query.
+        """
+        today = today or date.today()
+        with primary_reads():
+            # Read before the report, so one computed as a write commits is
+            # cached under a version already out of date
+            if version is None:
+                [(version, _)] = LedgerVersion.objects.current([LedgerVersion.LEDGER])
+            key = REPORT_CACHE_KEY.format(version, today.isoformat())
+            report = cache.get(key)
+            if report is None:
+                report = self._compute_report(today)
+                cache.set(key, report, REPORT_CACHE_SECONDS)
+        return report
+
+
+class BudgetLine(models.Model):
+    """A monthly budget for an expense or revenue account and its children"""
+
+    account = models.OneToOneField(Account, on_delete=models.CASCADE)
+    # Budgeted amount per month, in the account currency
+    amount = models.DecimalField(decimal_places=10, max_digits=19)
+    objects = BudgetLineManager()
+
+    def __str__(self):
+        return f"{self.account} {self.amount}"
+
+    def clean(self, *args, **kwargs):
+        if self.account_id is not None and self.account.acct_type not in (
+            AccountTypes.EXPENSE,
+            AccountTypes.REVENUE,
+        ):
+            raise ValidationError("Only expense and revenue accounts can be budgeted.")
+        super().clean(*args, **kwargs)
+
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        self.full_clean()
+        super().save(*args, **kwargs)
+        LedgerVersion.objects.bump()
+
+    @transaction.atomic
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        LedgerVersion.objects.bump()
+        return result
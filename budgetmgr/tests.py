@@ -0,0 +1,228 @@
+import pytest
+import decimal
+from asgiref.sync import async_to_sync
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import reverse
+from pytest_django.asserts import assertRedirects
+
+from acctmgr.models import Account, AccountTypes
+from ledger.forms import TransactionCreateForm
+from ledger.models import LedgerVersion
+from privatefinance import routers
+from .models import BudgetLine
+
+
+def post_transaction(xact_date, amount, account_name, other="Example Bank 1"):
+    form = TransactionCreateForm(
+        {
+            "date": xact_date,
+            "description": "A budgeted transaction",
+            "amount_1": amount,
+            "account_1": Account.objects.get(name=account_name),
+            "amount_2": -amount,
+            "account_2": Account.objects.get(name=other),
+        }
+    )
+    assert form.is_valid(), form.errors
+    form.save()
+
+
+@pytest.mark.django_db
+def test_budget_only_for_expense_and_revenue(setup_example_accounts):
+    with pytest.raises(ValidationError):
+        BudgetLine.objects.create(
+            account=Account.objects.get(name="Example Bank 1"), amount=100
+        )
+
+
+@pytest.mark.django_db
+def test_budget_report_actuals(setup_example_accounts):
+    dining = Account.objects.get(name="Dining")
+    BudgetLine.objects.create(account=dining, amount=decimal.Decimal("100.00"))
+    BudgetLine.objects.create(
+        account=Account.objects.get(name="Salary"), amount=decimal.Decimal("1000.00")
+    )
+    post_transaction(date(2025, 1, 10), decimal.Decimal("30.00"), "Dining")
+    post_transaction(date(2025, 3, 2), decimal.Decimal("20.00"), "Dining")
+    post_transaction(date(2024, 12, 2), decimal.Decimal("99.00"), "Dining")
+    post_transaction(date(2025, 3, 1), decimal.Decimal("-900.00"), "Salary")
+
+    report = {
+        row["account"].name: row
+        for row in BudgetLine.objects.report(today=date(2025, 3, 15))
+    }
+    assert report["Dining"]["month_actual"] == decimal.Decimal("20.00")
+    assert report["Dining"]["ytd_actual"] == decimal.Decimal("50.00")
+    assert report["Dining"]["ytd_budget"] == decimal.Decimal("300.00")
+    assert report["Dining"]["month_remaining"] == decimal.Decimal("80.00")
+    assert report["Salary"]["month_actual"] == decimal.Decimal("900.00")
+
+
+@pytest.mark.django_db
+def test_budget_report_includes_descendants(setup_example_accounts):
+    dining = Account.objects.get(name="Dining")
+    Account.objects.create(
+        name="Restaurants",
+        currency=dining.currency,
+        acct_type=AccountTypes.EXPENSE,
+        description="Eating Out",
+        parent=dining,
+    )
+    BudgetLine.objects.create(account=dining, amount=decimal.Decimal("100.00"))
+    post_transaction(date(2025, 3, 2), decimal.Decimal("12.00"), "Restaurants")
+    (row,) = BudgetLine.objects.report(today=date(2025, 3, 15))
+    assert row["month_actual"] == decimal.Decimal("12.00")
+
+
+@pytest.mark.django_db
+def test_budget_report_constant_queries(setup_example_accounts):
+    usd = Account.objects.get(name="Dining").currency
+    for i in range(10):
+        account = Account.objects.create(
+            name=f"Expense {i}",
+            currency=usd,
+            acct_type=AccountTypes.EXPENSE,
+            description="An expense",
+        )
+        BudgetLine.objects.create(account=account, amount=10)
+        post_transaction(date(2025, 3, 2), decimal.Decimal("1.00"), account.name)
+    with CaptureQueriesContext(connection) as queries:
+        BudgetLine.objects.report(today=date(2025, 3, 15))
+    # The ledger's version and the report's three
+    assert len(queries) == 4
+
+
+@pytest.mark.django_db
+def test_budget_report_cached_until_ledger_write(setup_example_accounts):
+    BudgetLine.objects.create(
+        account=Account.objects.get(name="Dining"), amount=decimal.Decimal("100.00")
+    )
+    today = date(2025, 3, 15)
+    BudgetLine.objects.report(today=today)
+    with CaptureQueriesContext(connection) as queries:
+        BudgetLine.objects.report(today=today)
+    assert len(queries) == 1
+
+    post_transaction(date(2025, 3, 2), decimal.Decimal("12.00"), "Dining")
+    (row,) = BudgetLine.objects.report(today=today)
+    assert row["month_actual"] == decimal.Decimal("12.00")
+
+    # Moving an account into the budgeted one's subtree counts it in
+    Account.objects.create(
+        name="Takeout",
+        currency=Account.objects.get(name="Dining").currency,
+        acct_type=AccountTypes.EXPENSE,
+        description="Takeout",
+    )
+    post_transaction(date(2025, 3, 3), decimal.Decimal("5.00"), "Takeout")
+    takeout = Account.objects.get(name="Takeout")
+    takeout.parent = Account.objects.get(name="Dining")
+    takeout.save()
+    (row,) = BudgetLine.objects.report(today=today)
+    assert row["month_actual"] == decimal.Decimal("17.00")
+
+    # and so does a write by another process, which only shares the database
+    BudgetLine.objects.update(amount=decimal.Decimal("50.00"))
+    LedgerVersion.objects.bump()
+    (row,) = BudgetLine.objects.report(today=today)
+    assert row["month_budget"] == decimal.Decimal("50.00")
+
+
+# The view queries from the ORM thread pool, which must see committed rows
+@pytest.mark.django_db(transaction=True)
+def test_budget_editor_and_report_views(setup_example_accounts):
+    client = Client()
+    res = client.post(
+        reverse("budgetmgr:budget-editor"),
+        {"account": Account.objects.get(name="Dining").pk, "amount": "150"},
+    )
+    assertRedirects(res, reverse("budgetmgr:budget-report"))
+    assert BudgetLine.objects.get().amount == decimal.Decimal("150")
+    res = client.get(reverse("budgetmgr:budget-report"))
+    assert res.status_code == 200
+    assert len(res.context["report"]) == 1
+
+
+@pytest.mark.django_db
+def test_budget_editor(setup_example_accounts):
+    client = Client()
+    dining = Account.objects.get(name="Dining")
+    res = client.get(reverse("budgetmgr:budget-editor"))
+    assert res.status_code == 200
+    assert res.context["create_form_action"] == reverse("budgetmgr:budget-editor")
+    # Only expense and revenue accounts are offered
+    assert set(res.context["budget_form"].fields["account"].queryset) == set(
+        Account.objects.filter(
+            acct_type__in=[AccountTypes.EXPENSE, AccountTypes.REVENUE]
+        )
+    )
+
+    res = client.post(
+        reverse("budgetmgr:budget-editor"), {"account": dining.pk, "amount": "150"}
+    )
+    assertRedirects(
+        res, reverse("budgetmgr:budget-report"), fetch_redirect_response=False
+    )
+    line = BudgetLine.objects.get()
+    assert (line.account, line.amount) == (dining, decimal.Decimal(150))
+
+    url = reverse("budgetmgr:budget-editor", args=[line.pk])
+    res = client.get(url)
+    assert res.context["create_form_action"] == url
+    assert res.context["budget_form"].instance == line
+    res = client.post(url, {"account": dining.pk, "amount": "175.50"})
+    assertRedirects(
+        res, reverse("budgetmgr:budget-report"), fetch_redirect_response=False
+    )
+    line.refresh_from_db()
+    assert line.amount == decimal.Decimal("175.50")
+
+    # Invalid lines come back with their errors, and aren't saved
+    bank = Account.objects.get(name="Example Bank 1")
+    res = client.post(url, {"account": bank.pk, "amount": "abc"})
+    assert res.status_code == 200
+    assert set(res.context["budget_form"].errors) == {"account", "amount"}
+    res = client.post(
+        reverse("budgetmgr:budget-editor"), {"account": dining.pk, "amount": "10"}
+    )
+    assert res.status_code == 200
+    assert res.context["budget_form"].errors["account"]
+    line.refresh_from_db()
+    assert BudgetLine.objects.count() == 1
+    assert line.amount == decimal.Decimal("175.50")
+    assert client.get(reverse("budgetmgr:budget-editor", args=[999])).status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_budget_report_csv(setup_example_accounts, monkeypatch):
+    BudgetLine(account=Account.objects.get(name="Dining"), amount=150).save()
+    post_transaction(date.today(), decimal.Decimal("40.25"), "Dining")
+
+    async def download():
+        res = await AsyncClient().get(reverse("budgetmgr:budget-report-csv"))
+        return res, b"".join([chunk async for chunk in res.streaming_content])
+
+    opted_in = []
+    db_for_read = routers.PrimaryReplicaRouter.db_for_read
+
+    def spy(self, model, **hints):
+        if model is BudgetLine:
+            opted_in.append(routers._replica_reads.get())
+        return db_for_read(self, model, **hints)
+
+    monkeypatch.setattr(routers.PrimaryReplicaRouter, "db_for_read", spy)
+    res, body = async_to_sync(download)()
+    # The lines are streamed with the view's replica routing (though the
+    # cached report is computed from the primary)
+    assert opted_in and all(opted_in)
+    assert res["Content-Type"] == "text/csv; charset=utf-8"
+    assert body.decode().splitlines() == [
+        "account,month_budget,month_actual,month_remaining,ytd_budget,ytd_actual,"
+        "ytd_remaining",
+        f"Dining,150.00,40.25,109.75,{150 * date.today().month}.00,40.25,"
+        f"{150 * date.today().month - 40.25:.2f}",
+    ]
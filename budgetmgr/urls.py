@@ -0,0 +1,11 @@
+from django.urls import path, re_path
+
+from . import views
+
+app_name = "budgetmgr"
+urlpatterns = [
+    path("", views.budget_report, name="budget-report"),
+    path("report.csv", views.budget_report_csv, name="budget-report-csv"),
+    re_path(r"^editor/(?P<pk>[0-9]+)?$", views.budget_editor, name="budget-editor"),
+    path("editor/<int:pk>/delete", views.budget_delete, name="budget-delete"),
+]
@@ -0,0 +1,86 @@
+import contextvars
+import csv
+import io
+from django.shortcuts import render, reverse, get_object_or_404
+from django.http import HttpRequest, HttpResponseRedirect, StreamingHttpResponse
+from .forms import BudgetLineForm
+from .models import BudgetLine
+from privatefinance.offload import offload, stream
+from privatefinance.routers import replica_reads
+from ledger.conditional import ledger_scopes, versioned
+from ledger.models import LedgerVersion
+
+REPORT_COLUMNS = [
+    "month_budget",
+    "month_actual",
+    "month_remaining",
+    "ytd_budget",
+    "ytd_actual",
+    "ytd_remaining",
+]
+
+
+def _render_report(request: HttpRequest):
+    version = request.ledger_versions[LedgerVersion.LEDGER]
+    return render(
+        request,
+        "budgetmgr/budget_report.html",
+        {"report": BudgetLine.objects.report(version=version)},
+    )
+
+
+@replica_reads
+@versioned(ledger_scopes, daily=True)
+async def budget_report(request: HttpRequest):
+    return await offload(_render_report, request)
+
+
+def _report_lines():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["account", *REPORT_COLUMNS])
+    for row in BudgetLine.objects.report():
+        places = row["account"].currency.fraction_traded
+        writer.writerow(
+            [row["account"].name, *(f"{row[key]:.{places}f}" for key in REPORT_COLUMNS)]
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+@replica_reads
+@versioned(ledger_scopes, daily=True)
+async def budget_report_csv(request: HttpRequest):
+    response = StreamingHttpResponse(
+        # Streamed after the view returns, so with its replica routing
+        stream(_report_lines, context=contextvars.copy_context()),
+        content_type="text/csv; charset=utf-8",
+    )
+    response["Content-Disposition"] = 'attachment; filename="budget-report.csv"'
+    return response
+
+
+def budget_editor(request: HttpRequest, pk=None):
+    line = get_object_or_404(BudgetLine, pk=pk) if pk else None
+    if request.method == "POST":
+        form = BudgetLineForm(request.POST, instance=line)
+        if form.is_valid():
+            form.save()
+            return HttpResponseRedirect(reverse("budgetmgr:budget-report"))
+        # The form again, with its errors
+    else:
+        form = BudgetLineForm(instance=line)
+    context = {
+        "budget_form": form,
+        "create_form_action": reverse(
+            "budgetmgr:budget-editor", args=[pk] if pk else []
+        ),
+    }
+    return render(request, "budgetmgr/budget_editor.html", context)
+
+
+def budget_delete(request: HttpRequest, pk: int):
+    line: BudgetLine = get_object_or_404(BudgetLine, pk=pk)
+    line.delete()
+    return HttpResponseRedirect(reverse("budgetmgr:budget-report"))
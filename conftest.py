@@ -1,6 +1,46 @@
 from currencymgr.models import Currency
 from acctmgr.models import Account, AccountTypes
+import gc
 import pytest
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection
+from ledger.autocomplete import descriptions
+from privatefinance.offload import close_connections
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # The locmem cache and the in-process description index outlive the per
+    # test database, so don't leak between tests
+    cache.clear()
+    descriptions.clear()
+
+
+@pytest.fixture(autouse=True)
+def close_orm_threads():
+    # Async views leave connections open in the ORM threads, and in the
+    # finished threads sync views ran in under ASGI, which would keep
+    # PostgreSQL from dropping the test database
+    yield
+    close_connections()
+    gc.collect()
+
+
+@pytest.fixture(autouse=True)
+def reset_sequences(request):
+    # Tests refer to rows by pk. Rolling back the test transaction doesn't
+    # rewind PostgreSQL sequences the way it does SQLite autoincrement ids.
+    if request.node.get_closest_marker("django_db") is None:
+        return
+    request.getfixturevalue("db")
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), apps.get_models()):
+            cursor.execute(sql)
 
 
 @pytest.fixture
@@ -77,3 +117,16 @@ def setup_example_accounts():
         acct_type=AccountTypes.EQUITY,
         description="Opening Balances",
     ).save()
+
+
+@pytest.fixture(scope="session")
+def django_db_modify_db_settings(
+    django_db_modify_db_settings_parallel_suffix, tmp_path_factory
+):
+    # On disk rather than in memory, so the processes stress_post forks
+    # share it
+    default = settings.DATABASES["default"]
+    if default["ENGINE"] == "django.db.backends.sqlite3":
+        default.setdefault("TEST", {})["NAME"] = str(
+            tmp_path_factory.mktemp("db") / "test.sqlite3"
+        )
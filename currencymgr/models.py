@@ -1,5 +1,6 @@
 from django.db import models
 from decimal import Decimal, ROUND_HALF_DOWN
+import uuid
 
 
 class Currency(models.Model):
@@ -11,6 +12,8 @@ class Currency(models.Model):
     current_price = models.DecimalField(decimal_places=10, max_digits=19, default=1)
     # Smallest fraction traded for the currency
     fraction_traded = models.PositiveIntegerField(default=2)
+    # The same on every instance the ledger is synced to
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
 
     def __str__(self):
         return self.full_name
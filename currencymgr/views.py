@@ -1,5 +1,7 @@
 from django.shortcuts import render, reverse, HttpResponseRedirect, get_object_or_404
+from django.db import transaction
 from django.http import HttpRequest
+from ledger.models import LedgerVersion
 from .forms import CurrencyCreateForm
 from .models import Currency
 
@@ -13,7 +15,10 @@ def currency_editor(request: HttpRequest, pk=None):
         else:
             form = CurrencyCreateForm(request.POST)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
+                # Every account page shows amounts in its currency
+                LedgerVersion.objects.bump(LedgerVersion.ACCOUNTS)
         print(form.errors)
         return HttpResponseRedirect(reverse("acctmgr:account-index"))
     if pk:
@@ -30,5 +35,7 @@ def currency_editor(request: HttpRequest, pk=None):
 
 def currency_delete(request: HttpRequest, pk: int):
     currency: Currency = get_object_or_404(Currency, pk=pk)
-    currency.delete()
+    with transaction.atomic():
+        currency.delete()
+        LedgerVersion.objects.bump(LedgerVersion.ACCOUNTS)
     return HttpResponseRedirect(reverse("acctmgr:account-index"))
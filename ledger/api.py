@@ -0,0 +1,142 @@
+import datetime
+import decimal
+
+from acctmgr.models import Account
+from .models import ClosedPeriod, TransactionDetail, TransactionEntry
+from .retry import retry_on_contention
+
+
+# Transactions accepted in one request
+MAX_TRANSACTIONS = 10000
+
+# DecimalField(max_digits=19, decimal_places=10) holds amounts below this
+AMOUNT_LIMIT = decimal.Decimal(10) ** 9
+
+
+def _decimal(value, name: str) -> decimal.Decimal:
+    # Floats would carry binary rounding into the ledger, so take strings too
+    if isinstance(value, bool) or not isinstance(value, (int, str, float)):
+        raise ValueError(f"{name} must be a number.")
+    try:
+        number = decimal.Decimal(str(value))
+    except decimal.InvalidOperation:
+        raise ValueError(f"{name} must be a number.")
+    if not number.is_finite() or abs(number) >= AMOUNT_LIMIT:
+        raise ValueError(f"{name} is out of range.")
+    return number
+
+
+def _build(
+    item, accounts: dict[int, Account], closed_through: datetime.date | None
+) -> tuple[TransactionDetail, list[TransactionEntry]]:
+    """One transaction of the payload, checked against the preloaded accounts
+
+    Raises:
+    ValueError -- The transaction is malformed, unbalanced or closed
+    """
+    if not isinstance(item, dict):
+        raise ValueError("A transaction must be an object.")
+    try:
+        xact_date = datetime.date.fromisoformat(item.get("date"))
+    except (TypeError, ValueError):
+        raise ValueError("date must be an ISO date (YYYY-MM-DD).")
+    if closed_through is not None and xact_date <= closed_through:
+        raise ValueError(
+            f"Transactions on or before {closed_through} are in a closed period."
+        )
+    description = item.get("description")
+    if not isinstance(description, str) or not description or len(description) > 100:
+        raise ValueError("description must be a string of 1 to 100 characters.")
+    splits = item.get("splits")
+    if not isinstance(splits, list) or not splits:
+        raise ValueError("splits must be a non-empty list.")
+
+    entries = []
+    for split in splits:
+        if not isinstance(split, dict):
+            raise ValueError("A split must be an object.")
+        account_id = split.get("account")
+        # bool is an int too, but true is not account 1
+        account = accounts.get(account_id) if type(account_id) is int else None
+        if account is None:
+            raise ValueError(f"Account {split.get('account')!r} does not exist.")
+        if account.placeholder:
+            raise ValueError(f"Account {account.pk} is a placeholder.")
+        memo = split.get("memo", "")
+        if not isinstance(memo, str) or len(memo) > 256:
+            raise ValueError("memo must be a string of at most 256 characters.")
+        price = split.get("price")
+        entry = TransactionEntry(
+            account=account,
+            memo=memo,
+            amount=_decimal(split.get("amount"), "amount"),
+            price=(
+                account.currency.current_price
+                if price is None
+                else _decimal(price, "price")
+            ),
+        )
+        entry.quantize()
+        entries.append(entry)
+    if sum(entry.amount for entry in entries) != 0:
+        raise ValueError("Transaction is not balanced.")
+    return TransactionDetail(xact_date=xact_date, description=description), entries
+
+
+def parse_transactions(
+    items,
+) -> tuple[list[tuple[TransactionDetail, list[TransactionEntry]]], list[dict]]:
+    """Validate a JSON batch of transactions entirely in memory
+
+    Each item is {"date": "YYYY-MM-DD", "description": str, "splits":
+    [{"account": id, "amount": number, "price": number, "memo": str}]}, with
+    price defaulting to the currency's current price. The accounts and their
+    currencies are loaded with one query, and the closed period with another.
+
+    Returns:
+    (transactions ready for bulk_create_transactions,
+     [{"index": int, "error": str}] for each invalid item)
+    """
+    if not isinstance(items, list) or not items:
+        return [], [{"index": None, "error": "Expected a non-empty list."}]
+    if len(items) > MAX_TRANSACTIONS:
+        return [], [
+            {
+                "index": None,
+                "error": f"At most {MAX_TRANSACTIONS} transactions per request.",
+            }
+        ]
+    account_ids = {
+        split.get("account")
+        for item in items
+        if isinstance(item, dict) and isinstance(item.get("splits"), list)
+        for split in item["splits"]
+        if isinstance(split, dict) and type(split.get("account")) is int
+    }
+    accounts = Account.objects.select_related("currency").in_bulk(account_ids)
+    closed_through = ClosedPeriod.objects.closed_through()
+
+    transactions, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            transactions.append(_build(item, accounts, closed_through))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    return transactions, errors
+
+
+@retry_on_contention
+def create_transactions(
+    transactions: list[tuple[TransactionDetail, list[TransactionEntry]]],
+) -> list[int]:
+    """Insert the parsed transactions all or nothing in one atomic block
+
+    Returns the ids of the created transactions, in order
+    """
+    # A failed attempt can leave pks set by the bulk insert
+    for detail, entries in transactions:
+        detail.pk = None
+        for entry in entries:
+            entry.pk = None
+    details = TransactionEntry.objects.bulk_create_transactions(transactions)
+    return [detail.pk for detail in details]
@@ -0,0 +1,174 @@
+import bisect
+import heapq
+import threading
+import time
+from datetime import date
+from django.db import transaction
+from django.db.models import Count, Max, QuerySet
+
+from .models import TransactionDetail, TransactionEntry
+
+# A use of a description counts half as much every HALF_LIFE days. Scores
+# are kept relative to EPOCH so they never need decaying, only comparing.
+HALF_LIFE = 90
+EPOCH = date(2000, 1, 1)
+
+# Seconds before the index is rebuilt, picking up other processes' writes
+MAX_AGE = 300
+
+
+def _weight(day: date) -> float:
+    return 2 ** ((day - EPOCH).days / HALF_LIFE)
+
+
+class DescriptionIndex:
+    """Past transaction descriptions by case-insensitive prefix
+
+    A sorted array of the distinct descriptions, with how often and how
+    recently each was used and its newest transaction. It is built on first
+    use and then kept up to date by the ledger's write signals.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = None
+        # Sorted (casefolded description, description)
+        self._keys = []
+        # description -> [uses, score, newest (date, transaction id)]
+        self._stats = {}
+
+    def clear(self):
+        with self._lock:
+            self._built = None
+            self._keys = []
+            self._stats = {}
+
+    def _build(self):
+        rows = (
+            TransactionDetail.objects.values("description", "xact_date")
+            .annotate(uses=Count("pk"), newest=Max("pk"))
+            .order_by()
+        )
+        stats = {}
+        for row in rows.iterator(chunk_size=10000):
+            newest = (row["xact_date"], row["newest"])
+            entry = stats.setdefault(row["description"], [0, 0.0, newest])
+            entry[0] += row["uses"]
+            entry[1] += row["uses"] * _weight(row["xact_date"])
+            entry[2] = max(entry[2], newest)
+        self._stats = stats
+        self._keys = sorted(
+            (description.casefold(), description) for description in stats
+        )
+        self._built = time.monotonic()
+
+    def _ensure_built(self):
+        if self._built is None or time.monotonic() - self._built > MAX_AGE:
+            self._build()
+
+    def lookup(self, prefix: str, limit: int = 10) -> list[dict]:
+        """Descriptions starting with the prefix, ignoring case, by how often
+        and how recently they were used
+
+        Returns:
+        [{"description": str, "uses": int, "last_date": date, "transaction": int}]
+        """
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return []
+        with self._lock:
+            self._ensure_built()
+            start = bisect.bisect_left(self._keys, (prefix,))
+            end = bisect.bisect_left(self._keys, (prefix + "\U0010ffff",), lo=start)
+            best = heapq.nlargest(
+                limit,
+                (description for _, description in self._keys[start:end]),
+                key=lambda description: self._stats[description][1],
+            )
+            return [
+                {
+                    "description": description,
+                    "uses": self._stats[description][0],
+                    "last_date": self._stats[description][2][0],
+                    "transaction": self._stats[description][2][1],
+                }
+                for description in best
+            ]
+
+    def _apply(self, rows: list[tuple[int, str, date]], sign: int):
+        with self._lock:
+            if self._built is None:
+                return
+            stale = []
+            for pk, description, day in rows:
+                stats = self._stats.get(description)
+                if stats is None:
+                    if sign < 0:
+                        continue
+                    stats = self._stats[description] = [0, 0.0, (day, pk)]
+                    bisect.insort(self._keys, (description.casefold(), description))
+                stats[0] += sign
+                stats[1] += sign * _weight(day)
+                if stats[0] <= 0:
+                    del self._stats[description]
+                    self._keys.remove((description.casefold(), description))
+                elif sign > 0:
+                    stats[2] = max(stats[2], (day, pk))
+                elif stats[2][1] == pk:
+                    stale.append(description)
+        # The newest transaction of these was removed, find the one before it
+        for description in stale:
+            newest = (
+                TransactionDetail.objects.filter(description=description)
+                .order_by("-xact_date", "-pk")
+                .values_list("xact_date", "pk")
+                .first()
+            )
+            with self._lock:
+                if newest is not None and description in self._stats:
+                    self._stats[description][2] = newest
+
+    def _on_commit(self, entries: QuerySet, sign: int):
+        # Read the transactions now, as removed ones are gone by the commit,
+        # but only change the index once their transaction commits
+        if self._built is None:
+            return
+        rows = list(
+            TransactionDetail.objects.filter(
+                pk__in=entries.order_by().values("transaction_id")
+            ).values_list("pk", "description", "xact_date")
+        )
+        transaction.on_commit(lambda: self._apply(rows, sign))
+
+    def add(self, entries: QuerySet):
+        """Count the transactions of the entries, once committed"""
+        self._on_commit(entries, 1)
+
+    def remove(self, entries: QuerySet):
+        """Uncount the transactions of the entries, once committed
+
+        Must be called while the entries exist.
+        """
+        self._on_commit(entries, -1)
+
+
+descriptions = DescriptionIndex()
+
+
+def splits(transaction_ids: list[int]) -> dict[int, list[dict]]:
+    """The splits of each transaction, to prefill the transaction form with
+
+    Returns:
+    {transaction id: [{"account": int, "amount": str, "memo": str}]}
+    """
+    result = {pk: [] for pk in transaction_ids}
+    entries = (
+        TransactionEntry.objects.filter(transaction_id__in=transaction_ids)
+        .order_by("pk")
+        .values_list("transaction_id", "account_id", "amount", "memo")
+    )
+    for transaction_id, account, amount, memo in entries:
+        result[transaction_id].append(
+            {"account": account, "amount": f"{amount.normalize():f}", "memo": memo}
+        )
+    return result
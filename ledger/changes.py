@@ -0,0 +1,136 @@
+from datetime import timedelta
+from typing import NamedTuple
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Change, ChangeKind
+
+# Changes per page unless the reader asks for fewer, and at most
+PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+# The fields of each logged model's rows in the feed
+FIELDS = {
+    "currencymgr.currency": (
+        "id",
+        "symbol",
+        "full_name",
+        "current_price",
+        "fraction_traded",
+        "uuid",
+    ),
+    "acctmgr.account": (
+        "id",
+        "name",
+        "currency",
+        "acct_type",
+        "description",
+        "parent",
+        "placeholder",
+        "uuid",
+    ),
+    "ledger.transactiondetail": ("id", "xact_date", "description", "state", "uuid"),
+    "ledger.transactionentry": (
+        "id",
+        "transaction_id",
+        "account",
+        "memo",
+        "amount",
+        "price",
+        "uuid",
+    ),
+}
+
+
+# Changes after which the row is out of the live ledger
+GONE = (ChangeKind.DELETE, ChangeKind.ARCHIVE)
+
+
+class ChangesPage(NamedTuple):
+    # {"seq", "model", "id", "kind", "data"} in sequence order
+    changes: list[dict]
+    # The sequence number to read from next
+    next: int
+    # Whether the log goes on past this page
+    more: bool
+
+
+def changes_since(since: int = 0, limit: int = PAGE_SIZE) -> ChangesPage:
+    """Up to `limit` changes after sequence number `since`, each with the
+    changed row as it is now (None for a delete or archive)
+
+    Only the latest change of each row in the page is returned. A row gone
+    since its change is left to its delete, further on. Rows archived by a
+    period close have changes of their own kind, as do rows it restores.
+    The log holds every row's latest change, so reading it from 0 gives the
+    whole live ledger.
+
+    Takes a query for the log and one per model in the page.
+
+    Raises:
+    ValueError -- since is negative, or limit is not within 1 to MAX_PAGE_SIZE
+    """
+    if since < 0:
+        raise ValueError("since must not be negative.")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+    rows = list(
+        Change.objects.filter(pk__gt=since)
+        .order_by("pk")
+        .values_list("pk", "model", "object_id", "kind")[: limit + 1]
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    # (model, id) -> (seq, kind) of the row's latest change, in sequence order
+    latest: dict[tuple[str, int], tuple[int, str]] = {}
+    for seq, model, object_id, kind in rows:
+        latest.pop((model, object_id), None)
+        latest[model, object_id] = (seq, kind)
+    wanted: dict[str, list[int]] = {}
+    for (model, object_id), (_, kind) in latest.items():
+        if kind not in GONE:
+            wanted.setdefault(model, []).append(object_id)
+    current = {}
+    for model, ids in wanted.items():
+        for row in (
+            apps.get_model(model).objects.filter(pk__in=ids).values(*FIELDS[model])
+        ):
+            current[model, row["id"]] = row
+
+    changes = []
+    for (model, object_id), (seq, kind) in latest.items():
+        data = current.get((model, object_id))
+        if kind not in GONE and data is None:
+            continue
+        changes.append(
+            {"seq": seq, "model": model, "id": object_id, "kind": kind, "data": data}
+        )
+    return ChangesPage(changes, rows[-1][0] if rows else since, more)
+
+
+def compact(retention: timedelta | None = None) -> int:
+    """Drop the changes older than `retention` (CHANGE_LOG_RETENTION_DAYS by
+    default) that a later change of the same row supersedes
+
+    Readers only get a row's latest change past where they are, so none of
+    them misses anything, however far behind.
+
+    Returns the number of changes dropped
+    """
+    if retention is None:
+        retention = timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS)
+    superseded = Change.objects.filter(
+        Exists(
+            Change.objects.filter(
+                model=OuterRef("model"),
+                object_id=OuterRef("object_id"),
+                pk__gt=OuterRef("pk"),
+            )
+        ),
+        recorded_at__lt=timezone.now() - retention,
+    )
+    # Nothing refers to changes, so skip the collector
+    return superseded._raw_delete(superseded.db)
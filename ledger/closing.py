@@ -0,0 +1,185 @@
+from datetime import date
+from django.db import transaction
+
+from . import search
+from .autocomplete import descriptions
+from .models import (
+    AccountSnapshot,
+    ArchivedTransactionDetail,
+    ArchivedTransactionEntry,
+    Change,
+    ChangeKind,
+    ClosedPeriod,
+    LedgerVersion,
+    TransactionDetail,
+    TransactionEntry,
+)
+from .retry import retry_on_contention
+
+ENTRY_FIELDS = (
+    "pk",
+    "transaction_id",
+    "account_id",
+    "memo",
+    "price",
+    "amount",
+    "uuid",
+)
+DETAIL_FIELDS = ("pk", "description", "xact_date", "state", "uuid")
+
+
+def _verify_balances(before: dict):
+    """Raises ValueError if any account balance moved during a close/reopen"""
+    after = TransactionEntry.objects.account_balances()
+    for account_id in before.keys() | after.keys():
+        if before.get(account_id, 0) != after.get(account_id, 0):
+            raise ValueError(
+                f"Balance of account {account_id} changed from "
+                f"{before.get(account_id, 0)} to {after.get(account_id, 0)}."
+            )
+
+
+def _archive(period: ClosedPeriod, batch_size: int):
+    details = TransactionDetail.objects.filter(xact_date__lte=period.end_date).order_by(
+        "pk"
+    )
+    while chunk := list(details.values_list(*DETAIL_FIELDS)[:batch_size]):
+        ids = [pk for pk, *_ in chunk]
+        ArchivedTransactionDetail.objects.bulk_create(
+            ArchivedTransactionDetail(
+                id=pk,
+                period=period,
+                description=description,
+                xact_date=xact_date,
+                state=state,
+                uuid=uuid,
+            )
+            for pk, description, xact_date, state, uuid in chunk
+        )
+        entries = TransactionEntry.objects.filter(transaction_id__in=ids)
+        rows = entries.values_list(*ENTRY_FIELDS)
+        ArchivedTransactionEntry.objects.bulk_create(
+            ArchivedTransactionEntry(
+                id=pk,
+                transaction_id_id=transaction_id,
+                account_id=account_id,
+                memo=memo,
+                price=price,
+                amount=amount,
+                uuid=uuid,
+            )
+            for pk, transaction_id, account_id, memo, price, amount, uuid in rows
+        )
+        # They leave search and description suggestions with the live ledger.
+        # The rollups and cleared balances keep counting them, as the
+        # account balances and reports still do through the snapshots.
+        search.remove(entries)
+        descriptions.remove(entries)
+        # They leave the live ledger, as far as the change log goes
+        Change.objects.record(ChangeKind.ARCHIVE, entries)
+        Change.objects.record(
+            ChangeKind.ARCHIVE, TransactionDetail.objects.filter(pk__in=ids)
+        )
+        # The rows were just copied, so skip the collector and delete set-wise
+        entries._raw_delete(entries.db)
+        TransactionDetail.objects.filter(pk__in=ids)._raw_delete(entries.db)
+
+
+def _restore(period: ClosedPeriod, batch_size: int):
+    details = ArchivedTransactionDetail.objects.filter(period=period).order_by("pk")
+    while chunk := list(details.values_list(*DETAIL_FIELDS)[:batch_size]):
+        ids = [pk for pk, *_ in chunk]
+        TransactionDetail.objects.bulk_create(
+            TransactionDetail(
+                id=pk,
+                description=description,
+                xact_date=xact_date,
+                state=state,
+                uuid=uuid,
+            )
+            for pk, description, xact_date, state, uuid in chunk
+        )
+        entries = ArchivedTransactionEntry.objects.filter(transaction_id__in=ids)
+        rows = entries.values_list(*ENTRY_FIELDS)
+        TransactionEntry.objects.bulk_create(
+            TransactionEntry(
+                id=pk,
+                transaction_id_id=transaction_id,
+                account_id=account_id,
+                memo=memo,
+                price=price,
+                amount=amount,
+                uuid=uuid,
+            )
+            for pk, transaction_id, account_id, memo, price, amount, uuid in rows
+        )
+        Change.objects.record(
+            ChangeKind.RESTORE, TransactionDetail.objects.filter(pk__in=ids)
+        )
+        restored = TransactionEntry.objects.filter(transaction_id__in=ids)
+        Change.objects.record(ChangeKind.RESTORE, restored)
+        search.index(restored)
+        descriptions.add(restored)
+        entries._raw_delete(entries.db)
+        ArchivedTransactionDetail.objects.filter(pk__in=ids)._raw_delete(entries.db)
+
+
+@retry_on_contention
+@transaction.atomic
+def close_period(
+    end_date: date, archive: bool = False, batch_size: int = 5000
+) -> ClosedPeriod:
+    """Close the ledger through end_date
+
+    Snapshots every account's closing balance and, with archive, moves the
+    closed transactions to the archive tables in batches. The balances are
+    checked against the pre-close trial balance before committing.
+
+    Raises:
+    ValueError -- The period overlaps a closed one, or the balances don't verify
+    """
+    latest = ClosedPeriod.objects.select_for_update().order_by("-end_date").first()
+    if latest is not None and end_date <= latest.end_date:
+        raise ValueError(f"The ledger is already closed through {latest.end_date}.")
+
+    before = TransactionEntry.objects.account_balances()
+    closing = TransactionEntry.objects.account_balances(as_of=end_date)
+    if sum(closing.values()) != 0:
+        raise ValueError(f"The trial balance on {end_date} does not sum to zero.")
+
+    period = ClosedPeriod.objects.create(end_date=end_date, archived=archive)
+    AccountSnapshot.objects.bulk_create(
+        (
+            AccountSnapshot(period=period, account_id=account_id, balance=balance)
+            for account_id, balance in closing.items()
+        ),
+        batch_size=batch_size,
+    )
+    if archive:
+        _archive(period, batch_size)
+    _verify_balances(before)
+    # Account pages start from the snapshots now
+    LedgerVersion.objects.bump(LedgerVersion.ACCOUNTS)
+    return period
+
+
+@retry_on_contention
+@transaction.atomic
+def reopen_period(batch_size: int = 5000) -> ClosedPeriod:
+    """Reopen the latest closed period, restoring its archived transactions
+
+    Returns the (now deleted) period
+
+    Raises:
+    ValueError -- Nothing is closed, or the balances don't verify
+    """
+    period = ClosedPeriod.objects.select_for_update().order_by("-end_date").first()
+    if period is None:
+        raise ValueError("There is no closed period to reopen.")
+    before = TransactionEntry.objects.account_balances()
+    if period.archived:
+        _restore(period, batch_size)
+    period.delete()
+    _verify_balances(before)
+    LedgerVersion.objects.bump(LedgerVersion.ACCOUNTS)
+    return period
@@ -0,0 +1,100 @@
+import datetime
+import functools
+from collections.abc import Callable
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from privatefinance.offload import offload
+from .models import LedgerVersion
+
+
+def _check(
+    request: HttpRequest, scopes: list[int], daily: bool
+) -> tuple[str, int | None, HttpResponse | None]:
+    """The ETag and Last-Modified of the scopes' versions, and the 304 (or
+    412) to answer with instead of running the view, if any"""
+    versions = LedgerVersion.objects.current(scopes)
+    # For the page's own use of them, like the sidebar's cache key
+    request.ledger_versions = {
+        scope: version for scope, (version, _) in zip(scopes, versions)
+    }
+    tag = "-".join(str(version) for version, _ in versions)
+    last_modified = max(
+        (modified for _, modified in versions if modified is not None), default=None
+    )
+    if daily:
+        today = timezone.localdate()
+        tag += f"-{today.isoformat()}"
+        midnight = timezone.make_aware(
+            datetime.datetime.combine(today, datetime.time())
+        )
+        last_modified = max(last_modified or midnight, midnight)
+    etag = f'W/"{tag}"'
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return etag, timestamp, get_conditional_response(request, etag, timestamp)
+
+
+def _finish(response: HttpResponse, etag: str, timestamp: int | None) -> HttpResponse:
+    if 200 <= response.status_code < 300:
+        response.headers.setdefault("ETag", etag)
+        if timestamp is not None:
+            response.headers.setdefault("Last-Modified", http_date(timestamp))
+        # Kept by the browser, but checked with the server before each use
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def versioned(scopes: Callable[..., list[int]], daily: bool = False):
+    """Answer conditional GETs of a view from the versions of the ledger
+    scopes it shows, given by scopes(request, *args, **kwargs)
+
+    The versions are read with one query, and when the client's copy is
+    current the view doesn't run. With `daily`, the view depends on today's
+    date as well.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @functools.wraps(view)
+            async def wrapper(request: HttpRequest, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+                etag, timestamp, response = await offload(
+                    _check, request, scopes(request, *args, **kwargs), daily
+                )
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finish(response, etag, timestamp)
+
+        else:
+
+            @functools.wraps(view)
+            def wrapper(request: HttpRequest, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return view(request, *args, **kwargs)
+                etag, timestamp, response = _check(
+                    request, scopes(request, *args, **kwargs), daily
+                )
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return _finish(response, etag, timestamp)
+
+        return wrapper
+
+    return decorator
+
+
+def ledger_scopes(request: HttpRequest, *args, **kwargs) -> list[int]:
+    """Views of the whole ledger"""
+    return [LedgerVersion.LEDGER]
+
+
+def account_scopes(account_id: int | None) -> list[int]:
+    """Views of one account's entries, or of the accounts without entries"""
+    if account_id is None:
+        return [LedgerVersion.ACCOUNTS]
+    return [account_id, LedgerVersion.ACCOUNTS]
@@ -0,0 +1,110 @@
+from datetime import date
+from django.db import transaction
+
+from acctmgr.models import Account
+from .models import (
+    Change,
+    ChangeKind,
+    ClosedPeriod,
+    TransactionDetail,
+    TransactionEntry,
+)
+from .retry import retry_on_contention
+from .signals import entries_removed
+
+
+def select_transactions(
+    ids: list[int] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    account: Account | None = None,
+    description: str | None = None,
+):
+    """The transactions matching every given criterion
+
+    `account` selects the transactions with an entry in it, and
+    `description` those whose description contains it (ignoring case).
+
+    Raises:
+    ValueError -- No criterion was given
+    """
+    if not (ids or description) and start is None and end is None and account is None:
+        raise ValueError("Give at least one criterion to select transactions.")
+    details = TransactionDetail.objects.all()
+    if ids:
+        details = details.filter(pk__in=ids)
+    if start is not None:
+        details = details.filter(xact_date__gte=start)
+    if end is not None:
+        details = details.filter(xact_date__lte=end)
+    if account is not None:
+        details = details.filter(
+            pk__in=TransactionEntry.objects.filter(account=account).values(
+                "transaction_id"
+            )
+        )
+    if description:
+        details = details.filter(description__icontains=description)
+    return details
+
+
+@retry_on_contention
+@transaction.atomic
+def delete_transactions(
+    ids: list[int] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    account: Account | None = None,
+    description: str | None = None,
+    batch_size: int = 5000,
+) -> int:
+    """Delete the transactions selected as by select_transactions
+
+    Works through them batch_size transactions at a time with set-based
+    deletes, without loading them, and updates the derived data once per
+    batch through entries_removed.
+
+    Returns the number of transactions deleted
+
+    Raises:
+    ValueError -- No criterion was given, or a selected transaction is in a
+    closed period
+    """
+    details = select_transactions(ids, start, end, account, description)
+    closed_through = ClosedPeriod.objects.closed_through()
+    if (
+        closed_through is not None
+        and details.filter(xact_date__lte=closed_through).exists()
+    ):
+        raise ValueError(
+            f"Transactions on or before {closed_through} are in a closed period."
+        )
+
+    # Each batch is a pk range of the selection, so no ids pass through Python
+    deleted = last = 0
+    while True:
+        bound = list(
+            details.filter(pk__gt=last)
+            .order_by("pk")
+            .values_list("pk", flat=True)[batch_size - 1 : batch_size]
+        )
+        in_range = {"pk__gt": last, **({"pk__lte": bound[0]} if bound else {})}
+        batch = details.filter(**in_range)
+        entries_removed.send(
+            sender=TransactionEntry,
+            entries=TransactionEntry.objects.filter(
+                transaction_id__in=batch.values("pk")
+            ),
+        )
+        Change.objects.record(ChangeKind.DELETE, batch)
+        # Nothing else refers to them, so skip the collector. The details go
+        # first, as selecting them can depend on their entries, and then the
+        # entries left without a transaction.
+        deleted += batch._raw_delete(batch.db)
+        range_ids = TransactionDetail.objects.filter(**in_range).values("pk")
+        TransactionEntry.objects.filter(
+            **{f"transaction_id__{key}": value for key, value in in_range.items()}
+        ).exclude(transaction_id__in=range_ids)._raw_delete(batch.db)
+        if not bound:
+            return deleted
+        last = bound[0]
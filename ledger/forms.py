@@ -1,11 +1,71 @@
 from django import forms
+from django.forms.models import ModelChoiceIterator
+import csv
 import datetime
 import decimal
+import io
 from functools import reduce
 from acctmgr.models import Account
 from django.core.exceptions import ValidationError
-from .models import TransactionDetail, TransactionEntry
+from .models import ClosedPeriod, TransactionDetail, TransactionEntry
+from .deletion import delete_transactions, select_transactions
+from .export import FORMATS
+from .reconcile import StatementLine
+from .retry import retry_on_contention
+from .signals import entries_removed
 from django.db import transaction
+from django.urls import reverse_lazy
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    """Model choices which are only queried the first time they're iterated"""
+
+    def __init__(self, field):
+        super().__init__(field)
+        self._choices = None
+        self._options = None
+
+    def __iter__(self):
+        if self._choices is None:
+            self._choices = list(super().__iter__())
+        return iter(self._choices)
+
+    def options(self, selected: list[str]) -> str:
+        """The choices as <option> markup, with the `selected` values selected"""
+        if self._options is None:
+            # Escaped once, however many selects share the choices
+            self._options = [
+                (
+                    str(value),
+                    f'<option value="{escape(value)}"',
+                    f">{escape(label)}</option>",
+                )
+                for value, label in self
+            ]
+        return mark_safe(
+            "".join(
+                f"{start} selected{end}" if value in selected else start + end
+                for value, start, end in self._options
+            )
+        )
+
+
+class CachedSelect(forms.Select):
+    """A select over a CachedModelChoiceIterator, whose options are built
+    in Python rather than rendering a template for each of them
+
+    With an 80 field transaction form and a few hundred accounts, the option
+    templates are most of the time taken to render the form.
+    """
+
+    template_name = "ledger/cached_select.html"
+
+    def get_context(self, name, value, attrs):
+        context = forms.Widget.get_context(self, name, value, attrs)
+        context["widget"]["options"] = self.choices.options(self.format_value(value))
+        return context
 
 
 class TransactionDeleteForm(forms.Form):
@@ -19,12 +79,16 @@ class TransactionDeleteForm(forms.Form):
     def clean_transaction(self):
         try:
             xact = TransactionDetail.objects.get(pk=self.cleaned_data["transaction"])
-            return xact
         except TransactionDetail.DoesNotExist:
             raise ValidationError("Invalid transaction id")
+        try:
+            ClosedPeriod.objects.ensure_open([xact.xact_date])
+        except ValueError as e:
+            raise ValidationError(str(e))
+        return xact
 
     def save(self):
-        self.cleaned_data["transaction"].delete()
+        delete_transactions(ids=[self.cleaned_data["transaction"].pk])
 
 
 class TransactionCreateForm(forms.Form):
@@ -34,7 +98,15 @@ class TransactionCreateForm(forms.Form):
         required=True,
         max_length=256,
         widget=forms.widgets.TextInput(
-            attrs={"placeholder": "Transaction Description"}
+            attrs={
+                "placeholder": "Transaction Description",
+                "autocomplete": "off",
+                "list": "description-suggestions",
+                "data-autocomplete-url": reverse_lazy(
+                    "ledger:description-autocomplete"
+                ),
+                "data-splits-url": reverse_lazy("ledger:xact-splits"),
+            }
         ),
     )
     selected_account = forms.IntegerField(
@@ -47,7 +119,8 @@ class TransactionCreateForm(forms.Form):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        accounts = Account.objects.filter(placeholder=False)
+        accounts = Account.objects.filter(placeholder=False).select_related("currency")
+        choices = None
         for i in range(1, self.max_split + 1):
             self.fields[f"memo_{i}"] = forms.CharField(
                 required=False,
@@ -75,10 +148,12 @@ class TransactionCreateForm(forms.Form):
             self.fields[f"account_{i}"] = forms.ModelChoiceField(
                 accounts,
                 required=True if i == 1 else False,
-                widget=forms.widgets.Select(
-                    attrs={"hidden": False if i == 1 else True}
-                ),
+                widget=CachedSelect(attrs={"hidden": False if i == 1 else True}),
             )
+            # Every split offers the same accounts, so only query them once
+            if choices is None:
+                choices = CachedModelChoiceIterator(self.fields[f"account_{i}"])
+            self.fields[f"account_{i}"].widget.choices = choices
 
     def clean(self, *args, **kwargs):
         transaction_tuples: list[
@@ -100,16 +175,32 @@ class TransactionCreateForm(forms.Form):
 
         self.cleaned_data["transactions"] = transaction_tuples
 
+        # Neither the new date nor the date being edited may be in a closed period
+        dates = [self.cleaned_data["date"]] if "date" in self.cleaned_data else []
+        if self.cleaned_data.get("selected_transaction"):
+            dates.extend(
+                TransactionDetail.objects.filter(
+                    pk=self.cleaned_data["selected_transaction"]
+                ).values_list("xact_date", flat=True)
+            )
+        try:
+            ClosedPeriod.objects.ensure_open(dates)
+        except ValueError as e:
+            raise ValidationError(str(e))
+
         xact_sum = reduce(lambda acc, val: acc + val[1] * val[2], transaction_tuples, 0)
         if xact_sum != 0:
             # In the future we should just throw the difference in an imbalance account
             raise ValidationError("Transaction does not sum to 0.")
         return self.cleaned_data
 
+    @retry_on_contention
     @transaction.atomic
-    def save(self):
+    def save(self) -> list[TransactionEntry]:
         """Saves the form, including transactions
 
+        Returns the entries created, with their transaction and account loaded
+
         Raises:
         ValueError -- Transaction is not balanced
         """
@@ -123,7 +214,9 @@ class TransactionCreateForm(forms.Form):
             # If transactions are edited often then another solution would
             # be to only recreate the ones that are modified, or even better
             # just reuse as many as we can, but that gets more complicated
-            TransactionEntry.objects.filter(transaction_id=xact_detail).delete()
+            old_entries = TransactionEntry.objects.filter(transaction_id=xact_detail)
+            entries_removed.send(sender=TransactionEntry, entries=old_entries)
+            old_entries.delete()
         else:
             xact_detail = TransactionDetail(
                 description=self.cleaned_data["description"],
@@ -142,3 +235,120 @@ class TransactionCreateForm(forms.Form):
                 )
             )
         TransactionEntry.objects.create_balanced_transaction(entries)
+        return entries
+
+
+class TransactionSearchForm(forms.Form):
+    q = forms.CharField(
+        max_length=256,
+        widget=forms.widgets.TextInput(attrs={"placeholder": "Search"}),
+    )
+    account = forms.ModelChoiceField(Account.objects.all(), required=False)
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    min_amount = forms.DecimalField(required=False, min_value=0)
+    max_amount = forms.DecimalField(required=False, min_value=0)
+
+
+class ExportForm(forms.Form):
+    format = forms.ChoiceField(choices=[(f, f) for f in FORMATS], initial="csv")
+    account = forms.ModelChoiceField(Account.objects.all(), required=False)
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+
+
+class ReconcileForm(forms.Form):
+    statement = forms.FileField(
+        help_text="CSV of date (YYYY-MM-DD), amount and optional description"
+    )
+    ending_balance = forms.DecimalField(max_digits=19, decimal_places=10)
+    window_days = forms.IntegerField(initial=3, min_value=0, max_value=31)
+
+    def clean_statement(self) -> list[StatementLine]:
+        text = io.TextIOWrapper(self.cleaned_data["statement"], encoding="utf-8-sig")
+        lines = []
+        for number, row in enumerate(csv.reader(text), start=1):
+            if not row or not "".join(row).strip():
+                continue
+            try:
+                lines.append(
+                    StatementLine(
+                        datetime.date.fromisoformat(row[0].strip()),
+                        decimal.Decimal(row[1].strip()),
+                        row[2].strip() if len(row) > 2 else "",
+                    )
+                )
+            except (IndexError, ValueError, decimal.InvalidOperation):
+                # Allow a header row
+                if number == 1:
+                    continue
+                raise ValidationError(f"Line {number} is not date,amount[,description]")
+        if not lines:
+            raise ValidationError("The statement has no lines")
+        return lines
+
+
+class MoveEntriesForm(forms.Form):
+    target = forms.ModelChoiceField(
+        Account.objects.filter(placeholder=False), label="Move entries to"
+    )
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    description = forms.CharField(
+        required=False,
+        max_length=100,
+        widget=forms.widgets.TextInput(attrs={"placeholder": "Description contains"}),
+    )
+
+
+class TransactionBatchDeleteForm(forms.Form):
+    transactions = forms.CharField(
+        required=False,
+        widget=forms.widgets.TextInput(attrs={"placeholder": "Transaction ids"}),
+    )
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    account = forms.ModelChoiceField(Account.objects.all(), required=False)
+    description = forms.CharField(
+        required=False,
+        max_length=100,
+        widget=forms.widgets.TextInput(attrs={"placeholder": "Description contains"}),
+    )
+    # Set once the number of matching transactions has been shown
+    confirm = forms.BooleanField(required=False, widget=forms.widgets.HiddenInput())
+
+    def clean_transactions(self) -> list[int]:
+        ids = self.cleaned_data["transactions"].replace(",", " ").split()
+        try:
+            return [int(pk) for pk in ids]
+        except ValueError:
+            raise ValidationError("Transaction ids must be whole numbers")
+
+    def _criteria(self) -> dict:
+        return {
+            "ids": self.cleaned_data.get("transactions"),
+            "start": self.cleaned_data.get("start"),
+            "end": self.cleaned_data.get("end"),
+            "account": self.cleaned_data.get("account"),
+            "description": self.cleaned_data.get("description"),
+        }
+
+    def clean(self):
+        try:
+            select_transactions(**self._criteria())
+        except ValueError as e:
+            raise ValidationError(str(e))
+        return self.cleaned_data
+
+    def count(self) -> int:
+        return select_transactions(**self._criteria()).count()
+
+    def save(self) -> int:
+        """Delete the matching transactions
+
+        Returns the number deleted
+
+        Raises:
+        ValueError -- A matching transaction is in a closed period
+        """
+        return delete_transactions(**self._criteria())
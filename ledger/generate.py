@@ -0,0 +1,260 @@
+import decimal
+import itertools
+import random
+import uuid
+from datetime import date, timedelta
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from acctmgr.models import Account, AccountTypes
+from currencymgr.models import Currency
+from .models import (
+    Change,
+    ChangeKind,
+    ClosedPeriod,
+    LedgerVersion,
+    TransactionDetail,
+    TransactionEntry,
+    TransactionState,
+)
+from .signals import entries_added
+
+# Share of generated accounts of each type
+TYPE_WEIGHTS = {
+    AccountTypes.ASSET: 20,
+    AccountTypes.LIABILITY: 10,
+    AccountTypes.EQUITY: 5,
+    AccountTypes.REVENUE: 15,
+    AccountTypes.EXPENSE: 50,
+}
+
+PAYEES = (
+    "Grocery Mart",
+    "Corner Cafe",
+    "City Utilities",
+    "Gas Station",
+    "Payroll",
+    "Rent",
+    "Phone Bill",
+    "Pharmacy",
+    "Hardware Store",
+    "Bookshop",
+    "Streaming Service",
+    "Insurance Premium",
+    "Restaurant",
+    "Transfer",
+    "Interest",
+    "Gym Membership",
+)
+
+
+def parse_splits(spec: str) -> dict[int, float]:
+    """Parse a split distribution like "2=80,3=15,5=5" into {splits: weight}
+
+    Raises:
+    ValueError -- The spec is malformed or has fewer than two splits
+    """
+    weights = {}
+    for part in spec.split(","):
+        splits, _, weight = part.partition("=")
+        weights[int(splits)] = float(weight or 1)
+    if min(weights) < 2 or max(weights) > 20:
+        raise ValueError("Transactions need between 2 and 20 splits.")
+    return weights
+
+
+def generate_accounts(
+    rng: random.Random, count: int, depth: int, currencies: list[Currency]
+) -> list[Account]:
+    """Create `count` accounts in trees up to `depth` levels deep
+
+    Accounts with children become placeholders. Returns the leaf accounts.
+    """
+    types = list(TYPE_WEIGHTS)
+    # (type, parent index or None, level), one root per type first
+    nodes = [(acct_type, None, 0) for acct_type in types[: min(count, len(types))]]
+    while len(nodes) < count:
+        acct_type = rng.choices(types, weights=list(TYPE_WEIGHTS.values()))[0]
+        parents = [
+            i
+            for i, (t, _, level) in enumerate(nodes)
+            if t == acct_type and level < depth - 1
+        ]
+        parent = rng.choice(parents) if parents else None
+        nodes.append((acct_type, parent, 0 if parent is None else nodes[parent][2] + 1))
+
+    has_children = {parent for _, parent, _ in nodes if parent is not None}
+    accounts = [None] * len(nodes)
+    # Insert a level at a time so every parent has its pk before its children
+    for level in range(depth):
+        batch = []
+        for i, (acct_type, parent, node_level) in enumerate(nodes):
+            if node_level != level:
+                continue
+            account = Account(
+                name=f"{acct_type.label} {i}"[:20],
+                currency=currencies[0]
+                if rng.random() < 0.8
+                else rng.choice(currencies),
+                acct_type=acct_type,
+                description="Generated",
+                parent=None if parent is None else accounts[parent],
+                placeholder=i in has_children,
+            )
+            batch.append((i, account))
+        Account.objects.bulk_create([account for _, account in batch])
+        for i, account in batch:
+            accounts[i] = account
+    # bulk_create skips Account.save and its signals
+    Change.objects.record(
+        ChangeKind.INSERT, Account.objects.filter(pk__in=[a.pk for a in accounts])
+    )
+    LedgerVersion.objects.bump(LedgerVersion.ACCOUNTS)
+    return [account for i, account in enumerate(accounts) if i not in has_children]
+
+
+DETAIL_FIELDS = ("id", "description", "xact_date", "state", "uuid")
+ENTRY_FIELDS = ("id", "transaction_id", "account", "memo", "price", "amount", "uuid")
+ONE = decimal.Decimal(1)
+
+
+def _insert_sql(model, fields: tuple[str, ...]) -> str:
+    columns = ", ".join(
+        connection.ops.quote_name(model._meta.get_field(field).column)
+        for field in fields
+    )
+    placeholders = ", ".join(["%s"] * len(fields))
+    return f"INSERT INTO {model._meta.db_table} ({columns}) VALUES ({placeholders})"
+
+
+def _amount(rng: random.Random) -> decimal.Decimal:
+    return max(
+        decimal.Decimal("0.01"),
+        decimal.Decimal(str(round(rng.lognormvariate(3, 1.2), 2))),
+    )
+
+
+@transaction.atomic
+def generate_ledger(
+    accounts: int = 200,
+    depth: int = 3,
+    currencies: int = 2,
+    years: int = 3,
+    entries_per_day: float = 50,
+    splits: dict[int, float] | None = None,
+    end_date: date | None = None,
+    seed: int = 0,
+    batch_size: int = 10000,
+) -> dict:
+    """Fill the database with a synthetic ledger
+
+    Rows are built as tuples and inserted with preassigned ids, a batch at a
+    time, and the derived data is updated once at the end through the
+    entries_added signal.
+
+    Returns:
+    {"accounts": int, "transactions": int, "entries": int}
+
+    Raises:
+    ValueError -- The generated dates overlap a closed period
+    """
+    rng = random.Random(seed)
+    splits = splits or {2: 80, 3: 15, 5: 5}
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=365 * years - 1)
+    ClosedPeriod.objects.ensure_open([start_date])
+
+    existing = Currency.objects.count()
+    generated = [
+        Currency(symbol=f"G{existing + i}", full_name=f"Generated {existing + i}")
+        for i in range(currencies)
+    ]
+    Currency.objects.bulk_create(generated)
+    Change.objects.record(
+        ChangeKind.INSERT,
+        Currency.objects.filter(pk__in=[currency.pk for currency in generated]),
+    )
+    leaves = generate_accounts(rng, accounts, depth, generated)
+    if len(leaves) < 2:
+        raise ValueError("At least two leaf accounts are required.")
+
+    leaf_ids = [account.pk for account in leaves]
+    split_counts, split_weights = list(splits), list(splits.values())
+    mean_splits = sum(s * w for s, w in splits.items()) / sum(split_weights)
+    descriptions = [f"{payee} {n}" for payee in PAYEES for n in range(1, 33)]
+    # A few payees account for most transactions, as in a real ledger
+    description_weights = list(
+        itertools.accumulate(1 / (i + 1) for i in range(len(descriptions)))
+    )
+    states = list(TransactionState)
+    # UUIDs as the database driver takes them, bypassing the field
+    new_uuid = (
+        uuid.uuid4
+        if connection.features.has_native_uuid_field
+        else lambda: uuid.uuid4().hex
+    )
+
+    first_detail = (
+        TransactionDetail.objects.order_by("-pk").values_list("pk", flat=True).first()
+        or 0
+    ) + 1
+    next_detail = first_detail
+    next_entry = (
+        TransactionEntry.objects.order_by("-pk").values_list("pk", flat=True).first()
+        or 0
+    ) + 1
+    details, entries = [], []
+    total_transactions = total_entries = 0
+
+    def flush():
+        # Plain tuples through executemany, as building millions of model
+        # instances for bulk_create costs more than the inserts themselves
+        with connection.cursor() as cursor:
+            cursor.executemany(_insert_sql(TransactionDetail, DETAIL_FIELDS), details)
+            cursor.executemany(_insert_sql(TransactionEntry, ENTRY_FIELDS), entries)
+        details.clear()
+        entries.clear()
+
+    day = start_date
+    while day <= end_date:
+        expected = entries_per_day / mean_splits
+        count = int(expected) + (rng.random() < expected % 1)
+        age = (end_date - day).days
+        for _ in range(count):
+            state = TransactionState.RECONCILED if age > 60 else rng.choice(states)
+            description = rng.choices(descriptions, cum_weights=description_weights)[0]
+            details.append((next_detail, description, day, state, new_uuid()))
+            n = min(rng.choices(split_counts, split_weights)[0], len(leaves))
+            amounts = [_amount(rng) for _ in range(n - 1)]
+            amounts.append(-sum(amounts))
+            for account_id, amount in zip(rng.sample(leaf_ids, n), amounts):
+                entries.append(
+                    (next_entry, next_detail, account_id, "", ONE, amount, new_uuid())
+                )
+                next_entry += 1
+            next_detail += 1
+            total_transactions += 1
+            total_entries += n
+        if len(entries) >= batch_size:
+            flush()
+        day += timedelta(days=1)
+    flush()
+
+    # Explicit ids leave PostgreSQL's sequences behind
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+            no_style(), [TransactionDetail, TransactionEntry]
+        ):
+            cursor.execute(sql)
+    Change.objects.record(
+        ChangeKind.INSERT, TransactionDetail.objects.filter(pk__gte=first_detail)
+    )
+    entries_added.send(
+        sender=TransactionEntry,
+        entries=TransactionEntry.objects.filter(transaction_id__gte=first_detail),
+    )
+    return {
+        "accounts": accounts,
+        "transactions": total_transactions,
+        "entries": total_entries,
+    }
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+import datetime
+
+from ledger.closing import close_period
+
+
+class Command(BaseCommand):
+    help = "Close the ledger through a date, snapshotting every account balance"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "end_date",
+            type=datetime.date.fromisoformat,
+            help="Last day of the period to close (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--archive",
+            action="store_true",
+            help="Move the closed transactions to the archive tables",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, end_date, archive, batch_size, **options):
+        try:
+            period = close_period(end_date, archive=archive, batch_size=batch_size)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"Closed through {period.end_date} with "
+            f"{period.snapshots.count()} account snapshots"
+        )
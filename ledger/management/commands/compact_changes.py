@@ -0,0 +1,24 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ledger.changes import compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Drop the ledger changes past the retention window that a later change "
+        "of the same row supersedes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.CHANGE_LOG_RETENTION_DAYS,
+            help="Retention window, CHANGE_LOG_RETENTION_DAYS by default",
+        )
+
+    def handle(self, *args, days, **options):
+        dropped = compact(timedelta(days=days))
+        self.stdout.write(f"Dropped {dropped} superseded changes")
@@ -0,0 +1,41 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+
+from acctmgr.models import Account
+from ledger.export import FORMATS, export_entries
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the journal, or an account's register, as CSV or JSON lines, "
+        "streaming it in constant memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--account", type=int, help="Account id of a register")
+        parser.add_argument("--start", type=datetime.date.fromisoformat)
+        parser.add_argument("--end", type=datetime.date.fromisoformat)
+        parser.add_argument(
+            "--no-archived",
+            action="store_true",
+            help="Leave out the entries archived by period closes",
+        )
+        parser.add_argument("--output", help="File to write, instead of stdout")
+
+    def handle(
+        self, *args, format, account, start, end, no_archived, output, **options
+    ):
+        if account is not None:
+            try:
+                account = Account.objects.get(pk=account)
+            except Account.DoesNotExist:
+                raise CommandError(f"Account {account} does not exist.")
+        chunks = export_entries(format, account, start, end, archived=not no_archived)
+        if output is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(chunk)
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+import datetime
+import time
+
+from ledger.generate import generate_ledger, parse_splits
+
+
+class Command(BaseCommand):
+    help = (
+        "Add a synthetic ledger of the given size to the database, for "
+        "benchmarking. Point it at a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--accounts", type=int, default=200)
+        parser.add_argument("--depth", type=int, default=3)
+        parser.add_argument("--currencies", type=int, default=2)
+        parser.add_argument("--years", type=int, default=3)
+        parser.add_argument("--entries-per-day", type=float, default=50)
+        parser.add_argument(
+            "--entries",
+            type=int,
+            help="Total entries to generate, overrides --entries-per-day",
+        )
+        parser.add_argument(
+            "--splits",
+            default="2=80,3=15,5=5",
+            help="Distribution of splits per transaction as splits=weight pairs",
+        )
+        parser.add_argument(
+            "--end-date",
+            type=datetime.date.fromisoformat,
+            help="Last day of generated transactions (YYYY-MM-DD), default today",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, entries, years, entries_per_day, **options):
+        if entries:
+            entries_per_day = entries / (365 * years)
+        start = time.perf_counter()
+        try:
+            result = generate_ledger(
+                accounts=options["accounts"],
+                depth=options["depth"],
+                currencies=options["currencies"],
+                years=years,
+                entries_per_day=entries_per_day,
+                splits=parse_splits(options["splits"]),
+                end_date=options["end_date"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"Generated {result['accounts']} accounts, {result['transactions']} "
+            f"transactions and {result['entries']} entries in "
+            f"{time.perf_counter() - start:.1f}s"
+        )
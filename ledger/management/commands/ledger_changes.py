@@ -0,0 +1,37 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ledger.changes import MAX_PAGE_SIZE, PAGE_SIZE, changes_since
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the ledger's changes after a sequence number as JSON lines, a "
+        "page at a time, and the sequence number to continue from to stderr"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=int, default=0)
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=PAGE_SIZE,
+            help=f"Changes per page, at most {MAX_PAGE_SIZE}",
+        )
+        parser.add_argument(
+            "--all", action="store_true", help="Keep reading pages to the end"
+        )
+
+    def handle(self, *args, since, limit, all, **options):
+        while True:
+            try:
+                page = changes_since(since, limit)
+            except ValueError as e:
+                raise CommandError(e)
+            for change in page.changes:
+                self.stdout.write(json.dumps(change, cls=DjangoJSONEncoder))
+            since = page.next
+            if not (all and page.more):
+                break
+        self.stderr.write(f"next: {since}, more: {str(page.more).lower()}")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ledger.models import ClearedBalance, MonthlyRollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the monthly per-account rollups and the cleared balances from "
+        "the ledger entries"
+    )
+
+    def handle(self, *args, **options):
+        cells = MonthlyRollup.objects.rebuild()
+        self.stdout.write(f"Rebuilt {cells} monthly rollup cells")
+        accounts = ClearedBalance.objects.rebuild()
+        self.stdout.write(f"Rebuilt the cleared balances of {accounts} accounts")
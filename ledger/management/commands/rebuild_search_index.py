@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ledger import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the transaction search index from the ledger"
+
+    def handle(self, *args, **options):
+        count = search.rebuild()
+        self.stdout.write(f"Indexed {count} transactions")
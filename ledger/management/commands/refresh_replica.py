@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from privatefinance.routers import REPLICA, replica_configured
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite database to the read replica file with the online "
+        "backup API. PostgreSQL replicas are kept up to date by streaming "
+        "replication instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep refreshing every this many seconds instead of once",
+        )
+
+    def refresh(self):
+        primary = connections["default"]
+        primary.ensure_connection()
+        # Back up to a temporary file and swap it in, so readers of the replica
+        # never see a half copied database
+        target = connections[REPLICA].settings_dict["NAME"]
+        staging = f"{target}.refresh"
+        start = time.perf_counter()
+        copy = sqlite3.connect(staging)
+        try:
+            primary.connection.backup(copy)
+            # Readers only, so there's no need for the primary's WAL
+            copy.execute("PRAGMA journal_mode=DELETE")
+        except sqlite3.Error as e:
+            # The replica stays as it was
+            copy.close()
+            os.remove(staging)
+            raise CommandError(f"Copying the database failed: {e}")
+        finally:
+            copy.close()
+        # Open connections keep reading the old copy until they reconnect
+        connections[REPLICA].close()
+        os.replace(staging, target)
+        self.stdout.write(
+            f"Refreshed the replica in {time.perf_counter() - start:.2f}s"
+        )
+
+    def handle(self, *args, interval, **options):
+        if not replica_configured():
+            raise CommandError("No replica database is configured.")
+        if connections["default"].vendor != "sqlite":
+            raise CommandError("Only SQLite replicas are refreshed by copying.")
+        self.refresh()
+        while interval:
+            time.sleep(interval)
+            self.refresh()
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger.closing import reopen_period
+
+
+class Command(BaseCommand):
+    help = "Reopen the latest closed period, restoring any archived transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, batch_size, **options):
+        try:
+            period = reopen_period(batch_size=batch_size)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Reopened the period ending {period.end_date}")
@@ -0,0 +1,111 @@
+import json
+import multiprocessing
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from acctmgr.models import Account
+from ledger.forms import TransactionCreateForm
+from ledger.models import TransactionDetail
+
+
+def _post(job: tuple[str, int, int, int, int]) -> tuple[int, list[str]]:
+    """Post `count` transactions through the form, in a worker process"""
+    run_id, worker, count, debit_account, credit_account = job
+    posted, errors = 0, []
+    for i in range(count):
+        form = TransactionCreateForm(
+            {
+                "date": "2025-01-01",
+                "description": f"stress {run_id} {worker} {i}",
+                "amount_1": "1.00",
+                "account_1": debit_account,
+                "amount_2": "-1.00",
+                "account_2": credit_account,
+            }
+        )
+        try:
+            if not form.is_valid():
+                errors.append(str(form.errors))
+                continue
+            form.save()
+            posted += 1
+        except Exception as e:
+            errors.append(repr(e))
+    connections.close_all()
+    return posted, errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Post transactions from several processes at once and check that none "
+        "are lost or fail. Writes to the configured database, so point it at a "
+        "throwaway copy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--transactions", type=int, default=10000)
+        parser.add_argument("--processes", type=int, default=8)
+        parser.add_argument("--debit-account", type=int, help="Default: first leaf")
+        parser.add_argument("--credit-account", type=int, help="Default: second leaf")
+        parser.add_argument(
+            "--json",
+            help="Append the result as a JSON line to this file, to compare "
+            "backends and configurations across runs",
+        )
+
+    def handle(self, *args, transactions, processes, **options):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            raise CommandError("The stress test needs an on-disk database.")
+        leaves = list(
+            Account.objects.filter(placeholder=False)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:2]
+        )
+        debit = options["debit_account"] or (leaves[0] if leaves else None)
+        credit = options["credit_account"] or (leaves[1] if len(leaves) > 1 else None)
+        if debit is None or credit is None:
+            raise CommandError("Two non placeholder accounts are required.")
+
+        run_id = uuid.uuid4().hex[:8]
+        per_worker, remainder = divmod(transactions, processes)
+        jobs = [
+            (run_id, worker, per_worker + (worker < remainder), debit, credit)
+            for worker in range(processes)
+        ]
+        # Children must open their own connections rather than share ours
+        connections.close_all()
+        start = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(processes) as pool:
+            results = pool.map(_post, jobs)
+        elapsed = time.perf_counter() - start
+
+        posted = sum(count for count, _ in results)
+        errors = [error for _, worker_errors in results for error in worker_errors]
+        stored = TransactionDetail.objects.filter(
+            description__startswith=f"stress {run_id} "
+        ).count()
+        self.stdout.write(
+            f"{connection.vendor}: posted {posted}/{transactions} transactions "
+            f"from {processes} processes in {elapsed:.2f}s "
+            f"({posted / elapsed:.0f} transactions/s), {stored} stored, "
+            f"{len(errors)} failed"
+        )
+        if options["json"]:
+            with open(options["json"], "a") as f:
+                result = {
+                    "vendor": connection.vendor,
+                    "processes": processes,
+                    "transactions": transactions,
+                    "posted": posted,
+                    "stored": stored,
+                    "failed": len(errors),
+                    "seconds": round(elapsed, 3),
+                    "per_second": round(posted / elapsed, 1),
+                }
+                f.write(json.dumps(result) + "\n")
+        for error in errors[:10]:
+            self.stderr.write(error)
+        if errors or stored != transactions:
+            raise CommandError("Some transactions failed or were lost.")
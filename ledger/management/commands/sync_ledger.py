@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger.sync import sync
+
+
+class Command(BaseCommand):
+    help = (
+        "Exchange the ledger changes made since the last sync with another "
+        "instance, given the URL of its sync API (…/ledger/api/sync)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url")
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument(
+            "--from-copy",
+            action="store_true",
+            help=(
+                "On the first sync, skip the changes this database was copied "
+                "from the peer with"
+            ),
+        )
+
+    def handle(self, *args, url, timeout, from_copy, **options):
+        try:
+            totals = sync(url, timeout, from_copy)
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+        for way, result in totals.items():
+            self.stdout.write(
+                f"{way.capitalize()} {result['applied']} changes, kept "
+                f"{result['kept']}, rejected {len(result['rejected'])} "
+                f"({result['bytes']} bytes)"
+            )
+            for rejected in result["rejected"]:
+                self.stderr.write(f"  {rejected['uuid']}: {rejected['error']}")
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("acctmgr", "0001_initial"),
+        ("ledger", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField()),
+                (
+                    "debit",
+                    models.DecimalField(decimal_places=10, default=0, max_digits=19),
+                ),
+                (
+                    "credit",
+                    models.DecimalField(decimal_places=10, default=0, max_digits=19),
+                ),
+                ("entry_count", models.PositiveIntegerField(default=0)),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="acctmgr.account",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("account", "month"), name="unique_account_month"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("acctmgr", "0001_initial"),
+        ("ledger", "0002_monthlyrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedTransactionDetail",
+            fields=[
+                (
+                    "id",
+                    models.BigIntegerField(
+                        primary_key=True, serialize=False, verbose_name="transaction id"
+                    ),
+                ),
+                ("description", models.CharField(max_length=100)),
+                ("xact_date", models.DateField()),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[("N", "New"), ("C", "Cleared"), ("R", "Reconciled")],
+                        max_length=1,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ClosedPeriod",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("end_date", models.DateField(unique=True)),
+                ("closed_at", models.DateTimeField(auto_now_add=True)),
+                ("archived", models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedTransactionEntry",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("memo", models.CharField(blank=True, max_length=256)),
+                ("price", models.DecimalField(decimal_places=10, max_digits=19)),
+                ("amount", models.DecimalField(decimal_places=10, max_digits=19)),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.RESTRICT,
+                        to="acctmgr.account",
+                    ),
+                ),
+                (
+                    "transaction_id",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="ledger.archivedtransactiondetail",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="archivedtransactiondetail",
+            name="period",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.RESTRICT, to="ledger.closedperiod"
+            ),
+        ),
+        migrations.CreateModel(
+            name="AccountSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("balance", models.DecimalField(decimal_places=10, max_digits=19)),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.RESTRICT,
+                        to="acctmgr.account",
+                    ),
+                ),
+                (
+                    "period",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshots",
+                        to="ledger.closedperiod",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("period", "account"), name="unique_period_account"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from ledger.search import SEARCH_TABLE, create_table
+
+
+def create(apps, schema_editor):
+    create_table(schema_editor)
+
+
+def drop(apps, schema_editor):
+    schema_editor.execute(f"DROP TABLE {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ledger", "0003_period_close"),
+    ]
+
+    operations = [
+        migrations.RunPython(create, drop),
+    ]
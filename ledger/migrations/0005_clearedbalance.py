@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def populate(apps, schema_editor):
+    TransactionEntry = apps.get_model("ledger", "TransactionEntry")
+    ClearedBalance = apps.get_model("ledger", "ClearedBalance")
+    totals = (
+        TransactionEntry.objects.exclude(transaction_id__state="N")
+        .values("account_id")
+        .annotate(
+            cleared=Sum("amount", filter=Q(transaction_id__state="C")),
+            reconciled=Sum("amount", filter=Q(transaction_id__state="R")),
+        )
+        .order_by()
+    )
+    ClearedBalance.objects.bulk_create(
+        (
+            ClearedBalance(
+                account_id=row["account_id"],
+                cleared=row["cleared"] or 0,
+                reconciled=row["reconciled"] or 0,
+            )
+            for row in totals
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("acctmgr", "0001_initial"),
+        ("ledger", "0004_transactionsearch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClearedBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "cleared",
+                    models.DecimalField(decimal_places=10, default=0, max_digits=19),
+                ),
+                (
+                    "reconciled",
+                    models.DecimalField(decimal_places=10, default=0, max_digits=19),
+                ),
+                (
+                    "account",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cleared_balance",
+                        to="acctmgr.account",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:30
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+# Parents before children, so a reader replaying the log from the start
+# meets them in that order
+BACKFILLED = (
+    ("currencymgr", "Currency"),
+    ("acctmgr", "Account"),
+    ("ledger", "TransactionDetail"),
+    ("ledger", "TransactionEntry"),
+)
+
+
+def backfill(apps, schema_editor):
+    """An insert for every existing row, so the log read from the start
+    holds the whole ledger"""
+    connection = schema_editor.connection
+    table = apps.get_model("ledger", "Change")._meta.db_table
+    recorded_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        for app_label, model_name in BACKFILLED:
+            model = apps.get_model(app_label, model_name)
+            cursor.execute(
+                f"INSERT INTO {table} (model, object_id, kind, recorded_at) "
+                f"SELECT %s, id, 'I', %s FROM {model._meta.db_table} ORDER BY id",
+                [model._meta.label_lower, recorded_at],
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("acctmgr", "0001_initial"),
+        ("currencymgr", "0001_initial"),
+        ("ledger", "0006_ledgerversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Change",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        primary_key=True, serialize=False, verbose_name="sequence"
+                    ),
+                ),
+                ("model", models.CharField(max_length=40)),
+                ("object_id", models.BigIntegerField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("I", "Insert"), ("U", "Update"), ("D", "Delete")],
+                        max_length=1,
+                    ),
+                ),
+                (
+                    "recorded_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["model", "object_id"], name="change_object_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
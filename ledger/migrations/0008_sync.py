@@ -0,0 +1,122 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:05
+
+import uuid
+from django.db import migrations, models
+
+# Models given a uuid here, and the archive tables keeping theirs
+ROWS = ("TransactionDetail", "TransactionEntry")
+ARCHIVED = {
+    "TransactionDetail": "ArchivedTransactionDetail",
+    "TransactionEntry": "ArchivedTransactionEntry",
+}
+
+
+def populate(apps, schema_editor):
+    connection = schema_editor.connection
+    random_uuid = (
+        "gen_random_uuid()"
+        if connection.vendor == "postgresql"
+        else "lower(hex(randomblob(16)))"
+    )
+    with connection.cursor() as cursor:
+        for name in (*ROWS, *ARCHIVED.values()):
+            table = apps.get_model("ledger", name)._meta.db_table
+            cursor.execute(f"UPDATE {table} SET uuid = {random_uuid}")
+
+
+def log_uuids(apps, schema_editor):
+    """The uuid of each logged row that still exists, live or archived"""
+    change = apps.get_model("ledger", "Change")._meta.db_table
+    models = {
+        "currencymgr.currency": [apps.get_model("currencymgr", "Currency")],
+        "acctmgr.account": [apps.get_model("acctmgr", "Account")],
+        **{
+            f"ledger.{name.lower()}": [
+                apps.get_model("ledger", name),
+                apps.get_model("ledger", ARCHIVED[name]),
+            ]
+            for name in ROWS
+        },
+    }
+    with schema_editor.connection.cursor() as cursor:
+        for label, sources in models.items():
+            lookups = ", ".join(
+                f"(SELECT uuid FROM {model._meta.db_table} "
+                f"WHERE id = {change}.object_id)"
+                for model in sources
+            )
+            cursor.execute(
+                f"UPDATE {change} SET object_uuid = COALESCE({lookups}, NULL) "
+                "WHERE model = %s",
+                [label],
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("acctmgr", "0002_account_uuid"),
+        ("currencymgr", "0002_currency_uuid"),
+        ("ledger", "0007_change"),
+    ]
+
+    operations = [
+        *(
+            migrations.AddField(
+                model_name=name.lower(),
+                name="uuid",
+                field=models.UUIDField(null=True),
+            )
+            for name in (*ROWS, *ARCHIVED.values())
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+        *(
+            migrations.AlterField(
+                model_name=name.lower(),
+                name="uuid",
+                field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+            )
+            for name in ROWS
+        ),
+        *(
+            migrations.AlterField(
+                model_name=name.lower(),
+                name="uuid",
+                field=models.UUIDField(unique=True),
+            )
+            for name in ARCHIVED.values()
+        ),
+        migrations.AddField(
+            model_name="change",
+            name="object_uuid",
+            field=models.UUIDField(null=True),
+        ),
+        migrations.AddField(
+            model_name="change",
+            name="origin",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.RunPython(log_uuids, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="change",
+            index=models.Index(fields=["object_uuid"], name="change_uuid_idx"),
+        ),
+        migrations.CreateModel(
+            name="SyncPeer",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(unique=True)),
+                ("name", models.CharField(max_length=100)),
+                ("pulled_through", models.BigIntegerField(default=0)),
+                ("pushed_through", models.BigIntegerField(default=0)),
+                ("synced_at", models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:21
+
+from django.db import migrations, models
+
+# The archive table of each logged model period closes archive
+ARCHIVED = {
+    "ledger.transactiondetail": "ArchivedTransactionDetail",
+    "ledger.transactionentry": "ArchivedTransactionEntry",
+}
+
+
+def relabel_archived(apps, schema_editor):
+    """Log the rows still archived as archived rather than deleted"""
+    Change = apps.get_model("ledger", "Change")
+    for label, name in ARCHIVED.items():
+        Change.objects.filter(
+            model=label,
+            kind="D",
+            origin="",
+            object_uuid__in=apps.get_model("ledger", name).objects.values("uuid"),
+        ).update(kind="A")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ledger", "0008_sync"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="change",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("I", "Insert"),
+                    ("U", "Update"),
+                    ("D", "Delete"),
+                    ("A", "Archive"),
+                    ("R", "Restore"),
+                ],
+                max_length=1,
+            ),
+        ),
+        migrations.RunPython(relabel_archived, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,16 @@
-from django.db import models, transaction
-from datetime import datetime
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from datetime import date, datetime
 from acctmgr.models import Account
+from privatefinance.routers import primary_reads
+from .signals import entries_added
+import contextlib
+import contextvars
 import decimal
+import uuid
 
 
 class TransactionState(models.TextChoices):
@@ -17,22 +26,101 @@ class TransactionDetail(models.Model):
     state = models.CharField(
         max_length=1, choices=TransactionState, default=TransactionState.NEW
     )
+    # The same on every instance the ledger is synced to
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
 
 
 class TransactionManager(models.Manager):
     @transaction.atomic
     def create_balanced_transaction(self, entries: list["TransactionEntry"]):
         transaction_id = entries[0].transaction_id
+        ClosedPeriod.objects.ensure_open([transaction_id.xact_date])
         for entry in entries:
             if entry.transaction_id != transaction_id:
                 raise ValueError("All entries must have the same transaction id.")
-            entry.save()
+            entry.quantize()
+        self.bulk_create(entries)
 
         total = decimal.Decimal(0)
         for xact in self.filter(transaction_id=transaction_id):
             total += decimal.Decimal(xact.amount)
         if total != decimal.Decimal(0):
             raise ValueError("Transaction is not balanced.")
+        entries_added.send(
+            sender=TransactionEntry,
+            entries=self.filter(transaction_id=transaction_id),
+        )
+
+    @transaction.atomic
+    def bulk_create_transactions(
+        self, transactions: list[tuple[TransactionDetail, list["TransactionEntry"]]]
+    ) -> list[TransactionDetail]:
+        """Insert many balanced transactions with a handful of queries
+
+        The entries must have their account (and its currency) loaded, and
+        are attached to their detail here, so transaction_id can be left unset.
+
+        Raises:
+        ValueError -- A transaction has no entries or is not balanced
+        """
+        if not transactions:
+            return []
+        ClosedPeriod.objects.ensure_open(
+            [detail.xact_date for detail, _ in transactions]
+        )
+        for detail, xact_entries in transactions:
+            if not xact_entries:
+                raise ValueError("A transaction needs at least one entry.")
+            for entry in xact_entries:
+                entry.quantize()
+            if sum(entry.amount for entry in xact_entries) != 0:
+                raise ValueError("Transaction is not balanced.")
+        details = TransactionDetail.objects.bulk_create(
+            [detail for detail, _ in transactions], batch_size=1000
+        )
+        Change.objects.record(
+            ChangeKind.INSERT,
+            TransactionDetail.objects.filter(pk__in=[detail.pk for detail in details]),
+        )
+        entries = []
+        for detail, (_, xact_entries) in zip(details, transactions):
+            for entry in xact_entries:
+                entry.transaction_id = detail
+                entries.append(entry)
+        self.bulk_create(entries, batch_size=1000)
+        entries_added.send(
+            sender=TransactionEntry,
+            entries=self.filter(transaction_id__in=[detail.pk for detail in details]),
+        )
+        return details
+
+    def account_balances(self, as_of: date | None = None) -> dict[int, decimal.Decimal]:
+        """Balance of every account, starting from the latest closed period
+
+        Only entries after the closing snapshot are summed, so the cost
+        doesn't grow with closed (and possibly archived) history. `as_of`
+        must not be before the end of the latest closed period. Balances are
+        rounded to the places their currency trades in.
+        """
+        balances = {}
+        entries = self.order_by()
+        period = ClosedPeriod.objects.order_by("-end_date").first()
+        if period is not None:
+            if as_of is not None and as_of < period.end_date:
+                raise ValueError(f"Balances before {period.end_date} are closed.")
+            balances = dict(period.snapshots.values_list("account_id", "balance"))
+            entries = entries.filter(transaction_id__xact_date__gt=period.end_date)
+        if as_of is not None:
+            entries = entries.filter(transaction_id__xact_date__lte=as_of)
+        # SQLite sums in floating point, so round each balance back to what
+        # its currency trades in before anyone compares them
+        for account_id, places, total in entries.values_list(
+            "account_id", "account__currency__fraction_traded"
+        ).annotate(Sum("amount")):
+            balances[account_id] = (balances.get(account_id, 0) + total).quantize(
+                decimal.Decimal(1).scaleb(-places)
+            )
+        return balances
 
 
 class TransactionEntry(models.Model):
@@ -43,9 +131,11 @@ class TransactionEntry(models.Model):
     memo = models.CharField(max_length=256, blank=True)
     price = models.DecimalField(decimal_places=10, max_digits=19, default=1)
     amount = models.DecimalField(decimal_places=10, max_digits=19)
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     objects = TransactionManager()
 
-    def save(self, *args, **kwargs):
+    def quantize(self):
+        """Round the amount and price to the fraction traded by the account"""
         self.amount = decimal.Decimal(self.amount).quantize(
             decimal.Decimal(str(1.0 / (10**self.account.currency.fraction_traded))),
             rounding=decimal.ROUND_HALF_DOWN,
@@ -54,4 +144,632 @@ class TransactionEntry(models.Model):
             decimal.Decimal(str(1.0 / (10**self.account.currency.fraction_traded))),
             rounding=decimal.ROUND_HALF_DOWN,
         )
+
+    def save(self, *args, **kwargs):
+        self.quantize()
         super().save(*args, **kwargs)
+
+
+BALANCES_CACHE_KEY = "ledger:balances:{}"
+# Balances of versions moved past are left to expire
+BALANCES_CACHE_SECONDS = 24 * 60 * 60
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+class MonthlyRollupQuerySet(models.QuerySet):
+    def between(self, start: date | None = None, end: date | None = None):
+        """Restrict the cells to the months containing start through end"""
+        qs = self
+        if start is not None:
+            qs = qs.filter(month__gte=month_start(start))
+        if end is not None:
+            qs = qs.filter(month__lte=month_start(end))
+        return qs
+
+    def totals(self) -> dict:
+        """Sum the selected cells
+
+        Returns:
+        {"debit": Decimal, "credit": Decimal, "entry_count": int, "balance": Decimal}
+        """
+        totals = self.aggregate(
+            debit=Sum("debit"), credit=Sum("credit"), entry_count=Sum("entry_count")
+        )
+        debit = totals["debit"] or decimal.Decimal(0)
+        credit = totals["credit"] or decimal.Decimal(0)
+        return {
+            "debit": debit,
+            "credit": credit,
+            "entry_count": totals["entry_count"] or 0,
+            "balance": debit - credit,
+        }
+
+
+class MonthlyRollupManager(models.Manager):
+    def _cells(self, entries: models.QuerySet) -> models.QuerySet:
+        """Aggregate entries into (account, month) cells in the database"""
+        return (
+            entries.order_by()
+            .values("account_id", month=TruncMonth("transaction_id__xact_date"))
+            .annotate(
+                debit=Sum("amount", filter=Q(amount__gt=0)),
+                credit=Sum("amount", filter=Q(amount__lt=0)),
+                entry_count=Count("pk"),
+            )
+        )
+
+    @transaction.atomic
+    def apply(self, entries: models.QuerySet, sign: int = 1):
+        """Add (sign=1) or subtract (sign=-1) the entries from the cube
+
+        Must be called while the entries exist, so after inserting them or
+        before deleting them.
+        """
+        deltas = {}
+        for cell in self._cells(entries):
+            deltas[(cell["account_id"], cell["month"])] = (
+                sign * (cell["debit"] or 0),
+                sign * -(cell["credit"] or 0),
+                sign * cell["entry_count"],
+            )
+        self._add(deltas)
+
+    @transaction.atomic
+    def move(self, entries: models.QuerySet, account: Account):
+        """Move the entries' totals from their accounts' cells to the account's
+
+        Must be called before the entries' account is changed.
+        """
+        deltas = {}
+        for cell in self._cells(entries):
+            if cell["account_id"] == account.pk:
+                continue
+            delta = (cell["debit"] or 0, -(cell["credit"] or 0), cell["entry_count"])
+            deltas[(cell["account_id"], cell["month"])] = tuple(-x for x in delta)
+            moved = deltas.get((account.pk, cell["month"]), (0, 0, 0))
+            deltas[(account.pk, cell["month"])] = tuple(
+                x + y for x, y in zip(moved, delta)
+            )
+        self._add(deltas)
+
+    def _add(self, deltas: dict[tuple[int, date], tuple]):
+        """Add {(account id, month): (debit, credit, entry_count)} to the cube"""
+        if not deltas:
+            return
+
+        # Make sure every cell exists before locking them. Rows that don't exist
+        # can't be locked, so two writers creating the same cell would
+        # otherwise both insert it.
+        self.bulk_create(
+            [
+                self.model(account_id=account_id, month=month)
+                for account_id, month in deltas
+            ],
+            ignore_conflicts=True,
+        )
+        cells = self.select_for_update().filter(
+            account_id__in={account_id for account_id, _ in deltas},
+            month__in={month for _, month in deltas},
+        )
+        to_update, to_delete = [], []
+        for cell in cells:
+            if (cell.account_id, cell.month) not in deltas:
+                continue
+            debit, credit, entry_count = deltas[(cell.account_id, cell.month)]
+            cell.debit += debit
+            cell.credit += credit
+            cell.entry_count += entry_count
+            if cell.entry_count == 0:
+                to_delete.append(cell.pk)
+            else:
+                to_update.append(cell)
+        self.bulk_update(to_update, ["debit", "credit", "entry_count"])
+        self.filter(pk__in=to_delete).delete()
+
+    @transaction.atomic
+    def rebuild(self) -> int:
+        """Recompute the whole cube from the ledger
+
+        Returns the number of cells written
+        """
+        self.all().delete()
+        cells = [
+            self.model(
+                account_id=cell["account_id"],
+                month=cell["month"],
+                debit=cell["debit"] or 0,
+                credit=-(cell["credit"] or 0),
+                entry_count=cell["entry_count"],
+            )
+            for cell in self._cells(TransactionEntry.objects.all()).iterator()
+        ]
+        self.bulk_create(cells, batch_size=1000)
+        return len(cells)
+
+    def balances(self, version: int | None = None) -> dict[int, decimal.Decimal]:
+        """Current balance of every account with entries, in its own currency
+
+        Summed from the cube and cached under the ledger's version, which
+        every write moves on when it commits. Pass the version if it was
+        already read, to skip the query.
+        """
+        with primary_reads():
+            # Read before the sums, so balances summed as a write commits are
+            # cached under a version already out of date
+            if version is None:
+                [(version, _)] = LedgerVersion.objects.current([LedgerVersion.LEDGER])
+            key = BALANCES_CACHE_KEY.format(version)
+            balances = cache.get(key)
+            if balances is None:
+                balances = {
+                    row["account_id"]: row["debit"] - row["credit"]
+                    for row in self.values("account_id").annotate(
+                        debit=Sum("debit"), credit=Sum("credit")
+                    )
+                }
+                cache.set(key, balances, BALANCES_CACHE_SECONDS)
+        return balances
+
+    def subtree_totals(
+        self, account: Account, start: date | None = None, end: date | None = None
+    ) -> dict:
+        """Totals for an account and all of its descendants over a month range"""
+        subtree = Account.objects.get_subtree_ids([account.pk])[account.pk]
+        return self.filter(account_id__in=subtree).between(start, end).totals()
+
+
+class MonthlyRollup(models.Model):
+    """Debit/credit totals of one account for one month
+
+    Kept up to date by the ledger write paths, so month level reporting
+    never has to scan TransactionEntry.
+    """
+
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    # Always the first day of the month
+    month = models.DateField()
+    debit = models.DecimalField(decimal_places=10, max_digits=19, default=0)
+    # Stored as a positive number
+    credit = models.DecimalField(decimal_places=10, max_digits=19, default=0)
+    entry_count = models.PositiveIntegerField(default=0)
+    objects = MonthlyRollupManager.from_queryset(MonthlyRollupQuerySet)()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "month"], name="unique_account_month"
+            )
+        ]
+
+
+class ClearedBalanceManager(models.Manager):
+    def _totals(self, entries: models.QuerySet) -> models.QuerySet:
+        """Sum the entries of cleared and reconciled transactions per account"""
+        return (
+            entries.order_by()
+            .exclude(transaction_id__state=TransactionState.NEW)
+            .values("account_id")
+            .annotate(
+                cleared=Sum(
+                    "amount", filter=Q(transaction_id__state=TransactionState.CLEARED)
+                ),
+                reconciled=Sum(
+                    "amount",
+                    filter=Q(transaction_id__state=TransactionState.RECONCILED),
+                ),
+            )
+        )
+
+    def apply(self, entries: models.QuerySet, sign: int = 1):
+        """Add (sign=1) or subtract (sign=-1) the entries in their current state
+
+        Must be called while the entries exist, so after inserting them or
+        before deleting them, and around changing their transactions' state.
+        """
+        self._add(
+            {
+                row["account_id"]: (
+                    sign * (row["cleared"] or 0),
+                    sign * (row["reconciled"] or 0),
+                )
+                for row in self._totals(entries)
+            }
+        )
+
+    def move(self, entries: models.QuerySet, account: Account):
+        """Move the entries' balances from their accounts to the account
+
+        Must be called before the entries' account is changed.
+        """
+        deltas = {}
+        for row in self._totals(entries):
+            if row["account_id"] == account.pk:
+                continue
+            cleared, reconciled = row["cleared"] or 0, row["reconciled"] or 0
+            deltas[row["account_id"]] = (-cleared, -reconciled)
+            moved_cleared, moved_reconciled = deltas.get(account.pk, (0, 0))
+            deltas[account.pk] = (
+                moved_cleared + cleared,
+                moved_reconciled + reconciled,
+            )
+        self._add(deltas)
+
+    def change_state(self, entries: models.QuerySet, state: TransactionState):
+        """Account for the entries' transactions all moving to state
+
+        Must be called just before updating their state.
+        """
+        totals = (
+            entries.order_by()
+            .values("account_id")
+            .annotate(
+                total=Sum("amount"),
+                cleared=Sum(
+                    "amount", filter=Q(transaction_id__state=TransactionState.CLEARED)
+                ),
+                reconciled=Sum(
+                    "amount",
+                    filter=Q(transaction_id__state=TransactionState.RECONCILED),
+                ),
+            )
+        )
+        deltas = {}
+        for row in totals:
+            cleared = row["total"] if state == TransactionState.CLEARED else 0
+            reconciled = row["total"] if state == TransactionState.RECONCILED else 0
+            deltas[row["account_id"]] = (
+                cleared - (row["cleared"] or 0),
+                reconciled - (row["reconciled"] or 0),
+            )
+        self._add(deltas)
+
+    def _add(self, deltas: dict[int, tuple[decimal.Decimal, decimal.Decimal]]):
+        """Add {account id: (cleared, reconciled)} to the balances"""
+        deltas = {
+            account_id: delta for account_id, delta in deltas.items() if any(delta)
+        }
+        # Most writes only touch new transactions, so skip the savepoint too
+        if not deltas:
+            return
+        with transaction.atomic():
+            # As with the rollup cells, create missing rows before locking them
+            self.bulk_create(
+                [self.model(account_id=account_id) for account_id in deltas],
+                ignore_conflicts=True,
+            )
+            balances = list(self.select_for_update().filter(account_id__in=deltas))
+            for balance in balances:
+                cleared, reconciled = deltas[balance.account_id]
+                balance.cleared += cleared
+                balance.reconciled += reconciled
+            self.bulk_update(balances, ["cleared", "reconciled"])
+
+    @transaction.atomic
+    def rebuild(self) -> int:
+        """Recompute every account's balances from the ledger
+
+        Returns the number of accounts written
+        """
+        self.all().delete()
+        balances = [
+            self.model(
+                account_id=row["account_id"],
+                cleared=row["cleared"] or 0,
+                reconciled=row["reconciled"] or 0,
+            )
+            for row in self._totals(TransactionEntry.objects.all())
+        ]
+        self.bulk_create(balances, batch_size=1000)
+        return len(balances)
+
+
+class ClearedBalance(models.Model):
+    """The part of an account's balance that has cleared or been reconciled
+
+    Kept up to date by the ledger write paths and reconciliation, like
+    MonthlyRollup. The cleared balance shown against a bank statement is
+    cleared + reconciled.
+    """
+
+    account = models.OneToOneField(
+        Account, on_delete=models.CASCADE, related_name="cleared_balance"
+    )
+    # Sum of the entries whose transaction is CLEARED
+    cleared = models.DecimalField(decimal_places=10, max_digits=19, default=0)
+    # Sum of the entries whose transaction is RECONCILED
+    reconciled = models.DecimalField(decimal_places=10, max_digits=19, default=0)
+    objects = ClearedBalanceManager()
+
+    @property
+    def balance(self) -> decimal.Decimal:
+        return self.cleared + self.reconciled
+
+
+class ClosedPeriodManager(models.Manager):
+    def closed_through(self) -> date | None:
+        """The last date of the latest closed period"""
+        return self.aggregate(Max("end_date"))["end_date__max"]
+
+    def ensure_open(self, dates: list[date]):
+        """Raises ValueError if any of the dates fall in a closed period"""
+        closed_through = self.closed_through()
+        if closed_through is None:
+            return
+        for day in dates:
+            if isinstance(day, datetime):
+                day = day.date()
+            if day <= closed_through:
+                raise ValueError(
+                    f"Transactions on or before {closed_through} are in a closed period."
+                )
+
+
+class ClosedPeriod(models.Model):
+    """A closed (immutable) span of the ledger ending on end_date
+
+    Each account's closing balance is kept as an AccountSnapshot so live
+    queries can start from it instead of summing the whole history.
+    """
+
+    end_date = models.DateField(unique=True)
+    closed_at = models.DateTimeField(auto_now_add=True)
+    # Whether the closed entries were moved to the archive tables
+    archived = models.BooleanField(default=False)
+    objects = ClosedPeriodManager()
+
+    def __str__(self):
+        return f"Closed through {self.end_date}"
+
+
+class AccountSnapshot(models.Model):
+    """The balance of an account at the end of a closed period"""
+
+    period = models.ForeignKey(
+        ClosedPeriod, on_delete=models.CASCADE, related_name="snapshots"
+    )
+    account = models.ForeignKey(Account, on_delete=models.RESTRICT)
+    balance = models.DecimalField(decimal_places=10, max_digits=19)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "account"], name="unique_period_account"
+            )
+        ]
+
+
+class ArchivedTransactionDetail(models.Model):
+    """A TransactionDetail moved out of the live table by a period close"""
+
+    id = models.BigIntegerField("transaction id", primary_key=True)
+    period = models.ForeignKey(ClosedPeriod, on_delete=models.RESTRICT)
+    description = models.CharField(max_length=100)
+    xact_date = models.DateField()
+    state = models.CharField(max_length=1, choices=TransactionState)
+    uuid = models.UUIDField(unique=True)
+
+
+class ArchivedTransactionEntry(models.Model):
+    """A TransactionEntry moved out of the live table by a period close"""
+
+    id = models.BigIntegerField(primary_key=True)
+    transaction_id = models.ForeignKey(
+        ArchivedTransactionDetail, on_delete=models.CASCADE
+    )
+    account = models.ForeignKey(Account, on_delete=models.RESTRICT)
+    memo = models.CharField(max_length=256, blank=True)
+    price = models.DecimalField(decimal_places=10, max_digits=19)
+    amount = models.DecimalField(decimal_places=10, max_digits=19)
+    uuid = models.UUIDField(unique=True)
+
+
+def _lock_order(scope: int) -> tuple[bool, int]:
+    return scope != LedgerVersion.LEDGER, scope
+
+
+class LedgerVersionManager(models.Manager):
+    def bump(self, *scopes: int, entries: models.QuerySet | None = None):
+        """Advance the version of the whole ledger, of the given scopes and of
+        the accounts of `entries`, with one statement
+
+        Call it in the atomic block of the write, so the versions move exactly
+        when the write commits. Accounts are counted before their entries
+        change, so with entries_removed and entries_moved too.
+        """
+        table = self.model._meta.db_table
+        scopes = sorted({LedgerVersion.LEDGER, *scopes}, key=_lock_order)
+        # The first select names the column
+        selects = ["SELECT CAST(%s AS bigint) AS scope"] * len(scopes)
+        params = list(scopes)
+        if entries is not None:
+            accounts, account_params = (
+                entries.order_by()
+                .values("account_id")
+                .distinct()
+                .query.get_compiler(connection=connection)
+                .as_sql()
+            )
+            selects.append(accounts)
+            params.extend(account_params)
+        modified = connection.ops.adapt_datetimefield_value(timezone.now())
+        # One upsert for every scope, LEDGER first and then in scope order, so
+        # that concurrent writers lock the rows in the same order. WHERE true
+        # tells SQLite the ON CONFLICT isn't a join constraint.
+        sql = (
+            f"INSERT INTO {table} (scope, version, modified) "
+            f"SELECT scope, 1, %s FROM ({' UNION '.join(selects)}) AS scopes "
+            f"WHERE true ORDER BY scope = {LedgerVersion.LEDGER} DESC, scope "
+            "ON CONFLICT (scope) DO UPDATE SET "
+            f"version = {table}.version + 1, modified = excluded.modified"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [modified, *params])
+
+    def lock(self):
+        """Take the ledger's write lock until the transaction ends: the row of
+        LEDGER, which every bump locks first
+
+        Only PostgreSQL needs it, SQLite's writers take turns anyway. The row
+        is created at version 0 if need be, which still reads as never written.
+        """
+        if connection.vendor != "postgresql":
+            return
+        table = self.model._meta.db_table
+        modified = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (scope, version, modified) VALUES (%s, 0, %s) "
+                f"ON CONFLICT (scope) DO UPDATE SET version = {table}.version",
+                [LedgerVersion.LEDGER, modified],
+            )
+
+    def current(self, scopes: list[int]) -> list[tuple[int, datetime | None]]:
+        """The (version, last modified) of each scope, in the order given;
+        (0, None) for those never written"""
+        versions = {
+            scope: (version, modified)
+            for scope, version, modified in self.filter(
+                scope__in=scopes, version__gt=0
+            ).values_list("scope", "version", "modified")
+        }
+        return [versions.get(scope, (0, None)) for scope in scopes]
+
+
+class LedgerVersion(models.Model):
+    """How many times the ledger, or a part of it, has been written to
+
+    Views showing that part derive their ETag from it, and answer
+    conditional requests without running their own queries.
+    """
+
+    # Every write to the ledger, accounts, currencies or budgets
+    LEDGER = 0
+    # What every account page shows beyond its entries: the account tree,
+    # the currencies and the closed periods
+    ACCOUNTS = -1
+
+    # LEDGER, ACCOUNTS or an account id, for the entries of that account
+    scope = models.BigIntegerField(unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    modified = models.DateTimeField()
+    objects = LedgerVersionManager()
+
+
+# The models the change log follows, by label
+LOGGED_MODELS = (
+    "currencymgr.currency",
+    "acctmgr.account",
+    "ledger.transactiondetail",
+    "ledger.transactionentry",
+)
+
+
+class ChangeKind(models.TextChoices):
+    INSERT = "I"
+    UPDATE = "U"
+    DELETE = "D"
+    # Taken out of the live ledger by a period close, and put back when it
+    # reopens. Each instance closes its own periods, so these aren't synced.
+    ARCHIVE = "A"
+    RESTORE = "R"
+
+
+# Off while a caller logs its writes itself
+_logging = contextvars.ContextVar("change_logging", default=True)
+
+
+class ChangeManager(models.Manager):
+    def record(self, kind: ChangeKind, objects: models.QuerySet):
+        """Append a change of kind for each of the objects, with one statement
+
+        Call it in the atomic block of the write, and before an update or
+        delete that takes the rows out of `objects`. On PostgreSQL the
+        ledger's write lock is taken first, so sequence numbers are handed out
+        in commit order and a reader that has seen up to N never finds a
+        change below N committed later.
+        """
+        label = objects.model._meta.label_lower
+        if label not in LOGGED_MODELS:
+            raise ValueError(f"Changes of {label} are not logged.")
+        if not _logging.get():
+            return
+        LedgerVersion.objects.lock()
+        changed, params = (
+            objects.order_by("pk")
+            .values("pk", "uuid")
+            .query.get_compiler(connection=connection)
+            .as_sql()
+        )
+        recorded_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.model._meta.db_table} "
+                "(model, object_id, object_uuid, kind, recorded_at, origin) "
+                f"SELECT %s, pk, uuid, %s, %s, '' FROM ({changed}) AS changed",
+                [label, kind, recorded_at, *params],
+            )
+
+    def append(self, changes: list["Change"]):
+        """Append changes the caller built, with their own timestamps and
+        origin, under the same lock as record"""
+        LedgerVersion.objects.lock()
+        self.bulk_create(changes, batch_size=1000)
+
+    @contextlib.contextmanager
+    def suspended(self):
+        """Leave the writes in the block out of the log, for a caller that
+        appends their changes itself"""
+        token = _logging.set(False)
+        try:
+            yield
+        finally:
+            _logging.reset(token)
+
+
+class Change(models.Model):
+    """An insert, update or delete of a currency, account, transaction or
+    entry, in the same transaction as the write
+
+    The id is the change's sequence number. A change only says which row
+    changed, readers of the log get the row as it is now.
+    """
+
+    id = models.BigAutoField("sequence", primary_key=True)
+    # One of LOGGED_MODELS
+    model = models.CharField(max_length=40)
+    object_id = models.BigIntegerField()
+    # The row's uuid, None for changes logged before rows had one
+    object_uuid = models.UUIDField(null=True)
+    kind = models.CharField(max_length=1, choices=ChangeKind)
+    # When the change was made, on whichever instance made it
+    recorded_at = models.DateTimeField(default=timezone.now)
+    # The INSTANCE_NAME of the instance a synced change was made on, blank
+    # for changes made here
+    origin = models.CharField(max_length=100, blank=True)
+    objects = ChangeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["model", "object_id"], name="change_object_idx"),
+            models.Index(fields=["object_uuid"], name="change_uuid_idx"),
+        ]
+
+
+class SyncPeer(models.Model):
+    """Another instance of the ledger this one syncs with, and how far each
+    way"""
+
+    url = models.URLField(unique=True)
+    # Its INSTANCE_NAME, which its changes are logged under here
+    name = models.CharField(max_length=100)
+    # The last of its sequence numbers applied here
+    pulled_through = models.BigIntegerField(default=0)
+    # The last of this instance's sequence numbers sent to it
+    pushed_through = models.BigIntegerField(default=0)
+    synced_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return self.name or self.url
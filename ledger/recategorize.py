@@ -0,0 +1,67 @@
+from datetime import date
+from django.db import transaction
+
+from acctmgr.models import Account
+from .models import ClosedPeriod, TransactionEntry
+from .retry import retry_on_contention
+from .signals import entries_moved
+
+
+def check_compatible(source_id: int, target_id: int, placeholder: bool = False):
+    """Raises ValueError unless entries can move from source to target, or
+    with placeholder, unless source can merge into the placeholder target
+
+    Read from the database rather than the instances, so a currency changed
+    since they were loaded is still caught.
+    """
+    if source_id == target_id:
+        raise ValueError("The source and target accounts are the same.")
+    accounts = {
+        row["pk"]: row
+        for row in Account.objects.filter(pk__in=[source_id, target_id]).values(
+            "pk", "currency_id", "placeholder"
+        )
+    }
+    if len(accounts) != 2:
+        raise ValueError("Both accounts must exist.")
+    if accounts[source_id]["currency_id"] != accounts[target_id]["currency_id"]:
+        raise ValueError("Entries can only move between accounts of one currency.")
+    if accounts[target_id]["placeholder"] and not placeholder:
+        raise ValueError("Entries can't move to a placeholder account.")
+
+
+@retry_on_contention
+@transaction.atomic
+def move_entries(
+    source: Account,
+    target: Account,
+    start: date | None = None,
+    end: date | None = None,
+    description: str | None = None,
+) -> int:
+    """Move the source account's entries to the target account with one UPDATE
+
+    Optionally only those dated start through end, or whose transaction
+    description contains `description` (ignoring case). Entries in closed
+    periods never move. Amounts are unchanged, so every transaction stays
+    balanced.
+
+    Returns the number of entries moved
+
+    Raises:
+    ValueError -- The accounts are incompatible or start is in a closed period
+    """
+    check_compatible(source.pk, target.pk)
+    entries = TransactionEntry.objects.filter(account_id=source.pk)
+    if start is not None:
+        ClosedPeriod.objects.ensure_open([start])
+        entries = entries.filter(transaction_id__xact_date__gte=start)
+    elif (closed_through := ClosedPeriod.objects.closed_through()) is not None:
+        entries = entries.filter(transaction_id__xact_date__gt=closed_through)
+    if end is not None:
+        entries = entries.filter(transaction_id__xact_date__lte=end)
+    if description:
+        entries = entries.filter(transaction_id__description__icontains=description)
+
+    entries_moved.send(sender=TransactionEntry, entries=entries, account=target)
+    return entries.update(account_id=target.pk)
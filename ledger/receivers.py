@@ -0,0 +1,123 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from acctmgr.models import Account
+from currencymgr.models import Currency
+from . import search
+from .autocomplete import descriptions
+from .models import (
+    Change,
+    ChangeKind,
+    ClearedBalance,
+    LedgerVersion,
+    MonthlyRollup,
+    TransactionDetail,
+)
+from .signals import entries_added, entries_moved, entries_removed
+
+
+@receiver(entries_added)
+def add_to_rollup(sender, entries, **kwargs):
+    MonthlyRollup.objects.apply(entries, sign=1)
+
+
+@receiver(entries_removed)
+def remove_from_rollup(sender, entries, **kwargs):
+    MonthlyRollup.objects.apply(entries, sign=-1)
+
+
+@receiver(entries_moved)
+def move_in_rollup(sender, entries, account, **kwargs):
+    MonthlyRollup.objects.move(entries, account)
+
+
+@receiver(entries_added)
+def add_to_cleared_balances(sender, entries, **kwargs):
+    ClearedBalance.objects.apply(entries, sign=1)
+
+
+@receiver(entries_removed)
+def remove_from_cleared_balances(sender, entries, **kwargs):
+    ClearedBalance.objects.apply(entries, sign=-1)
+
+
+@receiver(entries_moved)
+def move_cleared_balances(sender, entries, account, **kwargs):
+    ClearedBalance.objects.move(entries, account)
+
+
+@receiver(entries_added)
+@receiver(entries_removed)
+def bump_versions(sender, entries, **kwargs):
+    LedgerVersion.objects.bump(entries=entries)
+
+
+@receiver(entries_moved)
+def bump_moved_versions(sender, entries, account, **kwargs):
+    LedgerVersion.objects.bump(account.pk, entries=entries)
+
+
+# The account tree, which every account page and the sidebar show
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def bump_account_versions(sender, instance, **kwargs):
+    LedgerVersion.objects.bump(LedgerVersion.ACCOUNTS, instance.pk)
+
+
+@receiver(entries_added)
+def index_transactions(sender, entries, **kwargs):
+    search.index(entries)
+
+
+@receiver(entries_removed)
+def unindex_transactions(sender, entries, **kwargs):
+    search.remove(entries)
+
+
+@receiver(entries_added)
+def count_descriptions(sender, entries, **kwargs):
+    descriptions.add(entries)
+
+
+@receiver(entries_removed)
+def uncount_descriptions(sender, entries, **kwargs):
+    descriptions.remove(entries)
+
+
+@receiver(entries_added)
+def log_added_entries(sender, entries, **kwargs):
+    Change.objects.record(ChangeKind.INSERT, entries)
+
+
+@receiver(entries_removed)
+def log_removed_entries(sender, entries, **kwargs):
+    Change.objects.record(ChangeKind.DELETE, entries)
+
+
+@receiver(entries_moved)
+def log_moved_entries(sender, entries, **kwargs):
+    Change.objects.record(ChangeKind.UPDATE, entries)
+    # Transactions sync as a whole, from the changes of their detail
+    Change.objects.record(
+        ChangeKind.UPDATE,
+        TransactionDetail.objects.filter(pk__in=entries.values("transaction_id")),
+    )
+
+
+# Saves and deletes of single rows. The set-wise writes, which skip these
+# signals, record their changes themselves.
+@receiver(post_save, sender=Currency)
+@receiver(post_save, sender=Account)
+@receiver(post_save, sender=TransactionDetail)
+def log_saved(sender, instance, created, **kwargs):
+    Change.objects.record(
+        ChangeKind.INSERT if created else ChangeKind.UPDATE,
+        sender.objects.filter(pk=instance.pk),
+    )
+
+
+@receiver(pre_delete, sender=Currency)
+@receiver(pre_delete, sender=Account)
+@receiver(pre_delete, sender=TransactionDetail)
+def log_deleted(sender, instance, **kwargs):
+    Change.objects.record(ChangeKind.DELETE, sender.objects.filter(pk=instance.pk))
@@ -0,0 +1,186 @@
+import bisect
+import decimal
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import NamedTuple
+from django.db import transaction
+from django.db.models import QuerySet
+
+from acctmgr.models import Account
+from .models import (
+    Change,
+    ChangeKind,
+    ClearedBalance,
+    ClosedPeriod,
+    LedgerVersion,
+    TransactionDetail,
+    TransactionEntry,
+    TransactionState,
+)
+from .retry import retry_on_contention
+
+
+# Statement amounts looked up per query, well under SQLite's parameter limit
+AMOUNTS_PER_QUERY = 1000
+
+
+class StatementLine(NamedTuple):
+    xact_date: date
+    # In the ledger's sign convention for the account, so a deposit into a
+    # bank account is positive
+    amount: decimal.Decimal
+    description: str = ""
+
+
+def match_statement(
+    account: Account, lines: list[StatementLine], window_days: int = 3
+) -> dict[int, int]:
+    """Pair statement lines with the account's unreconciled entries
+
+    Candidates are hashed on amount, and each line takes the unused entry of
+    the same amount whose date is nearest its own, at most window_days away.
+    Lines are matched in date order.
+
+    Returns {line index: transaction id} for the matched lines
+    """
+    if not lines:
+        return {}
+    start = min(line.xact_date for line in lines) - timedelta(days=window_days)
+    end = max(line.xact_date for line in lines) + timedelta(days=window_days)
+    closed_through = ClosedPeriod.objects.closed_through()
+    if closed_through is not None:
+        start = max(start, closed_through + timedelta(days=1))
+
+    entries = (
+        TransactionEntry.objects.filter(
+            account=account,
+            transaction_id__xact_date__range=(start, end),
+        )
+        .exclude(transaction_id__state=TransactionState.RECONCILED)
+        .order_by()
+        .values_list("transaction_id__xact_date", "transaction_id", "amount")
+    )
+    # Only fetch entries of the statement's amounts, converting every row of
+    # a busy account to Python would cost more than the matching
+    amounts = sorted({line.amount for line in lines})
+    candidates = defaultdict(list)
+    for i in range(0, len(amounts), AMOUNTS_PER_QUERY):
+        chunk = entries.filter(amount__in=amounts[i : i + AMOUNTS_PER_QUERY])
+        for xact_date, transaction_id, amount in chunk.iterator(chunk_size=10000):
+            candidates[amount].append((xact_date, transaction_id))
+    # amount -> (sorted dates, their transaction ids, whether used)
+    buckets = {}
+    for amount, found in candidates.items():
+        found.sort()
+        buckets[amount] = (
+            [xact_date for xact_date, _ in found],
+            [transaction_id for _, transaction_id in found],
+            [False] * len(found),
+        )
+
+    window = timedelta(days=window_days)
+    matches = {}
+    for index in sorted(range(len(lines)), key=lambda i: lines[i].xact_date):
+        line = lines[index]
+        bucket = buckets.get(line.amount)
+        if bucket is None:
+            continue
+        dates, transaction_ids, used = bucket
+        # Walk outwards from the line's date to the nearest unused entry
+        after = bisect.bisect_left(dates, line.xact_date)
+        before = after - 1
+        best = None
+        while best is None:
+            after_gap = dates[after] - line.xact_date if after < len(dates) else None
+            before_gap = line.xact_date - dates[before] if before >= 0 else None
+            if after_gap is not None and (
+                before_gap is None or after_gap <= before_gap
+            ):
+                if after_gap > window:
+                    break
+                if not used[after]:
+                    best = after
+                after += 1
+            elif before_gap is not None:
+                if before_gap > window:
+                    break
+                if not used[before]:
+                    best = before
+                before -= 1
+            else:
+                break
+        if best is not None:
+            used[best] = True
+            matches[index] = transaction_ids[best]
+    return matches
+
+
+@transaction.atomic
+def set_state(details: QuerySet, state: TransactionState) -> int:
+    """Move the transactions to state with one UPDATE, keeping the cleared
+    balances of every account they touch in step
+
+    Returns the number of transactions updated
+    """
+    details = details.exclude(state=state)
+    entries = TransactionEntry.objects.filter(transaction_id__in=details.values("pk"))
+    ClearedBalance.objects.change_state(entries, state)
+    LedgerVersion.objects.bump(entries=entries)
+    Change.objects.record(ChangeKind.UPDATE, details)
+    return details.update(state=state)
+
+
+def cleared_balance(account: Account) -> decimal.Decimal:
+    """The account's balance counting only cleared and reconciled transactions"""
+    balance = ClearedBalance.objects.filter(account=account).first()
+    if balance is None:
+        return decimal.Decimal(0)
+    return balance.balance
+
+
+@retry_on_contention
+@transaction.atomic
+def reconcile(
+    account: Account,
+    lines: list[StatementLine],
+    ending_balance: decimal.Decimal,
+    window_days: int = 3,
+) -> dict:
+    """Reconcile the account against a bank statement
+
+    The transactions matched by the statement's lines are marked cleared. If
+    every line matched and the account's cleared balance then equals the
+    statement's ending balance, all of its cleared transactions become
+    reconciled.
+
+    Returns:
+    {"matched": int, "unmatched": [StatementLine], "cleared_balance": Decimal,
+     "difference": Decimal, "reconciled": int}
+    """
+    matches = match_statement(account, lines, window_days)
+    set_state(
+        TransactionDetail.objects.filter(pk__in=set(matches.values())),
+        TransactionState.CLEARED,
+    )
+
+    balance = cleared_balance(account)
+    unmatched = [line for i, line in enumerate(lines) if i not in matches]
+    reconciled = 0
+    if not unmatched and balance == ending_balance:
+        cleared = TransactionDetail.objects.filter(
+            state=TransactionState.CLEARED,
+            pk__in=TransactionEntry.objects.filter(account=account).values(
+                "transaction_id"
+            ),
+        )
+        # Closed periods are immutable, whatever state they closed in
+        if (closed_through := ClosedPeriod.objects.closed_through()) is not None:
+            cleared = cleared.filter(xact_date__gt=closed_through)
+        reconciled = set_state(cleared, TransactionState.RECONCILED)
+    return {
+        "matched": len(matches),
+        "unmatched": unmatched,
+        "cleared_balance": balance,
+        "difference": ending_balance - balance,
+        "reconciled": reconciled,
+    }
@@ -0,0 +1,62 @@
+import functools
+import random
+import threading
+import time
+from django.conf import settings
+from django.db import OperationalError, connection
+
+# Lock contention on SQLite, and serialization failures/deadlocks on PostgreSQL
+RETRYABLE_MESSAGES = ("database is locked", "database table is locked")
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+
+# SQLite has a single writer anyway, so writers in the same process queue here
+# rather than all spinning on the database lock
+_sqlite_write_lock = threading.RLock()
+
+
+def is_retryable(error: OperationalError) -> bool:
+    cause = error.__cause__
+    sqlstate = getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)
+    if sqlstate in RETRYABLE_SQLSTATES:
+        return True
+    message = str(error).lower()
+    return any(retryable in message for retryable in RETRYABLE_MESSAGES)
+
+
+def retry_on_contention(func=None, *, attempts=None, base_delay=0.05, max_delay=2.0):
+    """Retry a ledger write when the database is busy
+
+    Must wrap the outermost atomic block of the write so each attempt starts a
+    fresh transaction. When called inside an enclosing atomic block the call
+    isn't retried, as the enclosing transaction is already broken; the error
+    propagates to whoever owns that block.
+
+    Retries back off exponentially with jitter, up to LEDGER_WRITE_ATTEMPTS
+    attempts in total.
+    """
+    if func is None:
+        return functools.partial(
+            retry_on_contention,
+            attempts=attempts,
+            base_delay=base_delay,
+            max_delay=max_delay,
+        )
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if connection.in_atomic_block:
+            return func(*args, **kwargs)
+        max_attempts = attempts or getattr(settings, "LEDGER_WRITE_ATTEMPTS", 5)
+        for attempt in range(1, max_attempts + 1):
+            try:
+                if connection.vendor == "sqlite":
+                    with _sqlite_write_lock:
+                        return func(*args, **kwargs)
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == max_attempts or not is_retryable(e):
+                    raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+            time.sleep(random.uniform(0, delay))
+
+    return wrapper
@@ -0,0 +1,188 @@
+import re
+from datetime import date
+import decimal
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from acctmgr.models import Account
+from .models import TransactionDetail
+
+# One row per transaction holding its description and memos. An FTS5 table
+# (rowid = transaction id) on SQLite, a tsvector with a GIN index on PostgreSQL
+SEARCH_TABLE = "ledger_transactionsearch"
+
+SQLITE_CREATE = (
+    f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+    "description, memos, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+)
+POSTGRESQL_CREATE = (
+    f"CREATE TABLE {SEARCH_TABLE} ("
+    "transaction_id bigint PRIMARY KEY, document tsvector NOT NULL)",
+    f"CREATE INDEX {SEARCH_TABLE}_document ON {SEARCH_TABLE} USING gin (document)",
+)
+
+# Document of each transaction selected by `WHERE d.id IN (...)`
+_DOCUMENTS = (
+    "SELECT d.id, d.description, COALESCE(("
+    "SELECT {concat} FROM ledger_transactionentry e "
+    "WHERE e.transaction_id_id = d.id), '') "
+    "FROM ledger_transactiondetail d WHERE d.id IN ({ids})"
+)
+
+RANK_WINDOW = 2000
+
+_WORD = re.compile(r"\w+")
+
+
+def _index_sql(vendor: str, ids: str) -> list[str]:
+    """Statements (re)indexing the transactions selected by the `ids` SQL"""
+    if vendor == "sqlite":
+        documents = _DOCUMENTS.format(concat="group_concat(e.memo, ' ')", ids=ids)
+        return [
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({ids})",
+            f"INSERT INTO {SEARCH_TABLE} (rowid, description, memos) {documents}",
+        ]
+    documents = _DOCUMENTS.format(concat="string_agg(e.memo, ' ')", ids=ids)
+    return [
+        f"INSERT INTO {SEARCH_TABLE} (transaction_id, document) "
+        # Descriptions weigh more than memos
+        "SELECT id, setweight(to_tsvector('simple', description), 'A') || "
+        "setweight(to_tsvector('simple', memos), 'B') "
+        f"FROM ({documents}) AS documents (id, description, memos) "
+        "ON CONFLICT (transaction_id) DO UPDATE SET document = EXCLUDED.document"
+    ]
+
+
+def create_table(schema_editor):
+    """Create and fill the index, for the migration"""
+    vendor = schema_editor.connection.vendor
+    for sql in SQLITE_CREATE if vendor == "sqlite" else POSTGRESQL_CREATE:
+        schema_editor.execute(sql)
+    for sql in _index_sql(vendor, "SELECT id FROM ledger_transactiondetail"):
+        schema_editor.execute(sql)
+
+
+def _transaction_ids(entries: QuerySet) -> tuple[str, tuple]:
+    """SQL selecting the transactions of the entries"""
+    return entries.order_by().values("transaction_id").query.sql_with_params()
+
+
+def index(entries: QuerySet):
+    """(Re)index the transactions the entries belong to, set-wise"""
+    ids, params = _transaction_ids(entries)
+    with connection.cursor() as cursor:
+        for sql in _index_sql(connection.vendor, ids):
+            cursor.execute(sql, params)
+
+
+def remove(entries: QuerySet):
+    """Drop the transactions the entries belong to from the index
+
+    Must be called while the entries exist.
+    """
+    ids, params = _transaction_ids(entries)
+    column = "rowid" if connection.vendor == "sqlite" else "transaction_id"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {column} IN ({ids})", params)
+
+
+@transaction.atomic
+def rebuild() -> int:
+    """Reindex every transaction
+
+    Returns the number of transactions indexed
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        for sql in _index_sql(
+            connection.vendor, "SELECT id FROM ledger_transactiondetail"
+        ):
+            cursor.execute(sql)
+        cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def search(
+    query: str,
+    account: Account | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    min_amount: decimal.Decimal | None = None,
+    max_amount: decimal.Decimal | None = None,
+    limit: int = 50,
+) -> list[TransactionDetail]:
+    """Transactions whose description or memos match every word of the query,
+    most relevant first
+
+    Each word matches as a prefix. The results can be narrowed to
+    transactions with an entry in the account or its descendants, dated
+    start through end, and with an entry whose absolute amount lies between
+    min_amount and max_amount (on the account, when given). Each result has
+    its relevance in `rank`, higher is better.
+
+    Only the newest RANK_WINDOW matching transactions are ranked.
+    """
+    words = _WORD.findall(query.lower())
+    if not words:
+        return []
+
+    where, params = [], []
+    if start is not None:
+        where.append("d.xact_date >= %s")
+        params.append(start)
+    if end is not None:
+        where.append("d.xact_date <= %s")
+        params.append(end)
+    entry_filters = []
+    if account is not None:
+        subtree = Account.objects.get_subtree_ids([account.pk])[account.pk]
+        entry_filters.append(f"e.account_id IN ({', '.join(['%s'] * len(subtree))})")
+        params.extend(subtree)
+    if min_amount is not None:
+        entry_filters.append("ABS(e.amount) >= %s")
+        params.append(min_amount)
+    if max_amount is not None:
+        entry_filters.append("ABS(e.amount) <= %s")
+        params.append(max_amount)
+    if entry_filters:
+        where.append(
+            "EXISTS (SELECT 1 FROM ledger_transactionentry e "
+            f"WHERE e.transaction_id_id = d.id AND {' AND '.join(entry_filters)})"
+        )
+    filters = "".join(f" AND {condition}" for condition in where)
+
+    if connection.vendor == "sqlite":
+        match = " ".join(f'"{word}"*' for word in words)
+        matches = (
+            f"FROM {SEARCH_TABLE} "
+            f"JOIN ledger_transactiondetail d ON d.id = {SEARCH_TABLE}.rowid "
+            f"WHERE {SEARCH_TABLE} MATCH %s{filters}"
+        )
+        # bm25 is lower for better matches
+        rank, order = f"-bm25({SEARCH_TABLE})", f"bm25({SEARCH_TABLE})"
+    else:
+        match = " & ".join(f"{word}:*" for word in words)
+        matches = (
+            f"FROM {SEARCH_TABLE} s, to_tsquery('simple', %s) AS q (query), "
+            "ledger_transactiondetail d "
+            f"WHERE d.id = s.transaction_id AND s.document @@ q.query{filters}"
+        )
+        # Normalized by document length, like bm25
+        rank = order = "ts_rank(s.document, q.query, 1)"
+        order += " DESC"
+    # Only the newest RANK_WINDOW matches are ranked, so a common word costs
+    # the same as a rare one however large the ledger grows
+    sql = (
+        f"SELECT d.id, {rank} {matches} AND d.id >= COALESCE(("
+        f"SELECT d.id {matches} ORDER BY d.id DESC LIMIT 1 OFFSET %s), 0) "
+        f"ORDER BY {order}, d.xact_date DESC LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *params, match, *params, RANK_WINDOW - 1, limit])
+        ranks = dict(cursor.fetchall())
+    details = TransactionDetail.objects.in_bulk(ranks)
+    results = []
+    for pk, rank in ranks.items():
+        details[pk].rank = rank
+        results.append(details[pk])
+    return results
@@ -0,0 +1,16 @@
+from django.dispatch import Signal
+
+# Every ledger write path sends these inside its atomic block so derived data
+# (rollups, caches, indexes) stays consistent with the entries it is built from.
+# Receivers are passed ``entries``, a QuerySet of the affected TransactionEntry
+# rows, and should work on it set-wise rather than iterating in Python.
+
+# Sent after the entries have been inserted
+entries_added = Signal()
+
+# Sent before the entries are deleted, while they are still queryable
+entries_removed = Signal()
+
+# Sent before the entries move to another account, which receivers are also
+# passed as ``account``. Nothing else about them changes.
+entries_moved = Signal()
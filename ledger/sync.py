@@ -0,0 +1,728 @@
+import datetime
+import decimal
+import gzip
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Max, ProtectedError, RestrictedError
+from django.utils import timezone
+
+from acctmgr.models import Account, AccountTypes
+from currencymgr.models import Currency
+from .models import (
+    ArchivedTransactionEntry,
+    Change,
+    ChangeKind,
+    ClosedPeriod,
+    LedgerVersion,
+    SyncPeer,
+    TransactionDetail,
+    TransactionEntry,
+    TransactionState,
+)
+from .retry import retry_on_contention
+from .signals import entries_added, entries_removed
+
+# Changes of the log read into one bundle, at most
+BUNDLE_SIZE = 2000
+
+CURRENCY = Currency._meta.label_lower
+ACCOUNT = Account._meta.label_lower
+TRANSACTION = TransactionDetail._meta.label_lower
+ENTRY = TransactionEntry._meta.label_lower
+
+# The bundle's list of each synced model
+KEYS = {CURRENCY: "currencies", ACCOUNT: "accounts", TRANSACTION: "transactions"}
+
+# Changes of the period closes and reopens each instance makes itself, which
+# say nothing about the rows themselves
+UNSYNCED = (ChangeKind.ARCHIVE, ChangeKind.RESTORE)
+
+
+def _number(value: decimal.Decimal) -> str:
+    # Without the trailing zeros of the column's ten places
+    return format(value.normalize(), "f")
+
+
+def _uuid(value) -> str | None:
+    return None if value is None else str(value)
+
+
+def outgoing(since: int, peer: str, limit: int = BUNDLE_SIZE) -> dict:
+    """The currencies, accounts and transactions changed after sequence
+    number `since`, for the instance named `peer`
+
+    A transaction goes as a whole, with its entries, and every item carries
+    the time of its latest change and the instance it was made on. Changes
+    synced from the peer are left out, so nothing goes back where it came
+    from, as are period closes archiving transactions and reopens restoring
+    them. Takes a query for the log and one or two per model in the bundle,
+    however long the ledger and its log.
+
+    Returns:
+    {"instance": INSTANCE_NAME, "next": sequence to continue from,
+     "more": bool, "currencies": [...], "accounts": [...],
+     "transactions": [...]}
+    """
+    # Entries' changes are read too, though their transactions' changes say
+    # it all, so that `next` passes them
+    rows = list(
+        Change.objects.filter(pk__gt=since)
+        .order_by("pk")
+        .values_list("pk", "model", "object_uuid", "kind", "recorded_at", "origin")[
+            : limit + 1
+        ]
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+    bundle = {
+        "instance": settings.INSTANCE_NAME,
+        "next": rows[-1][0] if rows else since,
+        "more": more,
+        **{key: [] for key in KEYS.values()},
+    }
+
+    # (model, uuid) -> (kind, recorded_at, origin) of its latest change
+    latest = {}
+    for _, model, object_uuid, kind, recorded_at, origin in rows:
+        # Rows deleted before they had a uuid can't be told apart. An archived
+        # row is left to its earlier changes, which find it gone.
+        if model in KEYS and object_uuid is not None and kind not in UNSYNCED:
+            latest[model, object_uuid] = (kind, recorded_at, origin)
+    # model -> {uuid: stamp of the change} of the rows to send as they are now
+    current = {model: {} for model in KEYS}
+    for (model, object_uuid), (kind, recorded_at, origin) in latest.items():
+        if origin == peer:
+            continue
+        stamp = {
+            "changed_at": recorded_at.isoformat(),
+            "origin": origin or settings.INSTANCE_NAME,
+        }
+        if kind == ChangeKind.DELETE:
+            bundle[KEYS[model]].append(
+                {"uuid": str(object_uuid), **stamp, "deleted": True}
+            )
+        else:
+            current[model][object_uuid] = stamp
+
+    # Rows gone since are left to their delete, further on
+    if stamps := current[CURRENCY]:
+        bundle["currencies"] += [
+            {
+                "uuid": str(row_uuid),
+                **stamps[row_uuid],
+                "symbol": symbol,
+                "full_name": full_name,
+                "current_price": _number(price),
+                "fraction_traded": fraction_traded,
+            }
+            for row_uuid, symbol, full_name, price, fraction_traded in (
+                Currency.objects.filter(uuid__in=stamps).values_list(
+                    "uuid", "symbol", "full_name", "current_price", "fraction_traded"
+                )
+            )
+        ]
+    if stamps := current[ACCOUNT]:
+        bundle["accounts"] += [
+            {
+                "uuid": str(row_uuid),
+                **stamps[row_uuid],
+                "name": name,
+                "currency": str(currency),
+                "acct_type": acct_type,
+                "description": description,
+                "parent": _uuid(parent),
+                "placeholder": placeholder,
+            }
+            for row_uuid, name, currency, acct_type, description, parent, placeholder in (
+                Account.objects.filter(uuid__in=stamps).values_list(
+                    "uuid",
+                    "name",
+                    "currency__uuid",
+                    "acct_type",
+                    "description",
+                    "parent__uuid",
+                    "placeholder",
+                )
+            )
+        ]
+    if stamps := current[TRANSACTION]:
+        details = {
+            pk: {
+                "uuid": str(row_uuid),
+                **stamps[row_uuid],
+                "date": xact_date.isoformat(),
+                "description": description,
+                "state": state,
+                "entries": [],
+            }
+            for pk, row_uuid, xact_date, description, state in (
+                TransactionDetail.objects.filter(uuid__in=stamps).values_list(
+                    "pk", "uuid", "xact_date", "description", "state"
+                )
+            )
+        }
+        for xact, row_uuid, account, memo, amount, price in (
+            TransactionEntry.objects.filter(transaction_id__in=details)
+            .order_by("pk")
+            .values_list(
+                "transaction_id", "uuid", "account__uuid", "memo", "amount", "price"
+            )
+        ):
+            details[xact]["entries"].append(
+                {
+                    "uuid": str(row_uuid),
+                    "account": str(account),
+                    "memo": memo,
+                    "amount": _number(amount),
+                    "price": _number(price),
+                }
+            )
+        bundle["transactions"] += details.values()
+    return bundle
+
+
+def _parse(items, origin: str) -> list[tuple[dict, uuid.UUID, dict]]:
+    """Each item with its uuid and the stamp of its change: the uuid, time
+    and instance to log it under"""
+    if not isinstance(items, list):
+        raise ValueError("Expected a list of changes.")
+    try:
+        parsed = []
+        for item in items:
+            row = uuid.UUID(item["uuid"])
+            stamp = {
+                "object_uuid": row,
+                "recorded_at": datetime.datetime.fromisoformat(item["changed_at"]),
+                "origin": item.get("origin") or origin,
+            }
+            parsed.append((item, row, stamp))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("A change needs a uuid and changed_at.")
+    return parsed
+
+
+def _winners(items, origin: str) -> list[tuple[dict, uuid.UUID, dict]]:
+    """The peer's changes that are later than this instance's latest change
+    of the same row, period closes and reopens aside
+
+    Changes made at the same moment go by the name of the instance they were
+    made on, so both instances pick the same one.
+    """
+    parsed = _parse(items, origin)
+    latest = (
+        Change.objects.filter(object_uuid__in=[row for _, row, _ in parsed])
+        .exclude(kind__in=UNSYNCED)
+        .values("object_uuid")
+        .annotate(seq=Max("pk"))
+        .values("seq")
+    )
+    local = {
+        row: (recorded_at, row_origin or settings.INSTANCE_NAME)
+        for row, recorded_at, row_origin in Change.objects.filter(
+            pk__in=latest
+        ).values_list("object_uuid", "recorded_at", "origin")
+    }
+    return [
+        (item, row, stamp)
+        for item, row, stamp in parsed
+        if row not in local or (stamp["recorded_at"], stamp["origin"]) > local[row]
+    ]
+
+
+def _reject(result: dict, row: uuid.UUID, error: str):
+    result["rejected"].append({"uuid": str(row), "error": error})
+
+
+def _delete(result: dict, row: uuid.UUID, instance) -> bool:
+    """Delete a currency or account still in use nowhere else"""
+    try:
+        with transaction.atomic():
+            instance.delete()
+    except (ProtectedError, RestrictedError):
+        _reject(result, row, f"{instance} is still in use here.")
+        return False
+    return True
+
+
+def _apply_currencies(items, origin: str, result: dict) -> list[Change]:
+    winners = _winners(items, origin)
+    existing = Currency.objects.in_bulk(
+        [row for _, row, _ in winners], field_name="uuid"
+    )
+    symbols = dict(
+        Currency.objects.filter(
+            symbol__in=[item.get("symbol") for item, _, _ in winners]
+        ).values_list("symbol", "uuid")
+    )
+    changes, created, updated = [], [], []
+    for item, row, at in winners:
+        currency = existing.get(row)
+        stamp = {"model": CURRENCY, **at}
+        if item.get("deleted"):
+            if currency is not None:
+                pk = currency.pk
+                if _delete(result, row, currency):
+                    changes.append(
+                        Change(object_id=pk, kind=ChangeKind.DELETE, **stamp)
+                    )
+            continue
+        if symbols.get(item["symbol"], row) != row:
+            _reject(result, row, f"Symbol {item['symbol']} is taken here.")
+            continue
+        if currency is None:
+            currency = Currency(uuid=row)
+            created.append((currency, stamp))
+        else:
+            updated.append((currency, stamp))
+        currency.symbol = item["symbol"]
+        currency.full_name = item["full_name"]
+        currency.current_price = decimal.Decimal(item["current_price"])
+        currency.fraction_traded = int(item["fraction_traded"])
+
+    Currency.objects.bulk_create([currency for currency, _ in created])
+    Currency.objects.bulk_update(
+        [currency for currency, _ in updated],
+        ["symbol", "full_name", "current_price", "fraction_traded"],
+    )
+    for kind, written in ((ChangeKind.INSERT, created), (ChangeKind.UPDATE, updated)):
+        changes += [
+            Change(object_id=currency.pk, kind=kind, **stamp)
+            for currency, stamp in written
+        ]
+    return changes
+
+
+def _apply_accounts(items, origin: str, result: dict) -> list[Change]:
+    winners = _winners(items, origin)
+    live = [(item, row, at) for item, row, at in winners if not item.get("deleted")]
+    currencies = Currency.objects.in_bulk(
+        {uuid.UUID(item["currency"]) for item, _, _ in live}, field_name="uuid"
+    )
+    # This instance's accounts the winners refer to, or are
+    accounts = Account.objects.in_bulk(
+        {row for _, row, _ in winners}
+        | {uuid.UUID(item["parent"]) for item, _, _ in live if item.get("parent")},
+        field_name="uuid",
+    )
+    incoming = {row for _, row, _ in live}
+
+    changes, parented = [], {}
+    for item, row, at in winners:
+        account = accounts.get(row)
+        stamp = {"model": ACCOUNT, **at}
+        if item.get("deleted"):
+            if account is not None:
+                pk = account.pk
+                if _delete(result, row, account):
+                    changes.append(
+                        Change(object_id=pk, kind=ChangeKind.DELETE, **stamp)
+                    )
+            continue
+        currency = currencies.get(uuid.UUID(item["currency"]))
+        parent = uuid.UUID(item["parent"]) if item.get("parent") else None
+        if currency is None:
+            _reject(result, row, "Its currency is not here.")
+            continue
+        if parent is not None and parent not in accounts and parent not in incoming:
+            _reject(result, row, "Its parent is not here.")
+            continue
+        if item["acct_type"] not in AccountTypes.values:
+            _reject(result, row, f"{item['acct_type']} is not an account type.")
+            continue
+        if account is None:
+            account = Account(uuid=row)
+        account.name = item["name"]
+        account.currency = currency
+        account.acct_type = item["acct_type"]
+        account.description = item["description"]
+        account.placeholder = bool(item["placeholder"])
+        # What full_clean would check on save, but the bulk writes skip
+        try:
+            account.clean_fields(exclude=["currency", "parent", "uuid"])
+        except ValidationError as e:
+            _reject(result, row, " ".join(e.messages))
+            continue
+        parented[row] = (account, parent, stamp)
+    parented = _acyclic(parented, accounts, result)
+
+    # Parents can come in the same bundle as their children, so every account
+    # is written first and then pointed at its parent
+    created = [account for account, _, _ in parented.values() if account.pk is None]
+    Account.objects.bulk_create(created)
+    accounts |= {account.uuid: account for account in created}
+    for account, parent, _ in parented.values():
+        account.parent = None if parent is None else accounts[parent]
+    Account.objects.bulk_update(
+        [account for account, _, _ in parented.values()],
+        ["name", "currency", "acct_type", "description", "placeholder", "parent"],
+    )
+    inserted = {account.pk for account in created}
+    changes += [
+        Change(
+            object_id=account.pk,
+            kind=ChangeKind.INSERT if account.pk in inserted else ChangeKind.UPDATE,
+            **stamp,
+        )
+        for account, _, stamp in parented.values()
+    ]
+    return changes
+
+
+def _acyclic(parented: dict, accounts: dict, result: dict) -> dict:
+    """The incoming accounts whose parents keep the account tree a tree,
+    rejecting the others
+
+    `parented` maps each account's uuid to (account, parent uuid, stamp), and
+    `accounts` holds this instance's accounts by uuid. An account whose
+    parent would make a cycle is rejected, as is one whose parent was only
+    coming with the rejected ones, until the rest fit.
+    """
+    if not parented:
+        return parented
+    local = dict(Account.objects.values_list("uuid", "parent__uuid"))
+    while True:
+        parents = local | {row: parent for row, (_, parent, _) in parented.items()}
+        rejected = {}
+        for row, (_, parent, _) in parented.items():
+            if parent is not None and parent not in parents:
+                rejected[row] = "Its parent is not here."
+                continue
+            seen = set()
+            ancestor = parent
+            while ancestor is not None and ancestor not in seen and ancestor != row:
+                seen.add(ancestor)
+                ancestor = parents.get(ancestor)
+            if ancestor == row:
+                rejected[row] = "Its parent would make a cycle of accounts."
+        if not rejected:
+            return parented
+        for row, error in rejected.items():
+            _reject(result, row, error)
+            del parented[row]
+
+
+def _apply_transactions(items, origin: str, result: dict) -> list[Change]:
+    winners = _winners(items, origin)
+    existing = TransactionDetail.objects.in_bulk(
+        [row for _, row, _ in winners], field_name="uuid"
+    )
+    accounts = Account.objects.select_related("currency").in_bulk(
+        {
+            uuid.UUID(entry["account"])
+            for item, _, _ in winners
+            if not item.get("deleted")
+            for entry in item["entries"]
+        },
+        field_name="uuid",
+    )
+    closed_through = ClosedPeriod.objects.closed_through()
+    # The transaction each incoming entry's uuid belongs to here, if any,
+    # archived entries included
+    entry_uuids = {
+        uuid.UUID(entry["uuid"])
+        for item, _, _ in winners
+        if not item.get("deleted")
+        for entry in item["entries"]
+    }
+    owners = dict(
+        TransactionEntry.objects.filter(uuid__in=entry_uuids).values_list(
+            "uuid", "transaction_id__uuid"
+        )
+    ) | dict(
+        ArchivedTransactionEntry.objects.filter(uuid__in=entry_uuids).values_list(
+            "uuid", "transaction_id__uuid"
+        )
+    )
+
+    deleted, replaced, created = [], [], []
+    # (detail, its entries, change stamp) to write
+    written = []
+    # The transactions and entries of the bundle so far
+    claimed = set()
+    for item, row, stamp in winners:
+        if row in claimed:
+            _reject(result, row, "It is in the bundle twice.")
+            continue
+        detail = existing.get(row)
+        xact_date = (
+            None if item.get("deleted") else datetime.date.fromisoformat(item["date"])
+        )
+        if closed_through is not None and any(
+            day is not None and day <= closed_through
+            for day in (xact_date, detail and detail.xact_date)
+        ):
+            _reject(
+                result, row, f"It is in the period closed through {closed_through}."
+            )
+            continue
+        if item.get("deleted"):
+            if detail is not None:
+                deleted.append((detail, stamp))
+            continue
+
+        entries = []
+        for entry in item["entries"]:
+            account = accounts.get(uuid.UUID(entry["account"]))
+            if account is None:
+                break
+            entry = TransactionEntry(
+                uuid=uuid.UUID(entry["uuid"]),
+                account=account,
+                memo=entry["memo"],
+                amount=decimal.Decimal(entry["amount"]),
+                price=decimal.Decimal(entry["price"]),
+            )
+            entry.quantize()
+            entries.append(entry)
+        if len(entries) != len(item["entries"]):
+            _reject(result, row, "An account of its entries is not here.")
+            continue
+        entry_rows = [entry.uuid for entry in entries]
+        if len(set(entry_rows)) != len(entry_rows) or any(
+            owners.get(entry_row, row) != row or entry_row in claimed
+            for entry_row in entry_rows
+        ):
+            _reject(result, row, "An entry of it belongs to another transaction.")
+            continue
+        if not entries or sum(entry.amount for entry in entries) != 0:
+            _reject(result, row, "It is not balanced.")
+            continue
+        if item["state"] not in TransactionState.values:
+            _reject(result, row, f"{item['state']} is not a transaction state.")
+            continue
+        new = detail is None
+        if new:
+            detail = TransactionDetail(uuid=row)
+        detail.xact_date = xact_date
+        detail.description = item["description"]
+        detail.state = item["state"]
+        # What full_clean would check, but the bulk writes skip
+        try:
+            detail.clean_fields(exclude=["uuid"])
+            for entry in entries:
+                entry.clean_fields(exclude=["transaction_id", "account", "uuid"])
+        except ValidationError as e:
+            _reject(result, row, " ".join(e.messages))
+            continue
+        (created if new else replaced).append(detail)
+        claimed.update([row, *entry_rows])
+        written.append((detail, entries, stamp))
+
+    changes = []
+    # Deleted and replaced transactions lose the entries they had, logged
+    # with the time of the change that removed them
+    stamps = {detail.pk: stamp for detail, stamp in deleted} | {
+        detail.pk: stamp for detail, _, stamp in written if detail.pk is not None
+    }
+    if stamps:
+        old = TransactionEntry.objects.filter(transaction_id__in=stamps)
+        changes += [
+            Change(
+                model=ENTRY,
+                object_id=pk,
+                kind=ChangeKind.DELETE,
+                **(stamps[xact] | {"object_uuid": entry_uuid}),
+            )
+            for pk, entry_uuid, xact in old.values_list("pk", "uuid", "transaction_id")
+        ]
+        entries_removed.send(sender=TransactionEntry, entries=old)
+        old._raw_delete(old.db)
+    if deleted:
+        changes += [
+            Change(
+                model=TRANSACTION, object_id=detail.pk, kind=ChangeKind.DELETE, **stamp
+            )
+            for detail, stamp in deleted
+        ]
+        # Nothing else refers to them, as in delete_transactions
+        gone = TransactionDetail.objects.filter(pk__in=[d.pk for d, _ in deleted])
+        gone._raw_delete(gone.db)
+    if replaced:
+        TransactionDetail.objects.bulk_update(
+            replaced, ["xact_date", "description", "state"]
+        )
+    if written:
+        TransactionDetail.objects.bulk_create(created)
+        entries = []
+        for detail, xact_entries, _ in written:
+            for entry in xact_entries:
+                entry.transaction_id = detail
+                entries.append(entry)
+        TransactionEntry.objects.bulk_create(entries, batch_size=1000)
+        entries_added.send(
+            sender=TransactionEntry,
+            entries=TransactionEntry.objects.filter(
+                transaction_id__in=[detail.pk for detail, _, _ in written]
+            ),
+        )
+        inserted = {detail.pk for detail in created}
+        for detail, xact_entries, stamp in written:
+            kind = ChangeKind.INSERT if detail.pk in inserted else ChangeKind.UPDATE
+            changes.append(
+                Change(model=TRANSACTION, object_id=detail.pk, kind=kind, **stamp)
+            )
+            changes += [
+                Change(
+                    model=ENTRY,
+                    object_id=entry.pk,
+                    kind=ChangeKind.INSERT,
+                    **(stamp | {"object_uuid": entry.uuid}),
+                )
+                for entry in xact_entries
+            ]
+    return changes
+
+
+@transaction.atomic
+def apply(bundle: dict, origin: str) -> dict:
+    """Apply a bundle from the instance named `origin` with bulk writes
+
+    Of two changes to the same row the later one wins, on both instances, so
+    they end up the same. The loser's change is kept out (here) or
+    overwritten (there). A transaction is replaced whole, entries included.
+    Changes this instance can't take (a transaction in a closed period, or
+    referring to an account it doesn't have) are rejected. The changes made
+    are logged with the time and instance they were made at.
+
+    Returns:
+    {"applied": int, "kept": int, "rejected": [{"uuid": str, "error": str}]}
+
+    Raises:
+    ValueError -- The bundle is malformed
+    """
+    if not isinstance(bundle, dict):
+        raise ValueError("Expected a bundle object.")
+    result = {"applied": 0, "kept": 0, "rejected": []}
+    changes = []
+    try:
+        with Change.objects.suspended():
+            currencies = _apply_currencies(bundle["currencies"], origin, result)
+            accounts = _apply_accounts(bundle["accounts"], origin, result)
+            changes += currencies + accounts
+            changes += _apply_transactions(bundle["transactions"], origin, result)
+    except (KeyError, TypeError, ValueError, decimal.InvalidOperation) as e:
+        raise ValueError(f"Malformed bundle: {e!r}")
+    if currencies or accounts:
+        LedgerVersion.objects.bump(LedgerVersion.ACCOUNTS)
+    Change.objects.append(changes)
+
+    received = sum(len(bundle[key]) for key in KEYS.values())
+    result["applied"] = sum(change.model != ENTRY for change in changes)
+    result["kept"] = received - result["applied"] - len(result["rejected"])
+    return result
+
+
+@retry_on_contention
+def receive(bundle: dict, origin: str) -> dict:
+    """apply() as the write it is for a peer pushing its changes"""
+    return apply(bundle, origin)
+
+
+def _call(
+    url: str, payload: dict | None = None, timeout: float = 30
+) -> tuple[dict, int]:
+    """GET url, or POST payload to it as JSON, with the SYNC_TOKEN
+
+    Returns (the JSON response, bytes transferred)
+
+    Raises:
+    ValueError -- The peer answered with an error
+    """
+    data = None if payload is None else json.dumps(payload).encode()
+    request = urllib.request.Request(
+        url,
+        data=data,
+        headers={
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip",
+            "Authorization": f"Bearer {settings.SYNC_TOKEN}",
+        },
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            encoding = response.headers.get("Content-Encoding")
+    except urllib.error.HTTPError as e:
+        raise ValueError(f"{url} answered {e.code}: {e.read()[:200]!r}")
+    transferred = len(body) + len(data or b"")
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    return json.loads(body), transferred
+
+
+@retry_on_contention
+@transaction.atomic
+def _pulled(peer: SyncPeer, bundle: dict) -> dict:
+    # Applied together with the watermark, so a bundle is never applied twice
+    # or skipped
+    result = apply(bundle, peer.name)
+    peer.pulled_through = bundle["next"]
+    peer.save()
+    return result
+
+
+def sync(url: str, timeout: float = 30, from_copy: bool = False) -> dict:
+    """Pull the changes of the instance serving the sync API at url since the
+    last sync, and then push this instance's changes to it
+
+    A bundle at a time, each applied in its own transaction along with how
+    far the sync got, so an interrupted sync resumes where it stopped. With
+    `from_copy`, a first sync starts from the end of this instance's log,
+    which must be a copy of the peer's database made since its last write.
+
+    Returns:
+    {"pulled": {...}, "pushed": {...}} as apply() counts them, each with the
+    bytes transferred
+
+    Raises:
+    ValueError -- SYNC_TOKEN is unset, the peer is this instance, or it
+    answered with an error
+    """
+    if not settings.SYNC_TOKEN:
+        raise ValueError("Set SYNC_TOKEN to the token the peer was given too.")
+    peer, created = SyncPeer.objects.get_or_create(url=url)
+    if created and from_copy:
+        last = Change.objects.aggregate(last=Max("pk"))["last"] or 0
+        peer.pulled_through = peer.pushed_through = last
+        peer.save()
+    me = urllib.parse.quote(settings.INSTANCE_NAME)
+    totals = {
+        way: {"applied": 0, "kept": 0, "rejected": [], "bytes": 0}
+        for way in ("pulled", "pushed")
+    }
+
+    def add(way: str, result: dict, transferred: int):
+        for key in ("applied", "kept", "rejected"):
+            totals[way][key] += result[key]
+        totals[way]["bytes"] += transferred
+
+    while True:
+        bundle, transferred = _call(
+            f"{url}?since={peer.pulled_through}&peer={me}", timeout=timeout
+        )
+        if bundle["instance"] == settings.INSTANCE_NAME:
+            raise ValueError(f"{url} is named {bundle['instance']} too.")
+        peer.name = bundle["instance"]
+        add("pulled", _pulled(peer, bundle), transferred)
+        if not bundle["more"]:
+            break
+
+    while True:
+        bundle = outgoing(peer.pushed_through, peer.name)
+        if any(bundle[key] for key in KEYS.values()):
+            result, transferred = _call(f"{url}?peer={me}", bundle, timeout=timeout)
+            add("pushed", result, transferred)
+        peer.pushed_through = bundle["next"]
+        peer.save(update_fields=["pushed_through"])
+        if not bundle["more"]:
+            break
+
+    peer.synced_at = timezone.now()
+    peer.save(update_fields=["synced_at"])
+    return totals
@@ -1,12 +1,54 @@
 import pytest
 import decimal
-from .models import TransactionEntry, TransactionDetail
+import contextlib
+import contextvars
+import csv
+import io
+import json
+import sqlite3
+import threading
+import uuid
+from asgiref.sync import async_to_sync
+from .changes import changes_since, compact
+from .closing import close_period, reopen_period
+from . import api, search, sync as ledger_sync
+from .autocomplete import descriptions
+from .deletion import delete_transactions
+from .export import export_entries
+from .recategorize import move_entries
+from .reconcile import StatementLine, match_statement, reconcile, set_state
+from .generate import generate_ledger
+from .management.commands import refresh_replica
+from .retry import retry_on_contention
+from .models import (
+    ArchivedTransactionDetail,
+    ArchivedTransactionEntry,
+    Change,
+    ChangeKind,
+    ClearedBalance,
+    ClosedPeriod,
+    LedgerVersion,
+    MonthlyRollup,
+    SyncPeer,
+    TransactionEntry,
+    TransactionDetail,
+    TransactionState,
+)
 from .forms import TransactionCreateForm, TransactionDeleteForm
 from acctmgr.models import Account
+from currencymgr.models import Currency
+from privatefinance import routers
+from privatefinance.offload import offload, stream
 from django.db.models.deletion import RestrictedError
-from datetime import datetime
-from django.test import Client
+from datetime import date, datetime, timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from pytest_django.asserts import assertRedirects
 
 
@@ -451,6 +493,72 @@ def test_delete_transaction_form_redirect_on_missing_redirect_account(
     assertRedirects(res, reverse("acctmgr:account-index"))
 
 
+@pytest.mark.django_db
+def test_partial_transaction_responses(
+    setup_example_accounts, django_assert_num_queries
+):
+    client = Client(headers={"X-Partial": "register"})
+    data = {
+        "date": "2025-05-27",
+        "description": "A partial transaction",
+        "amount_1": "10.00",
+        "account_1": "3",
+        "amount_2": "-10.00",
+        "account_2": "2",
+        "selected_account": 2,
+    }
+    # The page costs the write and the cleared balance, not a redirect and a
+    # whole account page
+    with CaptureQueriesContext(connection) as write:
+        form = TransactionCreateForm(data)
+        assert form.is_valid()
+        form.save()
+    with django_assert_num_queries(len(write) + 1):
+        res = client.post(reverse("ledger:xact-create"), data)
+    assert res.status_code == 200
+    xact = TransactionDetail.objects.latest("pk")
+    content = res.content.decode()
+    assert f'id="register-update" data-transaction="{xact.pk}"' in content
+    assert content.count("<li ") == 1
+    assert "A partial transaction -10.00" in content
+    assert reverse("acctmgr:edit-xact-view", args=[2, xact.pk]) in content
+    # The page empties its own form
+    assert "transaction-form-fields" not in content
+    assert len(content) < 2000
+
+    # An edit replaces the transaction's rows
+    res = client.post(
+        reverse("ledger:xact-create"),
+        {
+            **data,
+            "amount_1": "12.00",
+            "amount_2": "-12.00",
+            "selected_transaction": xact.pk,
+        },
+    )
+    assert f'data-transaction="{xact.pk}"' in res.content.decode()
+    assert "A partial transaction -12.00" in res.content.decode()
+
+    # An invalid form comes back with its errors
+    res = client.post(reverse("ledger:xact-create"), {**data, "amount_2": "-1.00"})
+    assert res.status_code == 400
+    assert "register-update" not in res.content.decode()
+    assert "Transaction does not sum to 0." in res.content.decode()
+    assert 'name="amount_2" value="-1.00"' in res.content.decode()
+
+    res = client.post(
+        reverse("ledger:xact-delete"), {"transaction": xact.pk, "redirect_account": 2}
+    )
+    assert res.status_code == 200
+    assert f'data-transaction="{xact.pk}"' in res.content.decode()
+    assert "<li " not in res.content.decode()
+    assert not TransactionDetail.objects.filter(pk=xact.pk).exists()
+
+    # Without the header the page is reloaded as before
+    res = Client().post(reverse("ledger:xact-create"), data)
+    assertRedirects(res, reverse("acctmgr:account-view", args=[2]))
+
+
 @pytest.mark.django_db
 def test_transaction_form_edit_shows_simple_transaction(setup_example_accounts):
     form = TransactionCreateForm(
@@ -537,3 +645,2013 @@ def test_transaction_create_form_auto_balances():
 def test_transaction_create_form_with_different_prices_balances():
     # Will need selenium for this
     ...
+
+
+def post_simple_transaction(date, amount, debit_account="Dining"):
+    form = TransactionCreateForm(
+        {
+            "date": date,
+            "description": "A simple transaction",
+            "amount_1": amount,
+            "account_1": Account.objects.get(name=debit_account),
+            "amount_2": -amount,
+            "account_2": Account.objects.get(name="Example Bank 1"),
+        }
+    )
+    assert form.is_valid(), form.errors
+    form.save()
+    return form
+
+
+@pytest.mark.django_db
+def test_rollup_updated_on_create(setup_example_accounts):
+    post_simple_transaction(date(2025, 5, 3), decimal.Decimal("10.00"))
+    post_simple_transaction(date(2025, 5, 20), decimal.Decimal("2.50"))
+    dining = MonthlyRollup.objects.get(account__name="Dining")
+    assert dining.month == date(2025, 5, 1)
+    assert dining.debit == decimal.Decimal("12.50")
+    assert dining.credit == 0
+    assert dining.entry_count == 2
+    bank = MonthlyRollup.objects.get(account__name="Example Bank 1")
+    assert bank.credit == decimal.Decimal("12.50")
+
+
+@pytest.mark.django_db
+def test_rollup_updated_on_edit_and_delete(setup_example_accounts):
+    post_simple_transaction(date(2025, 5, 3), decimal.Decimal("10.00"))
+    update_form = TransactionCreateForm(
+        {
+            "date": date(2025, 6, 3),
+            "description": "A simple transaction",
+            "amount_1": decimal.Decimal("20.00"),
+            "account_1": Account.objects.get(name="Dining"),
+            "amount_2": decimal.Decimal("-20.00"),
+            "account_2": Account.objects.get(name="Example Bank 2"),
+            "selected_transaction": 1,
+        }
+    )
+    assert update_form.is_valid(), update_form.errors
+    update_form.save()
+    cells = MonthlyRollup.objects.filter(account__name="Dining")
+    assert [(c.month, c.debit) for c in cells] == [
+        (date(2025, 6, 1), decimal.Decimal("20.00"))
+    ]
+    assert not MonthlyRollup.objects.filter(account__name="Example Bank 1").exists()
+
+    del_form = TransactionDeleteForm({"transaction": 1})
+    assert del_form.is_valid(), del_form.errors
+    del_form.save()
+    assert MonthlyRollup.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_rollup_subtree_totals(setup_example_accounts):
+    post_simple_transaction(date(2025, 4, 30), decimal.Decimal("5.00"))
+    post_simple_transaction(date(2025, 5, 3), decimal.Decimal("10.00"))
+    post_simple_transaction(date(2025, 6, 3), decimal.Decimal("7.00"))
+    bank_accounts = Account.objects.get(name="Bank Accounts")
+    totals = MonthlyRollup.objects.subtree_totals(
+        bank_accounts, date(2025, 5, 15), date(2025, 6, 15)
+    )
+    assert totals["credit"] == decimal.Decimal("17.00")
+    assert totals["balance"] == decimal.Decimal("-17.00")
+    assert totals["entry_count"] == 2
+    assert MonthlyRollup.objects.subtree_totals(bank_accounts)["entry_count"] == 3
+
+
+@pytest.mark.django_db
+def test_rollup_rebuild_matches_incremental(setup_example_accounts):
+    post_simple_transaction(date(2025, 5, 3), decimal.Decimal("10.00"))
+    post_simple_transaction(date(2025, 6, 3), decimal.Decimal("7.00"), "Salary")
+    fields = ("account_id", "month", "debit", "credit", "entry_count")
+    incremental = set(MonthlyRollup.objects.values_list(*fields))
+    MonthlyRollup.objects.all().delete()
+    call_command("rebuild_rollups", stdout=io.StringIO())
+    assert set(MonthlyRollup.objects.values_list(*fields)) == incremental
+
+
+@pytest.mark.django_db
+def test_rollup_balances_cached_by_version(setup_example_accounts):
+    post_simple_transaction(date(2025, 5, 3), decimal.Decimal("10.00"))
+    dining = Account.objects.get(name="Dining")
+    assert MonthlyRollup.objects.balances()[dining.pk] == decimal.Decimal("10.00")
+    post_simple_transaction(date(2025, 6, 3), decimal.Decimal("5.00"))
+    assert MonthlyRollup.objects.balances()[dining.pk] == decimal.Decimal("15.00")
+    # Only the version is read while nothing changes
+    with CaptureQueriesContext(connection) as queries:
+        MonthlyRollup.objects.balances()
+    assert len(queries) == 1
+
+    # and a write by another process, which only shares the database, is seen
+    MonthlyRollup.objects.filter(account=dining).update(debit=0)
+    LedgerVersion.objects.bump()
+    assert MonthlyRollup.objects.balances()[dining.pk] == decimal.Decimal("0")
+
+
+@pytest.mark.django_db
+def test_close_period_snapshots_balances(setup_example_accounts):
+    post_simple_transaction(date(2024, 5, 3), decimal.Decimal("10.00"))
+    post_simple_transaction(date(2025, 2, 3), decimal.Decimal("5.00"))
+    before = TransactionEntry.objects.account_balances()
+    period = close_period(date(2024, 12, 31))
+    dining = Account.objects.get(name="Dining")
+    assert period.snapshots.get(account=dining).balance == decimal.Decimal("10.00")
+    assert TransactionEntry.objects.account_balances() == before
+    # Without archiving the entries stay in the live table
+    assert TransactionEntry.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_close_period_balances_are_exact(setup_example_accounts):
+    # 0.1 + 0.2 != 0.3 in floating point, which SQLite sums in
+    for amount in ("0.10", "0.20", "-0.30"):
+        post_simple_transaction(date(2024, 5, 3), decimal.Decimal(amount))
+    post_simple_transaction(date(2025, 2, 3), decimal.Decimal("0.30"))
+    dining = Account.objects.get(name="Dining")
+    bank = Account.objects.get(name="Example Bank 1")
+    assert TransactionEntry.objects.account_balances(as_of=date(2024, 12, 31)) == {
+        dining.pk: decimal.Decimal("0.00"),
+        bank.pk: decimal.Decimal("0.00"),
+    }
+    before = TransactionEntry.objects.account_balances()
+    assert before[dining.pk].as_tuple() == decimal.Decimal("0.30").as_tuple()
+    close_period(date(2024, 12, 31), archive=True)
+    reopen_period()
+    assert TransactionEntry.objects.account_balances() == before
+
+
+@pytest.mark.django_db
+def test_close_period_archives_and_reopens(setup_example_accounts):
+    post_simple_transaction(date(2024, 5, 3), decimal.Decimal("10.00"))
+    post_simple_transaction(date(2024, 6, 3), decimal.Decimal("3.00"))
+    post_simple_transaction(date(2025, 2, 3), decimal.Decimal("5.00"))
+    before = TransactionEntry.objects.account_balances()
+    close_period(date(2024, 12, 31), archive=True, batch_size=1)
+    assert TransactionDetail.objects.count() == 1
+    assert ArchivedTransactionDetail.objects.count() == 2
+    assert ArchivedTransactionEntry.objects.count() == 4
+    assert TransactionEntry.objects.account_balances() == before
+
+    reopen_period(batch_size=1)
+    assert ClosedPeriod.objects.count() == 0
+    assert TransactionDetail.objects.count() == 3
+    assert ArchivedTransactionEntry.objects.count() == 0
+    assert TransactionEntry.objects.account_balances() == before
+
+
+@pytest.mark.django_db
+def test_archive_leaves_search_but_not_balances(
+    setup_example_accounts, django_capture_on_commit_callbacks
+):
+    old = post_searchable_transaction(date(2024, 5, 3), "Bakery", decimal.Decimal(4))
+    post_searchable_transaction(date(2025, 2, 3), "Bookshop", decimal.Decimal(9))
+    set_state(TransactionDetail.objects.all(), TransactionState.CLEARED)
+    assert [s["description"] for s in descriptions.lookup("b")] == [
+        "Bookshop",
+        "Bakery",
+    ]
+    cleared = cleared_balances()
+    rollups = set(MonthlyRollup.objects.values_list("account_id", "month", "debit"))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        close_period(date(2024, 12, 31), archive=True)
+    assert search.search("bakery") == []
+    assert [s["description"] for s in descriptions.lookup("b")] == ["Bookshop"]
+    # Balances and reports still count archived transactions
+    assert cleared_balances() == cleared
+    assert (
+        set(MonthlyRollup.objects.values_list("account_id", "month", "debit"))
+        == rollups
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reopen_period()
+    assert search.search("bakery") == [old]
+    assert [s["description"] for s in descriptions.lookup("b")] == [
+        "Bookshop",
+        "Bakery",
+    ]
+    assert cleared_balances() == cleared
+
+
+@pytest.mark.django_db
+def test_closed_period_is_immutable(setup_example_accounts):
+    post_simple_transaction(date(2024, 5, 3), decimal.Decimal("10.00"))
+    close_period(date(2024, 12, 31))
+    form = TransactionCreateForm(
+        {
+            "date": date(2024, 12, 31),
+            "description": "A late transaction",
+            "amount_1": decimal.Decimal("10.00"),
+            "account_1": Account.objects.get(name="Dining"),
+            "amount_2": decimal.Decimal("-10.00"),
+            "account_2": Account.objects.get(name="Example Bank 1"),
+        }
+    )
+    assert not form.is_valid()
+    # Moving a closed transaction out of the period isn't allowed either
+    form = TransactionCreateForm(
+        {
+            "date": date(2025, 1, 2),
+            "description": "A simple transaction",
+            "amount_1": decimal.Decimal("10.00"),
+            "account_1": Account.objects.get(name="Dining"),
+            "amount_2": decimal.Decimal("-10.00"),
+            "account_2": Account.objects.get(name="Example Bank 1"),
+            "selected_transaction": 1,
+        }
+    )
+    assert not form.is_valid()
+    assert not TransactionDeleteForm({"transaction": 1}).is_valid()
+    with pytest.raises(ValueError):
+        close_period(date(2024, 6, 30))
+
+
+@pytest.mark.django_db
+def test_register_starts_from_snapshot(setup_example_accounts):
+    post_simple_transaction(date(2024, 5, 3), decimal.Decimal("10.00"))
+    post_simple_transaction(date(2025, 2, 3), decimal.Decimal("5.00"))
+    close_period(date(2024, 12, 31), archive=True)
+    dining = Account.objects.get(name="Dining")
+    res = Client().get(reverse("acctmgr:account-view", args=[dining.pk]))
+    assert res.context["opening_balance"] == decimal.Decimal("10.00")
+    assert len(res.context["transaction_entries"]) == 1
+
+
+@pytest.mark.django_db
+def test_close_and_reopen_commands(setup_example_accounts):
+    post_simple_transaction(date(2024, 5, 3), decimal.Decimal("10.00"))
+    out = io.StringIO()
+    call_command("close_period", "2024-12-31", "--archive", stdout=out)
+    assert "Closed through 2024-12-31" in out.getvalue()
+    call_command("reopen_period", stdout=out)
+    assert TransactionDetail.objects.count() == 1
+
+
+def test_retry_on_contention_retries_locked_database():
+    calls = []
+
+    @retry_on_contention(attempts=3, base_delay=0)
+    def flaky_write():
+        calls.append(1)
+        if len(calls) < 3:
+            raise OperationalError("database is locked")
+        return "written"
+
+    assert flaky_write() == "written"
+    assert len(calls) == 3
+
+
+def test_retry_on_contention_gives_up():
+    calls = []
+
+    @retry_on_contention(attempts=2, base_delay=0)
+    def locked_write():
+        calls.append(1)
+        raise OperationalError("database is locked")
+
+    with pytest.raises(OperationalError):
+        locked_write()
+    assert len(calls) == 2
+
+
+def test_retry_on_contention_ignores_other_errors():
+    calls = []
+
+    @retry_on_contention(base_delay=0)
+    def broken_write():
+        calls.append(1)
+        raise OperationalError("no such table: ledger_transactionentry")
+
+    with pytest.raises(OperationalError):
+        broken_write()
+    assert len(calls) == 1
+
+
+def test_router_reads_replica_only_in_opted_in_views(monkeypatch):
+    monkeypatch.setattr(routers, "replica_configured", lambda: True)
+    router = routers.PrimaryReplicaRouter()
+    seen = []
+
+    @routers.replica_reads
+    def report():
+        seen.append(router.db_for_read(TransactionEntry))
+        router.db_for_write(TransactionEntry)
+        # Read your own writes
+        seen.append(router.db_for_read(TransactionEntry))
+
+    # A fresh context, as writes earlier in the session pinned this one
+    contextvars.Context().run(report)
+    assert seen == ["replica", "default"]
+    assert router.db_for_read(TransactionEntry) == "default"
+
+
+def test_offload_runs_in_pool_with_context(monkeypatch):
+    monkeypatch.setattr(routers, "replica_configured", lambda: True)
+    router = routers.PrimaryReplicaRouter()
+
+    def read():
+        return threading.current_thread().name, router.db_for_read(TransactionEntry)
+
+    @routers.replica_reads
+    async def report():
+        return await offload(read)
+
+    thread, alias = contextvars.Context().run(async_to_sync(report))
+    assert thread.startswith("orm")
+    assert alias == "replica"
+
+
+def test_stream_stops_when_client_disconnects():
+    closed = threading.Event()
+
+    def numbers():
+        try:
+            n = 0
+            while True:
+                yield n
+                n += 1
+        finally:
+            closed.set()
+
+    async def read_three():
+        received = []
+        # As Django closes the response when the client goes away
+        async with contextlib.aclosing(stream(numbers, buffer=2)) as items:
+            async for n in items:
+                received.append(n)
+                if len(received) == 3:
+                    break
+        return received
+
+    assert async_to_sync(read_three)() == [0, 1, 2]
+    assert closed.wait(timeout=5)
+
+    def broken():
+        yield "first"
+        raise ValueError("broken export")
+
+    async def read_all():
+        return [item async for item in stream(broken)]
+
+    with pytest.raises(ValueError, match="broken export"):
+        async_to_sync(read_all)()
+
+
+def test_stream_runs_in_the_views_context(monkeypatch):
+    monkeypatch.setattr(routers, "replica_configured", lambda: True)
+    router = routers.PrimaryReplicaRouter()
+
+    def aliases():
+        yield router.db_for_read(TransactionEntry)
+
+    @routers.replica_reads
+    async def view(context):
+        return stream(aliases, context=contextvars.copy_context() if context else None)
+
+    async def read(context):
+        return [alias async for alias in await view(context)]
+
+    # Iterated after the view returned, so only with the view's context does
+    # it read the replica
+    assert contextvars.Context().run(async_to_sync(read), True) == ["replica"]
+    assert contextvars.Context().run(async_to_sync(read), False) == ["default"]
+
+
+def spy_on_reads(monkeypatch) -> list[tuple[type, str]]:
+    """Record the model and database of every read the router chooses, but
+    read the only database there is"""
+    monkeypatch.setattr(routers, "replica_configured", lambda: True)
+    chosen = []
+    db_for_read = routers.PrimaryReplicaRouter.db_for_read
+
+    def spy(self, model, **hints):
+        chosen.append((model, db_for_read(self, model, **hints)))
+        return "default"
+
+    monkeypatch.setattr(routers.PrimaryReplicaRouter, "db_for_read", spy)
+    return chosen
+
+
+# The export is read by the ORM thread pool, which must see committed rows
+@pytest.mark.django_db(transaction=True)
+def test_streamed_export_reads_the_replica(monkeypatch, setup_example_accounts):
+    post_searchable_transaction(date(2025, 1, 2), "Lunch", decimal.Decimal(9))
+    chosen = spy_on_reads(monkeypatch)
+
+    async def download():
+        res = await AsyncClient().get(reverse("ledger:export"), {"format": "csv"})
+        return b"".join([chunk async for chunk in res.streaming_content])
+
+    assert b"Lunch" in async_to_sync(download)()
+    assert {alias for model, alias in chosen if model is TransactionEntry} == {
+        routers.REPLICA
+    }
+
+
+@pytest.mark.django_db
+def test_replica_pinning_cookie(monkeypatch, setup_example_accounts):
+    monkeypatch.setattr(routers, "replica_configured", lambda: True)
+    dining = Account.objects.get(name="Dining")
+    client = Client()
+    res = client.post(
+        reverse("ledger:xact-create"),
+        {
+            "selected_account": dining.pk,
+            "date": "2025-01-01",
+            "description": "Dinner",
+            "amount_1": "10.00",
+            "account_1": dining.pk,
+            "amount_2": "-10.00",
+            "account_2": Account.objects.get(name="Example Bank 1").pk,
+        },
+    )
+    assert res.cookies[routers.PIN_COOKIE]["max-age"] == 60
+    assert TransactionDetail.objects.get().description == "Dinner"
+
+    # Record where the router sends each read, but read the only database
+    chosen = []
+    db_for_read = routers.PrimaryReplicaRouter.db_for_read
+
+    def spy(self, model, **hints):
+        chosen.append(db_for_read(self, model, **hints))
+        return "default"
+
+    monkeypatch.setattr(routers.PrimaryReplicaRouter, "db_for_read", spy)
+    register = reverse("acctmgr:account-view", args=[dining.pk])
+    # The register reads the primary while pinned, so sees the new transaction
+    chosen.clear()
+    res = client.get(register)
+    assert res.status_code == 200
+    assert b"Dinner" in res.content
+    assert chosen and set(chosen) == {"default"}
+    assert routers.PIN_COOKIE not in res.cookies
+    # while a client that didn't write reads the replica
+    chosen.clear()
+    assert Client().get(register).status_code == 200
+    assert routers.REPLICA in chosen
+
+
+# The worker processes see only committed rows
+@pytest.mark.django_db(transaction=True)
+def test_stress_post(setup_example_accounts):
+    out = io.StringIO()
+    call_command("stress_post", "--transactions", "20", "--processes", "2", stdout=out)
+    assert "posted 20/20 transactions from 2 processes" in out.getvalue()
+    assert "20 stored, 0 failed" in out.getvalue()
+    assert TransactionDetail.objects.count() == 20
+    balances = TransactionEntry.objects.account_balances()
+    assert sum(balances.values()) == 0
+    assert sorted(balances.values()) == [decimal.Decimal("-20.00"), 20]
+
+
+def test_refresh_replica_needs_a_replica():
+    with pytest.raises(CommandError):
+        call_command("refresh_replica")
+
+
+class FakeReplica:
+    def __init__(self, name):
+        self.settings_dict = {"NAME": str(name)}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Only SQLite replicas are copied"
+)
+# Backing up waits for the primary's open transactions
+@pytest.mark.django_db(transaction=True)
+def test_refresh_replica(monkeypatch, tmp_path, setup_example_accounts):
+    target = tmp_path / "replica.sqlite3"
+    target.write_bytes(b"the old copy")
+    replica = FakeReplica(target)
+    monkeypatch.setattr(
+        refresh_replica,
+        "connections",
+        {"default": connection, routers.REPLICA: replica},
+    )
+    monkeypatch.setattr(refresh_replica, "replica_configured", lambda: True)
+
+    # Refreshed once, and again every interval until stopped
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) > 1:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(refresh_replica.time, "sleep", sleep)
+    out = io.StringIO()
+    with pytest.raises(KeyboardInterrupt):
+        call_command("refresh_replica", interval=5, stdout=out)
+    assert sleeps == [5, 5]
+    assert out.getvalue().count("Refreshed the replica") == 2
+    # The copy was swapped in whole, and connections to the old one closed
+    assert replica.closed
+    assert not (tmp_path / "replica.sqlite3.refresh").exists()
+    copy = sqlite3.connect(target)
+    try:
+        assert copy.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+        rows = copy.execute("SELECT symbol FROM currencymgr_currency").fetchall()
+        assert rows == [("USD",)]
+    finally:
+        copy.close()
+
+    # A failed copy leaves the replica as it was
+    class BrokenPrimary:
+        class connection:
+            @staticmethod
+            def backup(target):
+                raise sqlite3.OperationalError("disk I/O error")
+
+        def ensure_connection(self):
+            pass
+
+    target.write_bytes(b"the old copy")
+    replica.closed = False
+    refresh_replica.connections["default"] = BrokenPrimary()
+    with pytest.raises(CommandError, match="disk I/O error"):
+        refresh_replica.Command().refresh()
+    assert target.read_bytes() == b"the old copy"
+    assert not replica.closed
+    assert not (tmp_path / "replica.sqlite3.refresh").exists()
+
+
+@pytest.mark.django_db
+def test_generate_ledger():
+    result = generate_ledger(
+        accounts=30, depth=3, years=1, entries_per_day=10, end_date=date(2025, 6, 30)
+    )
+    assert Account.objects.count() == 30
+    assert TransactionEntry.objects.count() == result["entries"]
+    assert TransactionDetail.objects.count() == result["transactions"]
+    totals = {}
+    for transaction_id, amount in TransactionEntry.objects.values_list(
+        "transaction_id", "amount"
+    ):
+        totals[transaction_id] = totals.get(transaction_id, 0) + amount
+    assert set(totals.values()) == {0}
+    assert not TransactionEntry.objects.filter(account__placeholder=True).exists()
+
+    # The cube was kept up to date through the usual signal
+    cells = set(MonthlyRollup.objects.values_list("account", "month", "entry_count"))
+    MonthlyRollup.objects.rebuild()
+    assert cells == set(
+        MonthlyRollup.objects.values_list("account", "month", "entry_count")
+    )
+
+
+def post_searchable_transaction(date, description, amount, memo="", debit="Dining"):
+    form = TransactionCreateForm(
+        {
+            "date": date,
+            "description": description,
+            "amount_1": amount,
+            "account_1": Account.objects.get(name=debit).pk,
+            "memo_1": memo,
+            "amount_2": -amount,
+            "account_2": Account.objects.get(name="Example Bank 1").pk,
+        }
+    )
+    assert form.is_valid(), form.errors
+    form.save()
+    return TransactionDetail.objects.latest("pk")
+
+
+@pytest.mark.django_db
+def test_search_ranks_and_filters(setup_example_accounts):
+    amazon = post_searchable_transaction(
+        date(2021, 3, 4), "Amazon order", decimal.Decimal("25.00")
+    )
+    amazon_again = post_searchable_transaction(
+        date(2023, 1, 2),
+        "Amazon Amazon marketplace",
+        decimal.Decimal("90.00"),
+        debit="Salary",
+    )
+    memo = post_searchable_transaction(
+        date(2021, 5, 6), "Bookshop", decimal.Decimal("5.00"), memo="amazon gift"
+    )
+
+    # Description matches rank above memo matches
+    results = search.search("amaz")
+    assert set(results[:2]) == {amazon, amazon_again}
+    assert results[2] == memo
+    assert results[0].rank >= results[1].rank > results[2].rank
+    assert search.search("amazon order") == [amazon]
+    assert search.search("amazon", start=date(2021, 1, 1), end=date(2021, 12, 31)) == [
+        amazon,
+        memo,
+    ]
+    assert search.search("amazon", min_amount=20, max_amount=50) == [amazon]
+    dining = Account.objects.get(name="Dining")
+    assert set(search.search("amazon", account=dining)) == {amazon, memo}
+    assert search.search("") == []
+
+
+@pytest.mark.django_db
+def test_search_index_follows_edits_and_deletes(setup_example_accounts):
+    xact = post_searchable_transaction(
+        date(2025, 1, 2), "Coffee", decimal.Decimal("3.00")
+    )
+    form = TransactionCreateForm(
+        {
+            "date": "2025-01-02",
+            "description": "Tea",
+            "selected_transaction": xact.pk,
+            "amount_1": "3.00",
+            "account_1": Account.objects.get(name="Dining").pk,
+            "amount_2": "-3.00",
+            "account_2": Account.objects.get(name="Example Bank 1").pk,
+        }
+    )
+    assert form.is_valid(), form.errors
+    form.save()
+    assert search.search("coffee") == []
+    assert search.search("tea") == [xact]
+
+    form = TransactionDeleteForm({"transaction": xact.pk})
+    assert form.is_valid()
+    form.save()
+    assert search.search("tea") == []
+    assert search.rebuild() == 0
+
+
+@pytest.mark.django_db
+def test_search_view(setup_example_accounts):
+    post_searchable_transaction(date(2025, 1, 2), "Coffee", decimal.Decimal("3.00"))
+    res = Client().get(reverse("ledger:search"), {"q": "coff"})
+    assert [xact.description for xact in res.context["results"]] == ["Coffee"]
+    assert b"Dining" in res.content
+
+
+@pytest.mark.django_db
+def test_description_autocomplete(
+    setup_example_accounts, django_capture_on_commit_callbacks
+):
+    for day in (date(2020, 1, 1), date(2020, 2, 1), date(2020, 3, 1)):
+        post_searchable_transaction(day, "Grocer", decimal.Decimal("10.00"))
+    post_searchable_transaction(date(2025, 1, 1), "Greengrocer", decimal.Decimal("4"))
+    groceries = post_searchable_transaction(
+        date(2025, 2, 1), "Groceries", decimal.Decimal("7.50"), memo="weekly"
+    )
+
+    # Recent use outweighs older, more frequent use
+    suggestions = descriptions.lookup("gr")
+    assert [s["description"] for s in suggestions] == [
+        "Groceries",
+        "Greengrocer",
+        "Grocer",
+    ]
+    assert suggestions[0]["transaction"] == groceries.pk
+    assert suggestions[2]["uses"] == 3
+    assert [s["description"] for s in descriptions.lookup("GROC")] == [
+        "Groceries",
+        "Grocer",
+    ]
+    assert descriptions.lookup("x") == descriptions.lookup(" ") == []
+
+    # Writes update the built index once they commit
+    with django_capture_on_commit_callbacks(execute=True):
+        coffee = post_searchable_transaction(
+            date(2025, 3, 1), "Coffee", decimal.Decimal("3")
+        )
+    assert descriptions.lookup("cof")[0]["transaction"] == coffee.pk
+    with django_capture_on_commit_callbacks(execute=True):
+        form = TransactionDeleteForm({"transaction": groceries.pk})
+        assert form.is_valid()
+        form.save()
+        form = TransactionDeleteForm({"transaction": coffee.pk})
+        assert form.is_valid()
+        form.save()
+    assert descriptions.lookup("cof") == []
+    assert [s["description"] for s in descriptions.lookup("gr")] == [
+        "Greengrocer",
+        "Grocer",
+    ]
+
+    # Deleting the newest use falls back to the one before
+    newest = TransactionDetail.objects.filter(description="Grocer").latest("pk")
+    with django_capture_on_commit_callbacks(execute=True):
+        form = TransactionDeleteForm({"transaction": newest.pk})
+        assert form.is_valid()
+        form.save()
+    grocer = descriptions.lookup("grocer")[0]
+    assert (grocer["uses"], grocer["last_date"]) == (2, date(2020, 2, 1))
+
+
+@pytest.mark.django_db
+def test_description_autocomplete_views(
+    setup_example_accounts, django_assert_num_queries
+):
+    xact = post_searchable_transaction(
+        date(2025, 1, 2), "Coffee", decimal.Decimal("3.25"), memo="latte"
+    )
+    client = Client()
+    client.get(reverse("ledger:description-autocomplete"), {"q": "c"})
+    with django_assert_num_queries(0):
+        res = client.get(reverse("ledger:description-autocomplete"), {"q": "co"})
+    assert res.json()["suggestions"] == [
+        {
+            "description": "Coffee",
+            "uses": 1,
+            "last_date": "2025-01-02",
+            "transaction": xact.pk,
+        }
+    ]
+
+    res = client.get(reverse("ledger:xact-splits"), {"transaction": xact.pk})
+    assert res.json()["splits"] == [
+        {
+            "account": Account.objects.get(name="Dining").pk,
+            "amount": "3.25",
+            "memo": "latte",
+        },
+        {
+            "account": Account.objects.get(name="Example Bank 1").pk,
+            "amount": "-3.25",
+            "memo": "",
+        },
+    ]
+    res = client.get(reverse("ledger:xact-splits"), {"transaction": "x"})
+    assert res.status_code == 400
+
+
+def cleared_balances():
+    return {
+        balance.account.name: (balance.cleared, balance.reconciled)
+        for balance in ClearedBalance.objects.select_related("account")
+        if balance.cleared or balance.reconciled
+    }
+
+
+@pytest.mark.django_db
+def test_reconcile_statement(setup_example_accounts):
+    bank = Account.objects.get(name="Example Bank 1")
+    first = post_searchable_transaction(date(2025, 1, 2), "A", decimal.Decimal(10))
+    second = post_searchable_transaction(date(2025, 1, 5), "B", decimal.Decimal(10))
+    third = post_searchable_transaction(date(2025, 1, 20), "C", decimal.Decimal("25.5"))
+    post_searchable_transaction(date(2025, 3, 1), "D", decimal.Decimal(99))
+    lines = [
+        StatementLine(date(2025, 1, 4), decimal.Decimal("-10.00")),
+        StatementLine(date(2025, 1, 3), decimal.Decimal("-10")),
+        StatementLine(date(2025, 1, 21), decimal.Decimal("-25.50")),
+    ]
+
+    # Each line takes the nearest unused entry of its amount
+    assert match_statement(bank, lines) == {
+        1: first.pk,
+        0: second.pk,
+        2: third.pk,
+    }
+    assert match_statement(bank, lines, window_days=0) == {}
+
+    # An unmatched line leaves the matched transactions cleared
+    extra = StatementLine(date(2025, 1, 10), decimal.Decimal("-7"), "Fee")
+    result = reconcile(bank, lines + [extra], decimal.Decimal("-52.50"))
+    assert (result["matched"], result["unmatched"], result["reconciled"]) == (
+        3,
+        [extra],
+        0,
+    )
+    assert result["cleared_balance"] == decimal.Decimal("-45.5")
+    assert cleared_balances() == {
+        "Example Bank 1": (decimal.Decimal("-45.5"), 0),
+        "Dining": (decimal.Decimal("45.5"), 0),
+    }
+
+    # Balancing to the ending balance reconciles everything cleared
+    result = reconcile(bank, lines, decimal.Decimal("-45.50"))
+    assert (result["matched"], result["difference"], result["reconciled"]) == (3, 0, 3)
+    assert set(
+        TransactionDetail.objects.filter(state="R").values_list("pk", flat=True)
+    ) == {first.pk, second.pk, third.pk}
+    assert match_statement(bank, lines) == {}
+
+    # Edits and deletes keep the balances in step
+    form = TransactionDeleteForm({"transaction": third.pk})
+    assert form.is_valid()
+    form.save()
+    assert cleared_balances() == {
+        "Example Bank 1": (0, decimal.Decimal("-20")),
+        "Dining": (0, decimal.Decimal("20")),
+    }
+    incremental = cleared_balances()
+    assert ClearedBalance.objects.rebuild() == 2
+    assert cleared_balances() == incremental
+
+
+@pytest.mark.django_db
+def test_reconcile_view(setup_example_accounts):
+    bank = Account.objects.get(name="Example Bank 1")
+    post_searchable_transaction(date(2025, 1, 2), "A", decimal.Decimal(10))
+    statement = SimpleUploadedFile(
+        "statement.csv", b"Date,Amount,Description\n2025-01-02,-10.00,Coffee\n"
+    )
+    res = Client().post(
+        reverse("ledger:reconcile", args=[bank.pk]),
+        {"statement": statement, "ending_balance": "-10", "window_days": 3},
+    )
+    assert res.context["result"]["reconciled"] == 1
+    assert b"Reconciled 1 transactions" in res.content
+
+    statement = SimpleUploadedFile("statement.csv", b"2025-01-02,-10.00\nnonsense\n")
+    res = Client().post(
+        reverse("ledger:reconcile", args=[bank.pk]),
+        {"statement": statement, "ending_balance": "-10", "window_days": 3},
+    )
+    assert res.context["reconcile_form"].errors["statement"] == [
+        "Line 2 is not date,amount[,description]"
+    ]
+
+
+def rollup_cells():
+    return set(
+        MonthlyRollup.objects.values_list(
+            "account", "month", "debit", "credit", "entry_count"
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_move_entries(setup_example_accounts):
+    dining = Account.objects.get(name="Dining")
+    savings = Account.objects.get(name="Example Bank 2")
+    post_searchable_transaction(date(2025, 1, 2), "Cafe", decimal.Decimal(3))
+    post_searchable_transaction(date(2025, 2, 2), "Cafe", decimal.Decimal(4))
+    post_searchable_transaction(date(2025, 2, 9), "Market", decimal.Decimal(20))
+    reconcile(
+        Account.objects.get(name="Example Bank 1"),
+        [StatementLine(date(2025, 2, 9), decimal.Decimal(-20))],
+        decimal.Decimal(0),
+    )
+
+    assert move_entries(dining, savings, description="caf", start=date(2025, 2, 1)) == 1
+    assert move_entries(dining, savings, end=date(2025, 1, 31)) == 1
+    assert list(
+        TransactionEntry.objects.filter(account=savings).values_list(
+            "transaction_id__description", flat=True
+        )
+    ) == ["Cafe", "Cafe"]
+    assert move_entries(dining, savings) == 1
+    assert not TransactionEntry.objects.filter(account=dining).exists()
+    assert cleared_balances() == {
+        "Example Bank 1": (decimal.Decimal(-20), 0),
+        "Example Bank 2": (decimal.Decimal(20), 0),
+    }
+    # The derived data matches a rebuild and every transaction is balanced
+    incremental = rollup_cells()
+    MonthlyRollup.objects.rebuild()
+    assert rollup_cells() == incremental
+    assert (
+        not TransactionEntry.objects.values("transaction_id")
+        .annotate(total=Sum("amount"))
+        .exclude(total=0)
+    )
+
+    with pytest.raises(ValueError, match="placeholder"):
+        move_entries(savings, Account.objects.get(name="Bank Accounts"))
+    euro = Account.objects.create(
+        name="Euro",
+        currency=Currency.objects.create(full_name="Euro", symbol="EUR"),
+        acct_type="asset",
+        description="Euro Account",
+    )
+    with pytest.raises(ValueError, match="currency"):
+        move_entries(savings, euro)
+    close_period(date(2025, 1, 31))
+    with pytest.raises(ValueError, match="closed"):
+        move_entries(savings, dining, start=date(2025, 1, 1))
+    # Without a start, only the open period moves
+    assert move_entries(savings, dining) == 2
+
+
+@pytest.mark.django_db
+def test_move_entries_view(setup_example_accounts):
+    dining = Account.objects.get(name="Dining")
+    savings = Account.objects.get(name="Example Bank 2")
+    post_searchable_transaction(date(2025, 1, 2), "Cafe", decimal.Decimal(3))
+    post_searchable_transaction(date(2025, 2, 9), "Market", decimal.Decimal(20))
+    client = Client()
+    url = reverse("ledger:move-entries", args=[dining.pk])
+    res = client.get(url)
+    assert res.status_code == 200
+    assert "move_entries_form" in res.context
+
+    # Invalid forms come back with their errors, and nothing moves
+    res = client.post(url, {"target": "", "start": "not a date"})
+    assert res.status_code == 200
+    assert set(res.context["move_entries_form"].errors) == {"target", "start"}
+    euro = Account.objects.create(
+        name="Euro",
+        currency=Currency.objects.create(full_name="Euro", symbol="EUR"),
+        acct_type="asset",
+        description="Euro Account",
+    )
+    res = client.post(url, {"target": euro.pk})
+    assert res.status_code == 200
+    [error] = res.context["move_entries_form"].non_field_errors()
+    assert "currency" in error
+    assert TransactionEntry.objects.filter(account=dining).count() == 2
+
+    res = client.post(url, {"target": savings.pk, "description": "caf"})
+    assertRedirects(res, reverse("acctmgr:account-view", args=[dining.pk]))
+    assert list(
+        TransactionEntry.objects.filter(account=dining).values_list(
+            "transaction_id__description", flat=True
+        )
+    ) == ["Market"]
+    assert TransactionEntry.objects.filter(account=savings).count() == 1
+
+
+@pytest.mark.django_db
+def test_delete_transactions(setup_example_accounts):
+    for day in range(1, 6):
+        post_searchable_transaction(date(2025, 1, day), "Import", decimal.Decimal(day))
+    post_searchable_transaction(date(2025, 1, 3), "Rent", decimal.Decimal(500))
+    kept = post_searchable_transaction(
+        date(2025, 1, 3), "Import", decimal.Decimal(7), debit="Salary"
+    )
+
+    with pytest.raises(ValueError, match="criterion"):
+        delete_transactions()
+    deleted = delete_transactions(
+        start=date(2025, 1, 2),
+        end=date(2025, 1, 4),
+        account=Account.objects.get(name="Dining"),
+        description="impo",
+        batch_size=2,
+    )
+    assert deleted == 3
+    assert list(
+        TransactionDetail.objects.order_by("xact_date", "pk").values_list(
+            "description", "xact_date"
+        )
+    ) == [
+        ("Import", date(2025, 1, 1)),
+        ("Rent", date(2025, 1, 3)),
+        ("Import", date(2025, 1, 3)),
+        ("Import", date(2025, 1, 5)),
+    ]
+    assert TransactionEntry.objects.count() == 8
+    assert kept in search.search("import")
+    assert len(search.search("import")) == 3
+    incremental = rollup_cells()
+    MonthlyRollup.objects.rebuild()
+    assert rollup_cells() == incremental
+
+    close_period(date(2025, 1, 3))
+    with pytest.raises(ValueError, match="closed period"):
+        delete_transactions(description="import")
+    assert delete_transactions(start=date(2025, 1, 4)) == 1
+
+
+@pytest.mark.django_db
+def test_batch_delete_view(setup_example_accounts):
+    post_searchable_transaction(date(2025, 1, 2), "Import", decimal.Decimal(1))
+    post_searchable_transaction(date(2025, 1, 3), "Import", decimal.Decimal(2))
+    post_searchable_transaction(date(2025, 1, 3), "Rent", decimal.Decimal(3))
+    client = Client()
+    url = reverse("ledger:xact-batch-delete")
+    res = client.post(url, {"description": "import"})
+    assert res.context["matching"] == 2
+    assert TransactionDetail.objects.count() == 3
+    res = client.post(url, {"description": "import", "confirm": "on"})
+    assert res.context["deleted"] == 2
+    assert list(TransactionDetail.objects.values_list("description", flat=True)) == [
+        "Rent"
+    ]
+    res = client.post(url, {})
+    assert res.context["batch_delete_form"].non_field_errors() == [
+        "Give at least one criterion to select transactions."
+    ]
+
+
+@pytest.mark.django_db
+def test_xact_batch_create_api(setup_example_accounts, django_assert_max_num_queries):
+    bank = Account.objects.get(name="Example Bank 1").pk
+    dining = Account.objects.get(name="Dining").pk
+    url = reverse("ledger:xact-batch-create")
+    client = Client(enforce_csrf_checks=True)
+
+    def payload(count, **split):
+        return [
+            {
+                "date": f"2025-01-{day % 28 + 1:02}",
+                "description": f"Lunch {day}",
+                "splits": [
+                    {"account": dining, "amount": "12.50", "memo": "food", **split},
+                    {"account": bank, "amount": -12.5},
+                ],
+            }
+            for day in range(count)
+        ]
+
+    with django_assert_max_num_queries(25):
+        res = client.post(url, payload(300), content_type="application/json")
+    assert res.status_code == 201
+    ids = res.json()["ids"]
+    assert list(
+        TransactionDetail.objects.filter(pk__in=ids)
+        .order_by("pk")
+        .values_list("description", flat=True)
+    ) == [f"Lunch {day}" for day in range(300)]
+    assert TransactionEntry.objects.filter(account_id=dining).aggregate(Sum("amount"))[
+        "amount__sum"
+    ] == decimal.Decimal("3750")
+    incremental = rollup_cells()
+    MonthlyRollup.objects.rebuild()
+    assert rollup_cells() == incremental
+
+    # One bad transaction rejects the whole batch
+    bad = payload(3)
+    bad[1]["splits"][1]["amount"] = "-12.49"
+    bad[2]["splits"][0]["account"] = Account.objects.get(name="Bank Accounts").pk
+    res = client.post(url, bad, content_type="application/json")
+    assert res.status_code == 400
+    assert res.json()["errors"] == [
+        {"index": 1, "error": "Transaction is not balanced."},
+        {
+            "index": 2,
+            "error": f"Account {bad[2]['splits'][0]['account']} is a placeholder.",
+        },
+    ]
+    assert TransactionDetail.objects.count() == 300
+
+    res = client.post(url, payload(1, amount=True), content_type="application/json")
+    assert res.json()["errors"] == [{"index": 0, "error": "amount must be a number."}]
+    close_period(date(2025, 1, 31))
+    res = client.post(url, payload(1), content_type="application/json")
+    assert "closed period" in res.json()["errors"][0]["error"]
+    assert client.post(url, "{", content_type="application/json").status_code == 400
+    assert client.post(url, {"transactions": "x"}).status_code == 415
+    assert client.get(url).status_code == 405
+
+
+def _lunch(dining: int, bank: int, **split) -> dict:
+    return {
+        "date": "2025-01-02",
+        "description": "Lunch",
+        "splits": [
+            {"account": dining, "amount": "12.50", **split},
+            {"account": bank, "amount": "-12.50"},
+        ],
+    }
+
+
+# Each a payload built from a valid transaction, and the error it gets
+BATCH_REJECTIONS = {
+    "empty batch": (lambda xact: [], None, "Expected a non-empty list."),
+    "not a list": (lambda xact: xact, None, "Expected a non-empty list."),
+    "not an object": (lambda xact: ["Lunch"], 0, "A transaction must be an object."),
+    "bad date": (
+        lambda xact: [{**xact, "date": "2025-02-30"}],
+        0,
+        "date must be an ISO date (YYYY-MM-DD).",
+    ),
+    "no description": (
+        lambda xact: [{**xact, "description": ""}],
+        0,
+        "description must be a string of 1 to 100 characters.",
+    ),
+    "no splits": (
+        lambda xact: [{**xact, "splits": []}],
+        0,
+        "splits must be a non-empty list.",
+    ),
+    "splits not a list": (
+        lambda xact: [{**xact, "splits": "Dining"}],
+        0,
+        "splits must be a non-empty list.",
+    ),
+    "split not an object": (
+        lambda xact: [{**xact, "splits": [*xact["splits"], 5]}],
+        0,
+        "A split must be an object.",
+    ),
+    "unknown account": (
+        lambda xact: [{**xact, "splits": [{**xact["splits"][0], "account": 9999}]}],
+        0,
+        "Account 9999 does not exist.",
+    ),
+    "account not an id": (
+        lambda xact: [{**xact, "splits": [{**xact["splits"][0], "account": True}]}],
+        0,
+        "Account True does not exist.",
+    ),
+    "placeholder account": (
+        lambda xact: [
+            {
+                **xact,
+                "splits": [
+                    {
+                        **xact["splits"][0],
+                        "account": Account.objects.get(name="Bank Accounts").pk,
+                    },
+                    xact["splits"][1],
+                ],
+            }
+        ],
+        0,
+        "is a placeholder.",
+    ),
+    "memo too long": (
+        lambda xact: [{**xact, "splits": [{**xact["splits"][0], "memo": "x" * 257}]}],
+        0,
+        "memo must be a string of at most 256 characters.",
+    ),
+    "non-numeric amount": (
+        lambda xact: [{**xact, "splits": [{**xact["splits"][0], "amount": "ten"}]}],
+        0,
+        "amount must be a number.",
+    ),
+    "amount a list": (
+        lambda xact: [{**xact, "splits": [{**xact["splits"][0], "amount": [1]}]}],
+        0,
+        "amount must be a number.",
+    ),
+    "amount too large": (
+        lambda xact: [{**xact, "splits": [{**xact["splits"][0], "amount": "1e9"}]}],
+        0,
+        "amount is out of range.",
+    ),
+    "amount not finite": (
+        lambda xact: [{**xact, "splits": [{**xact["splits"][0], "amount": "NaN"}]}],
+        0,
+        "amount is out of range.",
+    ),
+    "non-numeric price": (
+        lambda xact: [{**xact, "splits": [{**xact["splits"][0], "price": "x"}]}],
+        0,
+        "price must be a number.",
+    ),
+    "unbalanced": (
+        lambda xact: [{**xact, "splits": xact["splits"][:1]}],
+        0,
+        "Transaction is not balanced.",
+    ),
+    "one bad among good": (
+        lambda xact: [xact, {**xact, "date": None}],
+        1,
+        "date must be an ISO date (YYYY-MM-DD).",
+    ),
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("case", BATCH_REJECTIONS)
+def test_xact_batch_create_api_rejects(setup_example_accounts, case):
+    build, index, error = BATCH_REJECTIONS[case]
+    xact = _lunch(
+        Account.objects.get(name="Dining").pk,
+        Account.objects.get(name="Example Bank 1").pk,
+    )
+    logged = Change.objects.count()
+    res = Client(enforce_csrf_checks=True).post(
+        reverse("ledger:xact-batch-create"),
+        build(xact),
+        content_type="application/json",
+    )
+    assert res.status_code == 400
+    [rejected] = res.json()["errors"]
+    assert rejected["index"] == index
+    assert rejected["error"].endswith(error)
+    # All or nothing
+    assert not TransactionDetail.objects.exists()
+    assert not TransactionEntry.objects.exists()
+    assert Change.objects.count() == logged
+
+
+@pytest.mark.django_db
+def test_xact_batch_create_api_rejects_requests(setup_example_accounts, monkeypatch):
+    url = reverse("ledger:xact-batch-create")
+    client = Client(enforce_csrf_checks=True)
+    xact = _lunch(
+        Account.objects.get(name="Dining").pk,
+        Account.objects.get(name="Example Bank 1").pk,
+    )
+    res = client.post(url, "[{", content_type="application/json")
+    assert (res.status_code, res.json()) == (400, {"error": "Invalid JSON"})
+    res = client.post(url, json.dumps([xact]), content_type="text/plain")
+    assert res.status_code == 415
+    monkeypatch.setattr(api, "MAX_TRANSACTIONS", 1)
+    res = client.post(url, [xact, xact], content_type="application/json")
+    assert res.json()["errors"] == [
+        {"index": None, "error": "At most 1 transactions per request."}
+    ]
+
+    # A write refused by the ledger, after validating
+    def refuse(transactions):
+        raise ValueError("The ledger is busy.")
+
+    monkeypatch.setattr(api, "create_transactions", refuse)
+    res = client.post(url, [xact], content_type="application/json")
+    assert res.status_code == 400
+    assert res.json()["errors"] == [{"index": None, "error": "The ledger is busy."}]
+    assert not TransactionDetail.objects.exists()
+
+
+@pytest.mark.django_db
+def test_export_entries(setup_example_accounts):
+    yen = Currency(full_name="Yen", symbol="JPY", current_price=1, fraction_traded=0)
+    yen.save()
+    Account(
+        name="Yen Cash",
+        currency=yen,
+        acct_type="asset",
+        description="Travel money",
+    ).save()
+    post_searchable_transaction(date(2024, 12, 30), "Old", decimal.Decimal(5))
+    post_searchable_transaction(
+        date(2025, 1, 2), 'Dinner, "Joe\'s"', decimal.Decimal("12.5"), memo="tip\nincl"
+    )
+    post_searchable_transaction(
+        date(2025, 1, 3), "Exchange", decimal.Decimal(1500), debit="Yen Cash"
+    )
+    close_period(date(2024, 12, 31), archive=True)
+
+    rows = list(csv.reader(io.StringIO("".join(export_entries("csv")))))
+    assert rows[0] == [
+        "transaction",
+        "date",
+        "description",
+        "state",
+        "account",
+        "currency",
+        "memo",
+        "amount",
+        "price",
+    ]
+    # Archived history first, amounts in each currency's places
+    assert [row[1:] for row in rows[1:]] == [
+        ["2024-12-30", "Old", "N", "Dining", "USD", "", "5.00", "1.00"],
+        ["2024-12-30", "Old", "N", "Example Bank 1", "USD", "", "-5.00", "1.00"],
+        [
+            "2025-01-02",
+            'Dinner, "Joe\'s"',
+            "N",
+            "Dining",
+            "USD",
+            "tip\nincl",
+            "12.50",
+            "1.00",
+        ],
+        [
+            "2025-01-02",
+            'Dinner, "Joe\'s"',
+            "N",
+            "Example Bank 1",
+            "USD",
+            "",
+            "-12.50",
+            "1.00",
+        ],
+        ["2025-01-03", "Exchange", "N", "Yen Cash", "JPY", "", "1500", "1"],
+        [
+            "2025-01-03",
+            "Exchange",
+            "N",
+            "Example Bank 1",
+            "USD",
+            "",
+            "-1500.00",
+            "1.00",
+        ],
+    ]
+
+    lines = [
+        json.loads(line)
+        for line in "".join(
+            export_entries(
+                "jsonl",
+                account=Account.objects.get(name="Dining"),
+                start=date(2025, 1, 1),
+            )
+        ).splitlines()
+    ]
+    assert lines == [
+        {
+            "transaction": int(rows[3][0]),
+            "date": "2025-01-02",
+            "description": 'Dinner, "Joe\'s"',
+            "state": "N",
+            "account": "Dining",
+            "currency": "USD",
+            "memo": "tip\nincl",
+            "amount": "12.50",
+            "price": "1.00",
+        }
+    ]
+    assert "Old" not in "".join(export_entries("csv", archived=False))
+    with pytest.raises(ValueError, match="format"):
+        list(export_entries("xml"))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_view_and_command(setup_example_accounts, tmp_path):
+    post_searchable_transaction(date(2025, 1, 2), "Dinner", decimal.Decimal("12.5"))
+    dining = Account.objects.get(name="Dining")
+
+    async def download(params):
+        res = await AsyncClient().get(reverse("ledger:export"), params)
+        if res.status_code != 200:
+            return res, b""
+        return res, b"".join([chunk async for chunk in res.streaming_content])
+
+    res, body = async_to_sync(download)({"format": "jsonl", "account": dining.pk})
+    assert res["Content-Type"] == "application/x-ndjson; charset=utf-8"
+    assert res["Content-Disposition"] == (
+        f'attachment; filename="register-{dining.pk}.jsonl"'
+    )
+    assert json.loads(body)["amount"] == "12.50"
+    res, body = async_to_sync(download)({"format": "xml"})
+    assert res.status_code == 400
+
+    output = tmp_path / "journal.csv"
+    call_command("export_ledger", "--output", output)
+    assert output.read_text().count("Dinner") == 2
+    stdout = io.StringIO()
+    call_command(
+        "export_ledger", "--format", "jsonl", "--account", dining.pk, stdout=stdout
+    )
+    assert len(stdout.getvalue().splitlines()) == 1
+    with pytest.raises(CommandError, match="does not exist"):
+        call_command("export_ledger", "--account", 999)
+
+
+@pytest.mark.django_db
+def test_ledger_versions(setup_example_accounts):
+    dining = Account.objects.get(name="Dining")
+    bank = Account.objects.get(name="Example Bank 1")
+    salary = Account.objects.get(name="Salary")
+    scopes = [LedgerVersion.LEDGER, dining.pk, bank.pk, salary.pk]
+
+    def versions() -> list[int]:
+        return [version for version, _ in LedgerVersion.objects.current(scopes)]
+
+    # Creating the accounts counted once each
+    start = versions()
+    assert start[1:] == [1, 1, 1]
+
+    def changed() -> list[int]:
+        return [now - then for now, then in zip(versions(), start)]
+
+    xact = post_searchable_transaction(date(2025, 1, 2), "Lunch", decimal.Decimal(9))
+    assert changed() == [1, 1, 1, 0]
+
+    # An edit removes and adds the entries, an account's entries move
+    form = TransactionCreateForm(
+        {
+            "date": "2025-01-02",
+            "description": "Lunch",
+            "amount_1": "10.00",
+            "account_1": dining.pk,
+            "amount_2": "-10.00",
+            "account_2": bank.pk,
+            "selected_transaction": xact.pk,
+        }
+    )
+    assert form.is_valid()
+    form.save()
+    move_entries(dining, Account.objects.get(name="Example Bank 2"))
+    assert changed() == [4, 4, 3, 0]
+    assert LedgerVersion.objects.current([dining.pk])[0][1] is not None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_conditional_responses(setup_example_accounts, django_assert_max_num_queries):
+    client = Client()
+    dining = Account.objects.get(name="Dining")
+    salary = Account.objects.get(name="Salary")
+    post_searchable_transaction(date(2025, 1, 2), "Lunch", decimal.Decimal(9))
+    urls = {
+        "dining": reverse("acctmgr:account-view", args=[dining.pk]),
+        "salary": reverse("acctmgr:account-view", args=[salary.pk]),
+        "report": reverse("budgetmgr:budget-report"),
+        "export": reverse("ledger:export") + f"?format=csv&account={dining.pk}",
+        "search": reverse("ledger:search") + "?q=lunch",
+    }
+
+    def etags():
+        tags = {}
+        for name, url in urls.items():
+            res = client.get(url)
+            assert res.status_code == 200
+            assert "no-cache" in res["Cache-Control"]
+            # The account tree was written when the accounts were created
+            assert res.has_header("Last-Modified")
+            tags[name] = res["ETag"]
+        return tags
+
+    before = etags()
+    for name, url in urls.items():
+        # Only the versions are read (by the ORM threads for async views)
+        with django_assert_max_num_queries(1):
+            res = client.get(url, headers={"If-None-Match": before[name]})
+        assert res.status_code == 304, name
+        assert not res.content
+
+    # A transaction changes its accounts' pages and the ledger wide views
+    post_searchable_transaction(date(2025, 1, 3), "Dinner", decimal.Decimal(20))
+    after = etags()
+    assert after["salary"] == before["salary"]
+    assert all(after[name] != before[name] for name in ("dining", "report", "export"))
+
+    # Renaming an account changes every account page
+    res = client.post(
+        reverse("acctmgr:account-editor", args=[salary.pk]),
+        {
+            "name": "Wages",
+            "currency": salary.currency_id,
+            "acct_type": salary.acct_type,
+            "description": salary.description,
+            "parent": "",
+            "placeholder": "",
+        },
+    )
+    assert res.status_code == 302
+    renamed = client.get(urls["salary"], headers={"If-None-Match": after["salary"]})
+    assert renamed.status_code == 200
+    assert "Wages" in renamed.content.decode()
+
+
+def _kinds(page) -> list[tuple[str, str]]:
+    return [(change["model"], change["kind"]) for change in page.changes]
+
+
+@pytest.mark.django_db
+def test_change_log(setup_example_accounts):
+    # The example accounts and their currencies were logged as they were saved
+    start = changes_since(0, 1000)
+    assert _kinds(start).count(("acctmgr.account", "I")) == Account.objects.count()
+    assert (
+        _kinds(start).count(("currencymgr.currency", "I")) == Currency.objects.count()
+    )
+    assert not start.more
+
+    dining = Account.objects.get(name="Dining")
+    xact = post_searchable_transaction(date(2025, 1, 2), "Lunch", decimal.Decimal(9))
+    page = changes_since(start.next)
+    assert _kinds(page) == [
+        ("ledger.transactiondetail", "I"),
+        ("ledger.transactionentry", "I"),
+        ("ledger.transactionentry", "I"),
+    ]
+    assert page.changes[0]["data"] == {
+        "id": xact.pk,
+        "xact_date": date(2025, 1, 2),
+        "description": "Lunch",
+        "state": "N",
+        "uuid": xact.uuid,
+    }
+    assert {change["data"]["account"] for change in page.changes[1:]} == {
+        dining.pk,
+        Account.objects.get(name="Example Bank 1").pk,
+    }
+
+    # A page keeps only the latest change of each row, and leaves out rows
+    # gone since, whose delete comes further on
+    set_state(TransactionDetail.objects.filter(pk=xact.pk), TransactionState.CLEARED)
+    dining.description = "Eating out"
+    dining.save()
+    page = changes_since(start.next)
+    assert _kinds(page)[-2:] == [
+        ("ledger.transactiondetail", "U"),
+        ("acctmgr.account", "U"),
+    ]
+    assert page.changes[-2]["data"]["state"] == "C"
+    delete_transactions(ids=[xact.pk])
+    page = changes_since(start.next, 5)
+    assert page.more and _kinds(page) == [("acctmgr.account", "U")]
+    page = changes_since(page.next)
+    assert not page.more
+    assert _kinds(page) == [("ledger.transactionentry", "D")] * 2 + [
+        ("ledger.transactiondetail", "D")
+    ]
+    assert all(change["data"] is None for change in page.changes)
+
+    # Compaction drops superseded changes only, so reading from any point,
+    # the start included, still gives the same rows
+    everything = changes_since(0, 1000)
+    logged = Change.objects.count()
+    assert compact(timedelta(days=1)) == 0
+    assert compact(timedelta(0)) == logged - len(everything.changes)
+    assert changes_since(0, 1000).changes == everything.changes
+    assert _kinds(changes_since(start.next)) == [("acctmgr.account", "U")] + [
+        ("ledger.transactionentry", "D")
+    ] * 2 + [("ledger.transactiondetail", "D")]
+
+    with pytest.raises(ValueError):
+        changes_since(-1)
+    with pytest.raises(ValueError):
+        changes_since(0, 0)
+
+
+@pytest.mark.django_db
+def test_change_log_set_wise_writes(setup_example_accounts):
+    # Archiving takes rows out of the live ledger, and reopening puts them back
+    post_simple_transaction(date(2024, 5, 3), decimal.Decimal("10.00"))
+    post_simple_transaction(date(2025, 2, 3), decimal.Decimal("5.00"))
+    since = changes_since(0, 1000).next
+    close_period(date(2024, 12, 31), archive=True)
+    page = changes_since(since)
+    assert _kinds(page) == [("ledger.transactionentry", "A")] * 2 + [
+        ("ledger.transactiondetail", "A")
+    ]
+    assert all(change["data"] is None for change in page.changes)
+    reopen_period()
+    page = changes_since(page.next)
+    assert (
+        _kinds(page)
+        == [("ledger.transactiondetail", "R")] + [("ledger.transactionentry", "R")] * 2
+    )
+    assert page.changes[0]["data"]["xact_date"] == date(2024, 5, 3)
+
+    generate_ledger(
+        accounts=10,
+        currencies=1,
+        years=1,
+        entries_per_day=2,
+        end_date=date(2025, 6, 30),
+    )
+    page = changes_since(page.next, 10000)
+    assert not page.more
+    counts = {
+        "currencymgr.currency": 1,
+        "acctmgr.account": 10,
+        "ledger.transactiondetail": TransactionDetail.objects.count() - 2,
+        "ledger.transactionentry": TransactionEntry.objects.count() - 4,
+    }
+    for model, count in counts.items():
+        assert _kinds(page).count((model, "I")) == count, model
+
+
+@pytest.mark.django_db
+def test_changes_view_and_command(setup_example_accounts):
+    client = Client()
+    since = changes_since(0, 1000).next
+    post_searchable_transaction(date(2025, 1, 2), "Lunch", decimal.Decimal(9))
+
+    res = client.get(reverse("ledger:changes"), {"since": since, "limit": 2})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["more"] and body["next"] == since + 2
+    assert body["changes"][1]["data"]["amount"] == "9.0000000000"
+    res = client.get(reverse("ledger:changes"), {"since": body["next"]})
+    assert res.json()["changes"][0]["kind"] == "I"
+    assert not res.json()["more"]
+    for query in ({"since": "x"}, {"since": -1}, {"limit": 100000}):
+        assert client.get(reverse("ledger:changes"), query).status_code == 400
+
+    out, err = io.StringIO(), io.StringIO()
+    call_command(
+        "ledger_changes", since=since, limit=1, all=True, stdout=out, stderr=err
+    )
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [line["model"] for line in lines] == [
+        "ledger.transactiondetail",
+        "ledger.transactionentry",
+        "ledger.transactionentry",
+    ]
+    assert err.getvalue().strip() == f"next: {since + 3}, more: false"
+    out = io.StringIO()
+    call_command("compact_changes", days=0, stdout=out)
+    assert out.getvalue().strip() == "Dropped 0 superseded changes"
+
+
+def _snapshot() -> list[tuple]:
+    """The whole ledger by uuid, as two synced instances should agree on it"""
+    return [
+        (
+            str(detail.uuid),
+            detail.xact_date,
+            detail.description,
+            detail.state,
+            sorted(
+                (str(entry.uuid), str(entry.account.uuid), entry.memo, entry.amount)
+                for entry in detail.transactionentry_set.all()
+            ),
+        )
+        for detail in TransactionDetail.objects.order_by("uuid").prefetch_related(
+            "transactionentry_set__account"
+        )
+    ] + sorted(
+        (str(account.uuid), account.name, str(account.currency.uuid), account.parent_id)
+        for account in Account.objects.select_related("currency", "parent")
+        if account.parent is None
+    )
+
+
+@pytest.mark.django_db
+def test_sync_round_trip(setup_example_accounts, settings):
+    settings.INSTANCE_NAME = "travel"
+    post_searchable_transaction(date(2025, 1, 2), "Lunch", decimal.Decimal(9))
+    post_searchable_transaction(
+        date(2025, 1, 3), "Pay", decimal.Decimal(-20), debit="Salary"
+    )
+    bundle = json.loads(json.dumps(ledger_sync.outgoing(0, "home")))
+    assert not bundle["more"] and bundle["next"] == Change.objects.latest("pk").pk
+    assert len(bundle["currencies"]) == Currency.objects.count()
+    assert len(bundle["accounts"]) == Account.objects.count()
+    assert [len(xact["entries"]) for xact in bundle["transactions"]] == [2, 2]
+    before = _snapshot()
+    rollups = sorted(
+        MonthlyRollup.objects.values_list("account__name", "debit", "credit")
+    )
+
+    # Into an instance with nothing in it yet
+    settings.INSTANCE_NAME = "home"
+    delete_transactions(
+        ids=list(TransactionDetail.objects.values_list("pk", flat=True))
+    )
+    Account.objects.filter(parent=None).delete()
+    Currency.objects.all().delete()
+    Change.objects.all().delete()
+    result = ledger_sync.apply(bundle, "travel")
+    assert result == {
+        "applied": Currency.objects.count() + Account.objects.count() + 2,
+        "kept": 0,
+        "rejected": [],
+    }
+    assert _snapshot() == before
+    assert (
+        sorted(MonthlyRollup.objects.values_list("account__name", "debit", "credit"))
+        == rollups
+    )
+    assert set(Change.objects.values_list("origin", flat=True)) == {"travel"}
+    assert search.search("Lunch")
+
+    # Nothing goes back to where it came from, and applying it again is a no-op
+    echo = ledger_sync.outgoing(0, "travel")
+    assert not any(echo[key] for key in ("currencies", "accounts", "transactions"))
+    assert len(ledger_sync.outgoing(0, "attic")["transactions"]) == 2
+    result = ledger_sync.apply(bundle, "travel")
+    assert result == {
+        "applied": 0,
+        "kept": Currency.objects.count() + Account.objects.count() + 2,
+        "rejected": [],
+    }
+    assert _snapshot() == before
+
+
+@pytest.mark.django_db
+def test_sync_conflicts(setup_example_accounts, settings):
+    settings.INSTANCE_NAME = "home"
+    xact = post_searchable_transaction(date(2025, 1, 2), "Lunch", decimal.Decimal(9))
+    [item] = ledger_sync.outgoing(0, "travel")["transactions"]
+    changed_at = datetime.fromisoformat(item["changed_at"])
+    # Changes without an origin were made on the instance sending them
+    del item["origin"]
+
+    def edited(at, description, amount="9"):
+        entries = [
+            {**entry, "amount": amount if float(entry["amount"]) > 0 else f"-{amount}"}
+            for entry in item["entries"]
+        ]
+        return {
+            "currencies": [],
+            "accounts": [],
+            "transactions": [
+                {
+                    **item,
+                    "changed_at": at.isoformat(),
+                    "description": description,
+                    "entries": entries,
+                }
+            ],
+        }
+
+    # The later change wins; at the same moment, the instance named last
+    result = ledger_sync.apply(edited(changed_at - timedelta(1), "Older"), "travel")
+    assert result == {"applied": 0, "kept": 1, "rejected": []}
+    ledger_sync.apply(edited(changed_at, "Tied"), "attic")
+    assert TransactionDetail.objects.get(pk=xact.pk).description == "Lunch"
+    ledger_sync.apply(edited(changed_at, "Tied"), "travel")
+    assert TransactionDetail.objects.get(pk=xact.pk).description == "Tied"
+    result = ledger_sync.apply(
+        edited(changed_at + timedelta(1), "Newer", "12"), "travel"
+    )
+    assert result == {"applied": 1, "kept": 0, "rejected": []}
+    xact.refresh_from_db()
+    assert xact.description == "Newer"
+    assert sorted(xact.transactionentry_set.values_list("uuid", "amount")) == sorted(
+        (
+            uuid.UUID(entry["uuid"]),
+            decimal.Decimal(12) * (1 if float(entry["amount"]) > 0 else -1),
+        )
+        for entry in item["entries"]
+    )
+    assert MonthlyRollup.objects.get(account__name="Dining").debit == 12
+    # The local change wins over an older one of the peer's in turn
+    xact.description = "Mine"
+    xact.save()
+    stale = edited(changed_at + timedelta(microseconds=1), "Theirs")
+    assert ledger_sync.apply(stale, "travel")["kept"] == 1
+    assert TransactionDetail.objects.get(pk=xact.pk).description == "Mine"
+
+    # What can't be taken is rejected, and the rest still applied
+    bundle = edited(changed_at + timedelta(3), "Unbalanced")
+    bundle["transactions"][0]["entries"][0]["amount"] = "1"
+    unknown = {
+        **item,
+        "uuid": str(uuid.uuid4()),
+        "changed_at": bundle["transactions"][0]["changed_at"],
+    }
+    unknown["entries"] = [
+        {**entry, "uuid": str(uuid.uuid4()), "account": str(uuid.uuid4())}
+        for entry in item["entries"]
+    ]
+    bundle["transactions"].append(unknown)
+    result = ledger_sync.apply(bundle, "travel")
+    assert result["applied"] == 0
+    assert [rejected["error"] for rejected in result["rejected"]] == [
+        "It is not balanced.",
+        "An account of its entries is not here.",
+    ]
+    with pytest.raises(ValueError):
+        ledger_sync.apply({"currencies": [], "accounts": [{"uuid": "x"}]}, "travel")
+
+    # Deletes win the same way, outside closed periods
+    deleted = {
+        "uuid": item["uuid"],
+        "changed_at": (changed_at + timedelta(4)).isoformat(),
+        "deleted": True,
+    }
+    ClosedPeriod.objects.create(end_date=date(2025, 1, 31))
+    bundle = {"currencies": [], "accounts": [], "transactions": [deleted]}
+    assert ledger_sync.apply(bundle, "travel")["rejected"]
+    ClosedPeriod.objects.all().delete()
+    assert ledger_sync.apply(bundle, "travel")["applied"] == 1
+    assert not TransactionDetail.objects.filter(pk=xact.pk).exists()
+    assert (
+        not MonthlyRollup.objects.filter(account__name="Dining")
+        .exclude(debit=0)
+        .exists()
+    )
+
+
+@pytest.mark.django_db
+def test_sync_rejects_what_would_corrupt_the_ledger(setup_example_accounts, settings):
+    settings.INSTANCE_NAME = "home"
+    settings.SYNC_TOKEN = "secret"
+    lunch = post_searchable_transaction(date(2025, 1, 2), "Lunch", decimal.Decimal(9))
+    post_searchable_transaction(date(2025, 1, 3), "Dinner", decimal.Decimal(20))
+    sent = ledger_sync.outgoing(0, "travel")
+    accounts = {item["name"]: item for item in sent["accounts"]}
+    later = {"changed_at": (timezone.now() + timedelta(1)).isoformat()}
+
+    def new_account(name, parent):
+        return {
+            **accounts["Dining"],
+            **later,
+            "uuid": str(uuid.uuid4()),
+            "name": name,
+            "parent": parent,
+        }
+
+    # Parent links that would make a cycle, through this instance's accounts
+    # or the bundle's own, and the accounts only their rejects would parent
+    looped = {
+        **accounts["Bank Accounts"],
+        **later,
+        "parent": accounts["Example Bank 1"]["uuid"],
+    }
+    first = new_account("First", None)
+    second = new_account("Second", first["uuid"])
+    first["parent"] = second["uuid"]
+    orphan = new_account("Orphan", first["uuid"])
+    kept = new_account("Kept", accounts["Dining"]["uuid"])
+    long_name = new_account("x" * 200, None)
+    bundle = {
+        "currencies": [],
+        "accounts": [looped, first, second, orphan, kept, long_name],
+        "transactions": [],
+    }
+    result = ledger_sync.apply(bundle, "travel")
+    assert result["applied"] == 1
+    assert {r["uuid"]: r["error"] for r in result["rejected"]} == {
+        looped["uuid"]: "Its parent would make a cycle of accounts.",
+        first["uuid"]: "Its parent would make a cycle of accounts.",
+        second["uuid"]: "Its parent would make a cycle of accounts.",
+        orphan["uuid"]: "Its parent is not here.",
+        long_name["uuid"]: (
+            "Ensure this value has at most 20 characters (it has 200)."
+        ),
+    }
+    assert Account.objects.get(name="Bank Accounts").parent is None
+    assert Account.objects.get(name="Kept").parent.name == "Dining"
+    assert not Account.objects.filter(name__in=["First", "Second", "Orphan"])
+
+    # Entries whose uuids belong to another transaction, here or earlier in
+    # the bundle, and a transaction sent twice
+    [item] = [x for x in sent["transactions"] if x["uuid"] == str(lunch.uuid)]
+    dinner = [x for x in sent["transactions"] if x["uuid"] != str(lunch.uuid)][0]
+
+    def new_transaction(*entry_uuids):
+        return {
+            **item,
+            **later,
+            "uuid": str(uuid.uuid4()),
+            "entries": [
+                {**entry, "uuid": entry_uuid}
+                for entry, entry_uuid in zip(item["entries"], entry_uuids)
+            ],
+        }
+
+    taken = new_transaction(dinner["entries"][0]["uuid"], str(uuid.uuid4()))
+    fine = new_transaction(str(uuid.uuid4()), str(uuid.uuid4()))
+    reused = new_transaction(fine["entries"][0]["uuid"], str(uuid.uuid4()))
+    repeated = new_transaction(*[str(uuid.uuid4())] * 2)
+    too_long = {**new_transaction(str(uuid.uuid4()), str(uuid.uuid4()))}
+    too_long["description"] = "x" * 101
+    bundle = {
+        "currencies": [],
+        "accounts": [],
+        "transactions": [taken, fine, reused, {**fine}, repeated, too_long],
+    }
+    entries = TransactionEntry.objects.count()
+    # The same over the API, which answers rather than failing
+    res = Client(headers={"authorization": "Bearer secret"}).post(
+        f"{reverse('ledger:sync')}?peer=travel",
+        bundle,
+        content_type="application/json",
+    )
+    assert res.status_code == 200
+    result = res.json()
+    assert result["applied"] == 1
+    belongs = "An entry of it belongs to another transaction."
+    assert result["rejected"] == [
+        {"uuid": taken["uuid"], "error": belongs},
+        {"uuid": reused["uuid"], "error": belongs},
+        {"uuid": fine["uuid"], "error": "It is in the bundle twice."},
+        {"uuid": repeated["uuid"], "error": belongs},
+        {
+            "uuid": too_long["uuid"],
+            "error": "Ensure this value has at most 100 characters (it has 101).",
+        },
+    ]
+    assert TransactionEntry.objects.count() == entries + 2
+    assert (
+        TransactionEntry.objects.get(
+            uuid=dinner["entries"][0]["uuid"]
+        ).transaction_id.description
+        == "Dinner"
+    )
+
+
+@pytest.mark.django_db
+def test_sync_period_close(setup_example_accounts, settings):
+    # The travel instance closes and archives a period before syncing with
+    # home, which keeps it open
+    settings.INSTANCE_NAME = "travel"
+    old = post_searchable_transaction(date(2024, 5, 3), "Rent", decimal.Decimal(9))
+    post_searchable_transaction(date(2025, 2, 3), "Lunch", decimal.Decimal(5))
+    synced = ledger_sync.outgoing(0, "home")["next"]
+    close_period(date(2024, 12, 31), archive=True)
+    closing = ledger_sync.outgoing(synced, "home")
+    assert closing["next"] > synced
+    assert not closing["transactions"]
+
+    # The archiving isn't sent, so home keeps its transactions
+    reopen_period()
+    settings.INSTANCE_NAME = "home"
+    before = _snapshot()
+    result = ledger_sync.apply(closing, "travel")
+    assert result == {"applied": 0, "kept": 0, "rejected": []}
+    assert _snapshot() == before
+
+    # Nor is the restoring, which doesn't count as a change of the row either
+    settings.INSTANCE_NAME = "travel"
+    reopened = ledger_sync.outgoing(closing["next"], "home")
+    assert not reopened["transactions"]
+    [item] = [
+        item
+        for item in ledger_sync.outgoing(0, "home")["transactions"]
+        if item["uuid"] == str(old.uuid)
+    ]
+    restored = Change.objects.get(object_uuid=old.uuid, kind=ChangeKind.RESTORE)
+    item["changed_at"] = restored.recorded_at.isoformat()
+    item["origin"] = "home"
+    item["description"] = "Rent in May"
+    bundle = {"currencies": [], "accounts": [], "transactions": [item]}
+    assert ledger_sync.apply(bundle, "home")["applied"] == 1
+    assert TransactionDetail.objects.get(uuid=old.uuid).description == "Rent in May"
+
+
+@pytest.mark.django_db
+def test_sync_view_and_command(setup_example_accounts, settings, monkeypatch):
+    settings.INSTANCE_NAME = "home"
+    url = reverse("ledger:sync")
+    post_searchable_transaction(date(2025, 1, 2), "Lunch", decimal.Decimal(9))
+    # Only for peers with the shared token, and for none without one
+    settings.SYNC_TOKEN = ""
+    assert Client().get(url, {"peer": "travel"}).status_code == 403
+    settings.SYNC_TOKEN = "secret"
+    for authorization in (
+        {},
+        {"authorization": "Bearer wrong"},
+        {"authorization": "secret"},
+    ):
+        res = Client(headers=authorization).get(url, {"peer": "travel"})
+        assert res.status_code == 401
+        res = Client(headers=authorization).post(
+            f"{url}?peer=travel", {}, content_type="application/json"
+        )
+        assert res.status_code == 401
+    client = Client(headers={"authorization": "Bearer secret"})
+    for query in ({}, {"peer": "home"}, {"peer": "travel", "since": "x"}):
+        assert client.get(url, query).status_code == 400
+    assert client.put(f"{url}?peer=travel").status_code == 405
+    res = client.get(url, {"peer": "travel"}, headers={"accept-encoding": "gzip"})
+    assert res.headers["Content-Encoding"] == "gzip"
+    bundle = client.get(url, {"peer": "travel"}).json()
+    assert bundle["instance"] == "home" and len(bundle["transactions"]) == 1
+    res = client.post(f"{url}?peer=travel", "{", content_type="application/json")
+    assert res.status_code == 400
+    res = client.post(f"{url}?peer=travel", {}, content_type="application/json")
+    assert res.status_code == 400
+    res = client.post(f"{url}?peer=travel", bundle, content_type="application/json")
+    assert res.json() == {
+        "applied": 0,
+        "kept": Currency.objects.count() + Account.objects.count() + 1,
+        "rejected": [],
+    }
+
+    # The peer sends a transaction of its own, and gets this instance's
+    # changes back but for that one
+    [item] = bundle["transactions"]
+    theirs = {
+        **item,
+        "uuid": str(uuid.uuid4()),
+        "origin": "travel",
+        "description": "Dinner",
+        "entries": [{**entry, "uuid": str(uuid.uuid4())} for entry in item["entries"]],
+    }
+    calls = []
+
+    def call(called, payload=None, timeout=30):
+        calls.append((called, payload))
+        if payload is not None:
+            return {"applied": 1, "kept": 0, "rejected": []}, 40
+        pulled = {
+            "instance": "travel",
+            "next": 7,
+            "more": False,
+            "currencies": [],
+            "accounts": [],
+            "transactions": [theirs] if "since=0" in called else [],
+        }
+        return pulled, 100
+
+    monkeypatch.setattr(ledger_sync, "_call", call)
+    out, err = io.StringIO(), io.StringIO()
+    call_command("sync_ledger", "http://travel/ledger/api/sync", stdout=out, stderr=err)
+    assert out.getvalue().splitlines() == [
+        "Pulled 1 changes, kept 0, rejected 0 (100 bytes)",
+        "Pushed 1 changes, kept 0, rejected 0 (40 bytes)",
+    ]
+    assert TransactionDetail.objects.filter(description="Dinner").exists()
+    [(pull, _), (push, pushed)] = calls
+    assert pull == "http://travel/ledger/api/sync?since=0&peer=home"
+    assert push == "http://travel/ledger/api/sync?peer=home"
+    assert theirs["uuid"] not in {xact["uuid"] for xact in pushed["transactions"]}
+    assert item["uuid"] in {xact["uuid"] for xact in pushed["transactions"]}
+    peer = SyncPeer.objects.get()
+    assert (peer.name, peer.pulled_through) == ("travel", 7)
+    assert peer.pushed_through == Change.objects.latest("pk").pk
+
+    # Only what changed since, from then on
+    calls.clear()
+    totals = ledger_sync.sync("http://travel/ledger/api/sync")
+    assert [called for called, _ in calls] == [
+        "http://travel/ledger/api/sync?since=7&peer=home"
+    ]
+    assert totals["pulled"]["applied"] == totals["pushed"]["applied"] == 0
+    settings.INSTANCE_NAME = "travel"
+    with pytest.raises(CommandError):
+        call_command("sync_ledger", "http://travel/ledger/api/sync")
+    settings.INSTANCE_NAME = "home"
+    settings.SYNC_TOKEN = ""
+    calls.clear()
+    with pytest.raises(CommandError):
+        call_command("sync_ledger", "http://travel/ledger/api/sync")
+    assert not calls
+
+    # The peer is sent the token
+    monkeypatch.undo()
+    settings.SYNC_TOKEN = "secret"
+    requests = []
+
+    class Response(io.BytesIO):
+        headers = {}
+
+    def urlopen(request, timeout):
+        requests.append(request)
+        return Response(b"{}")
+
+    monkeypatch.setattr(ledger_sync.urllib.request, "urlopen", urlopen)
+    ledger_sync._call("http://travel/ledger/api/sync?since=0&peer=home")
+    assert requests[0].get_header("Authorization") == "Bearer secret"
@@ -5,5 +5,19 @@ from . import views
 app_name = "ledger"
 urlpatterns = [
     path("create-transaction", views.xact_create, name="xact-create"),
+    path("api/transactions", views.xact_batch_create, name="xact-batch-create"),
+    path("api/changes", views.changes, name="changes"),
+    path("api/sync", views.sync, name="sync"),
     path("delete-transaction", views.xact_delete, name="xact-delete"),
+    path("delete-transactions", views.xact_batch_delete, name="xact-batch-delete"),
+    path("export", views.export, name="export"),
+    path("search", views.search, name="search"),
+    path(
+        "description-autocomplete",
+        views.description_autocomplete,
+        name="description-autocomplete",
+    ),
+    path("move-entries/<int:pk>", views.move_entries, name="move-entries"),
+    path("reconcile/<int:pk>", views.reconcile, name="reconcile"),
+    path("transaction-splits", views.xact_splits, name="xact-splits"),
 ]
@@ -1,20 +1,112 @@
-from django.http import HttpResponseRedirect, HttpRequest, HttpResponse
+import contextvars
+import hmac
+import json
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import (
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
 from django.urls import reverse
-from .forms import TransactionCreateForm, TransactionDeleteForm
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import (
+    require_GET,
+    require_http_methods,
+    require_POST,
+)
+from privatefinance.offload import offload, stream
+from privatefinance.routers import replica_reads
+from acctmgr.forms import AccountMergeForm
+from acctmgr.models import Account
+from . import (
+    api,
+    autocomplete,
+    changes as change_log,
+    search as ledger_search,
+    sync as ledger_sync,
+)
+from .conditional import account_scopes, ledger_scopes, versioned
+from .export import export_entries
+from .models import ClearedBalance, TransactionEntry
+from .forms import (
+    ExportForm,
+    MoveEntriesForm,
+    TransactionBatchDeleteForm,
+    ReconcileForm,
+    TransactionCreateForm,
+    TransactionDeleteForm,
+    TransactionSearchForm,
+)
+from .recategorize import move_entries as move_account_entries
+from .reconcile import cleared_balance, reconcile as reconcile_statement
+
+
+# Set by js/register_partial.js, which swaps the response into the page
+PARTIAL_HEADER = "X-Partial"
+
+
+def _is_partial(request: HttpRequest) -> bool:
+    return request.headers.get(PARTIAL_HEADER) == "register"
+
+
+def _register_update(
+    account_id: int,
+    transaction: int | None = None,
+    entries: list[TransactionEntry] = (),
+    form: TransactionCreateForm | None = None,
+    status: int = 200,
+) -> HttpResponse:
+    """The account page's changed register rows, or the form with its errors
+
+    Rendered without the request, so none of the page's context processors
+    run: the rows come from the entries just written, and only the cleared
+    balance is queried. The page empties its own form after a write, rather
+    than swapping in a fresh one with every split's account choices.
+    """
+    context = {
+        "account_id": account_id,
+        "transaction": transaction,
+        # A transaction can have several entries in the account
+        "entries": [entry for entry in entries if entry.account_id == account_id],
+        "transaction_create_form": form,
+    }
+    if transaction is not None:
+        context["cleared_balance"] = (
+            ClearedBalance.objects.select_related("account__currency")
+            .filter(account_id=account_id)
+            .first()
+        )
+    return HttpResponse(
+        render_to_string("ledger/register_update.html", context), status=status
+    )
 
 
 def xact_create(request: HttpRequest):
     if request.method == "POST":
         form = TransactionCreateForm(request.POST)
+        partial = _is_partial(request)
         if form.is_valid():
-            form.save()
-            return HttpResponseRedirect(
-                reverse(
-                    "acctmgr:account-view", args=[form.cleaned_data["selected_account"]]
+            entries = form.save()
+            account_id = form.cleaned_data["selected_account"]
+            if partial and account_id:
+                return _register_update(
+                    account_id, entries[0].transaction_id_id, entries
                 )
+            return HttpResponseRedirect(
+                reverse("acctmgr:account-view", args=[account_id])
             )
         else:
             print(form.errors)
+            if partial and (account_id := form.cleaned_data.get("selected_account")):
+                # The form again, with its errors
+                return _register_update(account_id, form=form, status=400)
     return HttpResponseRedirect(reverse("acctmgr:account-index"))
 
 
@@ -25,9 +117,239 @@ def xact_delete(request: HttpRequest) -> HttpResponse:
         if form.is_valid():
             form.save()
             if redirect_account := form.cleaned_data["redirect_account"]:
+                if _is_partial(request):
+                    # No rows replace the deleted transaction's
+                    return _register_update(
+                        redirect_account, form.cleaned_data["transaction"].pk
+                    )
                 return HttpResponseRedirect(
                     reverse("acctmgr:account-view", args=[redirect_account])
                 )
         else:
             print(form.errors)
     return HttpResponseRedirect(reverse("acctmgr:account-index"))
+
+
+# Called by scripts rather than forms. Browsers can't send a cross-site JSON
+# body without a CORS preflight, which is never granted.
+@csrf_exempt
+@require_POST
+def xact_batch_create(request: HttpRequest) -> JsonResponse:
+    if request.content_type != "application/json":
+        return JsonResponse({"error": "Expected application/json"}, status=415)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    transactions, errors = api.parse_transactions(payload)
+    if errors:
+        return JsonResponse({"errors": errors}, status=400)
+    try:
+        ids = api.create_transactions(transactions)
+    except ValueError as e:
+        return JsonResponse({"errors": [{"index": None, "error": str(e)}]}, status=400)
+    return JsonResponse({"ids": ids}, status=201)
+
+
+def xact_batch_delete(request: HttpRequest):
+    context = {}
+    if request.method == "POST":
+        form = TransactionBatchDeleteForm(request.POST)
+        if form.is_valid():
+            if form.cleaned_data["confirm"]:
+                try:
+                    context["deleted"] = form.save()
+                    form = TransactionBatchDeleteForm()
+                except ValueError as e:
+                    form.add_error(None, str(e))
+            else:
+                # Show how many match before deleting them
+                context["matching"] = form.count()
+                data = request.POST.copy()
+                data["confirm"] = "on"
+                form = TransactionBatchDeleteForm(data)
+    else:
+        form = TransactionBatchDeleteForm()
+    context["batch_delete_form"] = form
+    return render(request, "ledger/batch_delete.html", context)
+
+
+@replica_reads
+@versioned(ledger_scopes)
+def search(request: HttpRequest):
+    form = TransactionSearchForm(request.GET or None)
+    results = []
+    if form.is_valid():
+        results = ledger_search.search(
+            form.cleaned_data["q"],
+            account=form.cleaned_data["account"],
+            start=form.cleaned_data["start"],
+            end=form.cleaned_data["end"],
+            min_amount=form.cleaned_data["min_amount"],
+            max_amount=form.cleaned_data["max_amount"],
+        )
+        prefetch_related_objects(results, "transactionentry_set__account__currency")
+    return render(
+        request, "ledger/search.html", {"search_form": form, "results": results}
+    )
+
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+def _export_scopes(request: HttpRequest) -> list[int]:
+    try:
+        return account_scopes(int(request.GET["account"]))
+    except (KeyError, ValueError):
+        return ledger_scopes(request)
+
+
+@replica_reads
+@versioned(_export_scopes)
+async def export(request: HttpRequest):
+    form = ExportForm(request.GET)
+    # Validating looks up the account
+    if not await offload(form.is_valid):
+        return HttpResponseBadRequest()
+    export_format = form.cleaned_data["format"]
+    account = form.cleaned_data["account"]
+    response = StreamingHttpResponse(
+        stream(
+            export_entries,
+            export_format,
+            account,
+            form.cleaned_data["start"],
+            form.cleaned_data["end"],
+            # Streamed after the view returns, so with its replica routing
+            context=contextvars.copy_context(),
+        ),
+        content_type=EXPORT_CONTENT_TYPES[export_format],
+    )
+    name = f"register-{account.pk}" if account else "journal"
+    response["Content-Disposition"] = f'attachment; filename="{name}.{export_format}"'
+    return response
+
+
+def description_autocomplete(request: HttpRequest) -> JsonResponse:
+    return JsonResponse(
+        {"suggestions": autocomplete.descriptions.lookup(request.GET.get("q", ""))}
+    )
+
+
+@replica_reads
+@versioned(ledger_scopes)
+def xact_splits(request: HttpRequest) -> JsonResponse:
+    try:
+        pk = int(request.GET.get("transaction", ""))
+    except ValueError:
+        return JsonResponse({"error": "Invalid transaction id"}, status=400)
+    return JsonResponse({"splits": autocomplete.splits([pk])[pk]})
+
+
+@replica_reads
+@require_GET
+def changes(request: HttpRequest) -> JsonResponse:
+    try:
+        since = int(request.GET.get("since", "0"))
+        limit = int(request.GET.get("limit", change_log.PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "since and limit must be integers"}, status=400)
+    try:
+        page = change_log.changes_since(since, limit)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(page._asdict())
+
+
+# Called by the sync_ledger command of another instance: a GET pulls this
+# instance's changes, a POST pushes the caller's. It authenticates with the
+# shared SYNC_TOKEN rather than a session, so there is no CSRF token either.
+@csrf_exempt
+@gzip_page
+@require_http_methods(["GET", "POST"])
+def sync(request: HttpRequest) -> JsonResponse:
+    if not settings.SYNC_TOKEN:
+        return JsonResponse(
+            {"error": "Syncing is off, SYNC_TOKEN is unset"}, status=403
+        )
+    scheme, _, given = request.headers.get("Authorization", "").partition(" ")
+    if scheme != "Bearer" or not hmac.compare_digest(
+        given.encode(), settings.SYNC_TOKEN.encode()
+    ):
+        return JsonResponse({"error": "Invalid sync token"}, status=401)
+    peer = request.GET.get("peer", "")
+    if not peer or peer == settings.INSTANCE_NAME:
+        return JsonResponse(
+            {"error": "peer must name the calling instance, not this one"},
+            status=400,
+        )
+    if request.method == "GET":
+        try:
+            since = int(request.GET.get("since", "0"))
+        except ValueError:
+            return JsonResponse({"error": "since must be an integer"}, status=400)
+        return JsonResponse(ledger_sync.outgoing(since, peer))
+
+    if request.content_type != "application/json":
+        return JsonResponse({"error": "Expected application/json"}, status=415)
+    try:
+        bundle = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    try:
+        return JsonResponse(ledger_sync.receive(bundle, peer))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+
+def reconcile(request: HttpRequest, pk: int):
+    account = get_object_or_404(Account.objects.select_related("currency"), pk=pk)
+    context = {"account": account}
+    if request.method == "POST":
+        form = ReconcileForm(request.POST, request.FILES)
+        if form.is_valid():
+            context["result"] = reconcile_statement(
+                account,
+                form.cleaned_data["statement"],
+                form.cleaned_data["ending_balance"],
+                form.cleaned_data["window_days"],
+            )
+    else:
+        form = ReconcileForm()
+    context["reconcile_form"] = form
+    context["cleared_balance"] = cleared_balance(account)
+    return render(request, "ledger/reconcile.html", context)
+
+
+def move_entries(request: HttpRequest, pk: int):
+    account = get_object_or_404(Account, pk=pk)
+    if request.method == "POST":
+        form = MoveEntriesForm(request.POST)
+        if form.is_valid():
+            try:
+                move_account_entries(
+                    account,
+                    form.cleaned_data["target"],
+                    start=form.cleaned_data["start"],
+                    end=form.cleaned_data["end"],
+                    description=form.cleaned_data["description"],
+                )
+                return HttpResponseRedirect(
+                    reverse("acctmgr:account-view", args=[account.pk])
+                )
+            except ValueError as e:
+                form.add_error(None, str(e))
+    else:
+        form = MoveEntriesForm()
+    return render(
+        request,
+        "acctmgr/account_merge.html",
+        {
+            "account": account,
+            "account_merge_form": AccountMergeForm(),
+            "move_entries_form": form,
+        },
+    )
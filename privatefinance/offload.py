@@ -0,0 +1,144 @@
+import asyncio
+import contextvars
+import threading
+from collections.abc import AsyncIterator, Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+_pool = None
+_pool_threads = 0
+_pool_lock = threading.Lock()
+
+# Marks the end of a stream in its queue
+_DONE = object()
+
+
+def pool() -> ThreadPoolExecutor:
+    """The threads async views run their ORM work in, ORM_THREADS of them
+
+    Bounded, so slow reports can only hold that many database connections,
+    and interactive requests keep the rest.
+    """
+    global _pool, _pool_threads
+    with _pool_lock:
+        if _pool is None:
+            _pool_threads = settings.ORM_THREADS
+            _pool = ThreadPoolExecutor(
+                max_workers=_pool_threads, thread_name_prefix="orm"
+            )
+    return _pool
+
+
+def close_thread_connections(executor: ThreadPoolExecutor, threads: int):
+    """Close the database connections held by each of the executor's
+    `threads` threads"""
+    # Every thread has to take one of these, so each closes its own
+    barrier = threading.Barrier(threads)
+
+    def close():
+        barrier.wait()
+        connections.close_all()
+
+    for future in [executor.submit(close) for _ in range(threads)]:
+        future.result()
+
+
+def close_connections():
+    """Close the database connections held by the pool's threads, e.g.
+    before the test database is dropped"""
+    if _pool is not None:
+        close_thread_connections(_pool, _pool_threads)
+
+
+def shutdown():
+    """Close the pool's connections and stop its threads. The next offload
+    starts a new pool, sized by the ORM_THREADS setting then."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            close_thread_connections(_pool, _pool_threads)
+            _pool.shutdown()
+            _pool = None
+
+
+def _job(func: Callable, *args, **kwargs):
+    # No request_started/finished runs in the pool's threads, so expire their
+    # connections here as Django does around each request
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def offload(func: Callable, *args, **kwargs):
+    """Run the blocking (ORM or template) call func(*args, **kwargs) in the
+    pool, with the caller's context variables
+
+    If the client disconnects, Django cancels the view and this with it. A
+    call already running finishes in its thread, but its result is dropped.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        pool(), lambda: context.run(_job, func, *args, **kwargs)
+    )
+
+
+async def stream(
+    func: Callable[..., Iterable],
+    *args,
+    buffer: int = 8,
+    context: contextvars.Context | None = None,
+    **kwargs,
+) -> AsyncIterator:
+    """Yield the items of the blocking iterable func(*args, **kwargs) as the
+    pool produces them, run in `context`
+
+    One pool thread owns the iteration, so a server-side cursor stays on one
+    connection, and runs at most `buffer` items ahead of the client. When the
+    client disconnects the producer stops at the next item and closes the
+    iterable, releasing its cursor.
+
+    Nothing runs until the response is iterated, after the view returned, so
+    a view passes its context, contextvars.copy_context(), for the iteration
+    to see what it set (e.g. @replica_reads). Without one the context at the
+    first item is used.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=buffer)
+    cancelled = threading.Event()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce():
+        items = ()
+        try:
+            items = iter(func(*args, **kwargs))
+            for item in items:
+                put(item)
+                if cancelled.is_set():
+                    return
+            put(_DONE)
+        except Exception as e:
+            if not cancelled.is_set():
+                put(e)
+        finally:
+            if hasattr(items, "close"):
+                items.close()
+
+    if context is None:
+        context = contextvars.copy_context()
+    loop.run_in_executor(pool(), lambda: context.run(_job, produce))
+    try:
+        while (item := await queue.get()) is not _DONE:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+        # Unblock a producer waiting for room, it then sees it was cancelled
+        while not queue.empty():
+            queue.get_nowait()
@@ -0,0 +1,146 @@
+import contextlib
+import contextvars
+import functools
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest
+
+REPLICA = "replica"
+PIN_COOKIE = "pf_primary"
+
+# Set while a view that opted in with @replica_reads is running
+_replica_reads = contextvars.ContextVar("replica_reads", default=False)
+# Set when the current request writes, or the client wrote recently
+_pinned = contextvars.ContextVar("pinned_to_primary", default=False)
+# Set when the current request writes
+_wrote = contextvars.ContextVar("wrote", default=False)
+
+
+def replica_configured() -> bool:
+    return REPLICA in settings.DATABASES
+
+
+def replica_reads(view):
+    """Let a read-only (report, register, analytics) view read from the replica
+
+    Reads still go to the primary when the client wrote recently, so a user
+    always sees their own writes. Async views pass the flag on to the
+    threads they offload their queries to.
+    """
+
+    if iscoroutinefunction(view):
+
+        @functools.wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """Read from the primary inside a @replica_reads view
+
+    For filling caches shared across requests, so a stale replica read can't
+    outlive the write which invalidated the cache.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Send reads of @replica_reads views to the replica, everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and not _pinned.get() and replica_configured():
+            return REPLICA
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        # Any later reads in this request have to see this write
+        _pinned.set(True)
+        _wrote.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaPinningMiddleware:
+    """Read-your-writes stickiness for the replica
+
+    A request which writes (or uses an unsafe method) pins the client to the
+    primary for REPLICA_PIN_SECONDS, long enough for the replica to catch up.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = self._start(request)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            self._reset(tokens)
+        return self._finish(response, wrote)
+
+    async def __acall__(self, request: HttpRequest):
+        tokens = self._start(request)
+        try:
+            response = await self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            self._reset(tokens)
+        return self._finish(response, wrote)
+
+    def _start(self, request: HttpRequest):
+        unsafe = request.method not in ("GET", "HEAD", "OPTIONS")
+        return (
+            _pinned.set(unsafe or PIN_COOKIE in request.COOKIES),
+            _wrote.set(unsafe),
+        )
+
+    def _reset(self, tokens):
+        pinned_token, wrote_token = tokens
+        _pinned.reset(pinned_token)
+        _wrote.reset(wrote_token)
+
+    def _finish(self, response, wrote: bool):
+        if wrote and replica_configured():
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=getattr(settings, "REPLICA_PIN_SECONDS", 60),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import socket
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -27,6 +29,12 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# Addresses allowed to read the request histogram at /telemetry/histogram
+INTERNAL_IPS = ["127.0.0.1", "::1"]
+
+# Room for a full batch of transactions posted to /ledger/api/transactions
+DATA_UPLOAD_MAX_MEMORY_SIZE = 16 * 1024 * 1024
+
 
 # Application definition
 
@@ -40,10 +48,16 @@ INSTALLED_APPS = [
     "ledger",
     "acctmgr",
     "currencymgr",
+    "budgetmgr",
+    "schedulemgr",
+    "telemetry",
 ]
 
 MIDDLEWARE = [
+    "telemetry.middleware.RequestMetricsMiddleware",
+    "telemetry.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "privatefinance.routers.ReplicaPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -56,7 +70,7 @@ ROOT_URLCONF = "privatefinance.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "telemetry.backends.TimedDjangoTemplates",
         "DIRS": ["templates/"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -76,14 +90,99 @@ WSGI_APPLICATION = "privatefinance.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+#
+# SQLite by default. Set DATABASE_ENGINE=postgresql and the DATABASE_*
+# variables below to use PostgreSQL, which needs psycopg[binary,pool].
+
+DATABASE_ENGINE = os.environ.get("DATABASE_ENGINE", "sqlite")
+
+SQLITE_DATABASE = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": os.environ.get("DATABASE_NAME", BASE_DIR / "db.sqlite3"),
+    "OPTIONS": {
+        # Take the write lock when a transaction begins. A deferred
+        # transaction that upgrades to a writer halfway through fails with
+        # "database is locked" immediately instead of waiting on the timeout.
+        "transaction_mode": "IMMEDIATE",
+        # Seconds to wait for another writer before giving up
+        "timeout": 20,
+        # WAL lets readers continue while a write is in progress, and
+        # synchronous=NORMAL is durable in WAL mode except on power loss
+        "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL",
+    },
+}
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+POSTGRESQL_DATABASE = {
+    "ENGINE": "django.db.backends.postgresql",
+    "NAME": os.environ.get("DATABASE_NAME", "privatefinance"),
+    "USER": os.environ.get("DATABASE_USER", ""),
+    "PASSWORD": os.environ.get("DATABASE_PASSWORD", ""),
+    "HOST": os.environ.get("DATABASE_HOST", ""),
+    "PORT": os.environ.get("DATABASE_PORT", ""),
+    "CONN_HEALTH_CHECKS": True,
+    "OPTIONS": {},
+}
+if pool_size := int(os.environ.get("DATABASE_POOL_SIZE", "0")):
+    # A psycopg connection pool per process. Connections go back to the pool
+    # at the end of each request, so they can't also be persistent.
+    POSTGRESQL_DATABASE["OPTIONS"]["pool"] = {
+        "min_size": min(2, pool_size),
+        "max_size": pool_size,
+        "timeout": 10,
     }
+else:
+    # Seconds to keep a connection open between requests
+    POSTGRESQL_DATABASE["CONN_MAX_AGE"] = int(
+        os.environ.get("DATABASE_CONN_MAX_AGE", "60")
+    )
+
+DATABASES = {
+    "default": (
+        POSTGRESQL_DATABASE if DATABASE_ENGINE == "postgresql" else SQLITE_DATABASE
+    )
 }
 
+# An optional read replica for reports, registers and analytics. Either a
+# PostgreSQL standby (DATABASE_REPLICA_HOST) or, for SQLite, a copy of the
+# database file kept fresh with `manage.py refresh_replica`.
+if replica_name := os.environ.get("DATABASE_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": replica_name,
+        "HOST": os.environ.get(
+            "DATABASE_REPLICA_HOST", DATABASES["default"].get("HOST", "")
+        ),
+        "TEST": {"MIRROR": "default"},
+    }
+    if DATABASE_ENGINE == "sqlite":
+        # The copy is read only, so leave its journal mode alone
+        DATABASES["replica"]["OPTIONS"] = {"timeout": 20}
+
+DATABASE_ROUTERS = ["privatefinance.routers.PrimaryReplicaRouter"]
+
+# Seconds a client reads from the primary after writing, so it sees its own
+# writes while the replica catches up
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", "60"))
+
+# Ledger write paths retry this many times when the database is busy
+LEDGER_WRITE_ATTEMPTS = 5
+
+# Threads the async report and export views run their queries in, per
+# process. Each holds its own database connection.
+ORM_THREADS = int(os.environ.get("ORM_THREADS", "4"))
+
+# Days the ledger's change log keeps changes that a later change of the same
+# row supersedes. Each row's latest change is kept for good.
+CHANGE_LOG_RETENTION_DAYS = int(os.environ.get("CHANGE_LOG_RETENTION_DAYS", "30"))
+
+# This instance's name to the instances it syncs its ledger with, which must
+# each have a different one
+INSTANCE_NAME = os.environ.get("INSTANCE_NAME", socket.gethostname())
+
+# The secret instances share to sync with each other. The sync API refuses
+# every request while it is unset.
+SYNC_TOKEN = os.environ.get("SYNC_TOKEN", "")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -104,6 +203,32 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# One JSON line per request with its query, template and context processor
+# timings. Set TELEMETRY_LOG_LEVEL=WARNING to turn them off.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "telemetry": {
+            "handlers": ["console"],
+            "level": os.environ.get("TELEMETRY_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# Profiling, off unless one of these is set. PROFILE_SAMPLE_RATE of requests
+# are profiled with cProfile; requests slower than PROFILE_SLOW_MS have their
+# sampled stacks saved. Summarize with `manage.py profile_summary`.
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = 5
+PROFILE_DIR = os.environ.get("PROFILE_DIR", BASE_DIR / "profiles")
+# Profiles kept per view, oldest are deleted first. 0 turns profiling off.
+PROFILE_KEEP = 50
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -22,5 +22,8 @@ urlpatterns = [
     path("", include("acctmgr.urls")),
     path("currencies/", include("currencymgr.urls")),
     path("ledger/", include("ledger.urls")),
+    path("budgets/", include("budgetmgr.urls")),
+    path("schedules/", include("schedulemgr.urls")),
+    path("telemetry/", include("telemetry.urls")),
     path("admin/", admin.site.urls),
 ]
@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import RecurringSplit, RecurringTransaction
+
+
+class RecurringSplitInline(admin.TabularInline):
+    model = RecurringSplit
+    extra = 2
+
+
+@admin.register(RecurringTransaction)
+class RecurringTransactionAdmin(admin.ModelAdmin):
+    list_display = ["description", "frequency", "interval", "start_date", "end_date"]
+    readonly_fields = ["last_posted"]
+    inlines = [RecurringSplitInline]
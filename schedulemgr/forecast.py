@@ -0,0 +1,85 @@
+from datetime import date
+from decimal import Decimal
+from itertools import accumulate
+from typing import NamedTuple
+
+from .schedule import occurrences
+
+
+class SplitSpec(NamedTuple):
+    split_id: int
+    account_id: int
+    amount: Decimal
+
+
+class ScheduleSpec(NamedTuple):
+    start_date: date
+    frequency: str
+    interval: int
+    end_date: date | None
+    # Occurrences up to and including this date are already in the balances
+    last_posted: date | None
+    splits: tuple[SplitSpec, ...]
+
+
+def _month_index(day: date) -> int:
+    return day.year * 12 + day.month - 1
+
+
+def month_ends(start: date, months: int) -> list[date]:
+    """The month index of a projection, starting with the month of `start`"""
+    first = _month_index(start)
+    ends = []
+    for index in range(first, first + months):
+        year, month = divmod(index + 1, 12)
+        # The day before the first of the next month
+        ends.append(date.fromordinal(date(year, month + 1, 1).toordinal() - 1))
+    return ends
+
+
+def project(
+    balances: dict[int, Decimal],
+    schedules: list[ScheduleSpec],
+    start: date,
+    months: int,
+    account_ids: set[int],
+    overrides: dict[int, Decimal] | None = None,
+) -> dict[int, list[Decimal]]:
+    """Project account balances to the end of each month
+
+    A pure function of the current balances and the schedules: each account
+    gets a per month array of scheduled deltas which is then cumulatively
+    summed onto its current balance. Nothing is read from or written to the
+    ledger, so what-if `overrides` (split id -> amount) are cheap to apply.
+
+    Occurrences that are due but not posted yet land in the first month.
+    """
+    overrides = overrides or {}
+    first = _month_index(start)
+    horizon = month_ends(start, months)[-1]
+    deltas = {account_id: [Decimal(0)] * months for account_id in account_ids}
+    for schedule in schedules:
+        splits = [split for split in schedule.splits if split.account_id in deltas]
+        if not splits:
+            continue
+        until = horizon
+        if schedule.end_date is not None:
+            until = min(until, schedule.end_date)
+        for occurrence in occurrences(
+            schedule.start_date,
+            schedule.frequency,
+            schedule.interval,
+            after=schedule.last_posted,
+            until=until,
+        ):
+            position = max(0, _month_index(occurrence) - first)
+            for split in splits:
+                deltas[split.account_id][position] += overrides.get(
+                    split.split_id, split.amount
+                )
+    return {
+        account_id: list(
+            accumulate(account_deltas, initial=balances.get(account_id, Decimal(0)))
+        )[1:]
+        for account_id, account_deltas in deltas.items()
+    }
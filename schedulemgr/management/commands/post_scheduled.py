@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+import datetime
+
+from schedulemgr.models import RecurringTransaction
+
+
+class Command(BaseCommand):
+    help = "Post every recurring transaction occurrence that is due"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--until",
+            type=datetime.date.fromisoformat,
+            help="Post occurrences up to this date (YYYY-MM-DD), default today",
+        )
+
+    def handle(self, *args, until=None, **options):
+        details, skipped = RecurringTransaction.objects.post_due(until)
+        self.stdout.write(f"Posted {len(details)} scheduled transactions")
+        for template, error in skipped:
+            self.stderr.write(f"Skipped {template} ({template.pk}): {error}")
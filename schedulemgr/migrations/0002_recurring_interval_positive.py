@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:02
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def fix_zero_intervals(apps, schema_editor):
+    # Posting looped forever on an interval of 0
+    apps.get_model("schedulemgr", "RecurringTransaction").objects.filter(
+        interval=0
+    ).update(interval=1)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("schedulemgr", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recurringtransaction",
+            name="interval",
+            field=models.PositiveIntegerField(
+                default=1, validators=[django.core.validators.MinValueValidator(1)]
+            ),
+        ),
+        migrations.RunPython(fix_zero_intervals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="recurringtransaction",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("interval__gte", 1)),
+                name="recurring_interval_positive",
+            ),
+        ),
+    ]
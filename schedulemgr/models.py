@@ -0,0 +1,152 @@
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from datetime import date
+from typing import NamedTuple
+
+from acctmgr.models import Account
+from ledger.models import ClosedPeriod, TransactionDetail, TransactionEntry
+from ledger.retry import retry_on_contention
+from .forecast import ScheduleSpec, SplitSpec
+from .schedule import Frequency, occurrences
+
+
+class PostedSchedule(NamedTuple):
+    details: list[TransactionDetail]
+    # (template, reason) for each template that couldn't be posted
+    skipped: list[tuple["RecurringTransaction", str]]
+
+
+class RecurringTransactionManager(models.Manager):
+    @retry_on_contention
+    @transaction.atomic
+    def post_due(self, until: date | None = None) -> PostedSchedule:
+        """Materialize every occurrence due up to `until` (default today)
+
+        All templates are posted in one atomic, batched write and each
+        template's watermark is moved forward in the same transaction, so
+        running it again (or concurrently) never posts an occurrence twice.
+        A template that is unbalanced or due in a closed period is skipped,
+        keeping its watermark, and listed with the reason.
+        """
+        until = until or date.today()
+        templates = list(
+            self.select_for_update()
+            .filter(start_date__lte=until)
+            .prefetch_related("splits__account__currency")
+        )
+        closed_through = ClosedPeriod.objects.closed_through()
+        batch = []
+        posted_templates = []
+        skipped = []
+        for template in templates:
+            due = template.due_occurrences(until)
+            if not due:
+                continue
+            splits = list(template.splits.all())
+            if error := template.posting_error(splits, due[0], closed_through):
+                skipped.append((template, error))
+                continue
+            for xact_date in due:
+                batch.append(
+                    (
+                        TransactionDetail(
+                            description=template.description, xact_date=xact_date
+                        ),
+                        [split.build_entry() for split in splits],
+                    )
+                )
+            template.last_posted = due[-1]
+            posted_templates.append(template)
+        details = TransactionEntry.objects.bulk_create_transactions(batch)
+        self.bulk_update(posted_templates, ["last_posted"])
+        return PostedSchedule(details, skipped)
+
+    def schedule_specs(self) -> list[ScheduleSpec]:
+        """Plain copies of every template for the forecast (two queries)"""
+        return [
+            ScheduleSpec(
+                start_date=template.start_date,
+                frequency=template.frequency,
+                interval=template.interval,
+                end_date=template.end_date,
+                last_posted=template.last_posted,
+                splits=tuple(
+                    SplitSpec(split.pk, split.account_id, split.amount)
+                    for split in template.splits.all()
+                ),
+            )
+            for template in self.prefetch_related("splits")
+        ]
+
+
+class RecurringTransaction(models.Model):
+    """A transaction template which repeats on a schedule"""
+
+    description = models.CharField(max_length=100)
+    frequency = models.CharField(max_length=10, choices=Frequency)
+    # Repeat every `interval` frequency units, e.g. every 2 weeks
+    interval = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    start_date = models.DateField()
+    end_date = models.DateField(blank=True, null=True)
+    # Date of the most recent occurrence posted to the ledger
+    last_posted = models.DateField(blank=True, null=True, editable=False)
+    objects = RecurringTransactionManager()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(interval__gte=1),
+                name="recurring_interval_positive",
+            )
+        ]
+
+    def __str__(self):
+        return self.description
+
+    def posting_error(
+        self,
+        splits: list["RecurringSplit"],
+        first_due: date,
+        closed_through: date | None,
+    ) -> str | None:
+        """Why the template's due occurrences can't be posted, if they can't"""
+        if not splits:
+            return "A transaction needs at least one entry."
+        entries = [split.build_entry() for split in splits]
+        for entry in entries:
+            entry.quantize()
+        if sum(entry.amount for entry in entries) != 0:
+            return "Transaction is not balanced."
+        if closed_through is not None and first_due <= closed_through:
+            return f"Transactions on or before {closed_through} are in a closed period."
+        return None
+
+    def due_occurrences(self, until: date) -> list[date]:
+        if self.end_date is not None:
+            until = min(until, self.end_date)
+        return list(
+            occurrences(
+                self.start_date,
+                self.frequency,
+                self.interval,
+                after=self.last_posted,
+                until=until,
+            )
+        )
+
+
+class RecurringSplit(models.Model):
+    """One entry of a recurring transaction template"""
+
+    recurring = models.ForeignKey(
+        RecurringTransaction, on_delete=models.CASCADE, related_name="splits"
+    )
+    account = models.ForeignKey(Account, on_delete=models.RESTRICT)
+    memo = models.CharField(max_length=256, blank=True)
+    price = models.DecimalField(decimal_places=10, max_digits=19, default=1)
+    amount = models.DecimalField(decimal_places=10, max_digits=19)
+
+    def build_entry(self) -> TransactionEntry:
+        return TransactionEntry(
+            account=self.account, memo=self.memo, price=self.price, amount=self.amount
+        )
@@ -0,0 +1,66 @@
+import calendar
+from datetime import date, timedelta
+from typing import Iterator
+
+from django.db import models
+
+
+class Frequency(models.TextChoices):
+    DAILY = "daily"
+    WEEKLY = "weekly"
+    MONTHLY = "monthly"
+    YEARLY = "yearly"
+
+
+def _add_months(start: date, months: int) -> date:
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    # Clamp so a schedule starting on the 31st lands on the last day of short months
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def occurrence(start: date, frequency: str, interval: int, n: int) -> date:
+    """The nth (zero based) occurrence of a schedule
+
+    Computed from the start date rather than the previous occurrence so month
+    end clamping doesn't drift (Jan 31, Feb 28, Mar 31, ...).
+    """
+    steps = n * interval
+    if frequency == Frequency.DAILY:
+        return start + timedelta(days=steps)
+    if frequency == Frequency.WEEKLY:
+        return start + timedelta(weeks=steps)
+    if frequency == Frequency.MONTHLY:
+        return _add_months(start, steps)
+    if frequency == Frequency.YEARLY:
+        return _add_months(start, 12 * steps)
+    raise ValueError(f"Unknown frequency {frequency}")
+
+
+def occurrences(
+    start: date,
+    frequency: str,
+    interval: int,
+    after: date | None = None,
+    until: date | None = None,
+) -> Iterator[date]:
+    """Occurrences strictly after `after` and up to and including `until`
+
+    Raises:
+    ValueError -- The interval is less than 1
+    """
+    if interval < 1:
+        raise ValueError("The interval must be at least 1.")
+    n = 0
+    if after is not None and frequency in (Frequency.DAILY, Frequency.WEEKLY):
+        # Jump straight to the first candidate instead of walking from the start
+        period = interval * (7 if frequency == Frequency.WEEKLY else 1)
+        n = max(0, (after - start).days // period)
+    while True:
+        current = occurrence(start, frequency, interval, n)
+        if until is not None and current > until:
+            return
+        if after is None or current > after:
+            yield current
+        n += 1
@@ -0,0 +1,248 @@
+import pytest
+import decimal
+import io
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import reverse
+
+from acctmgr.models import Account
+from ledger.models import (
+    ClosedPeriod,
+    MonthlyRollup,
+    TransactionDetail,
+    TransactionEntry,
+)
+from .forecast import ScheduleSpec, SplitSpec, month_ends, project
+from .models import RecurringSplit, RecurringTransaction
+from .schedule import Frequency, occurrences
+
+
+@pytest.fixture
+def salary_template(setup_example_accounts):
+    template = RecurringTransaction.objects.create(
+        description="Paycheck",
+        frequency=Frequency.MONTHLY,
+        start_date=date(2025, 1, 31),
+    )
+    RecurringSplit.objects.create(
+        recurring=template,
+        account=Account.objects.get(name="Salary"),
+        amount=decimal.Decimal("-2000.00"),
+    )
+    RecurringSplit.objects.create(
+        recurring=template,
+        account=Account.objects.get(name="Example Bank 1"),
+        amount=decimal.Decimal("2000.00"),
+        memo="Direct deposit",
+    )
+    return template
+
+
+def test_monthly_occurrences_clamp_to_month_end():
+    assert list(
+        occurrences(date(2025, 1, 31), Frequency.MONTHLY, 1, until=date(2025, 4, 30))
+    ) == [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)]
+
+
+def test_occurrences_after_watermark():
+    assert list(
+        occurrences(
+            date(2025, 1, 1),
+            Frequency.WEEKLY,
+            2,
+            after=date(2025, 1, 29),
+            until=date(2025, 2, 28),
+        )
+    ) == [date(2025, 2, 12), date(2025, 2, 26)]
+    assert list(
+        occurrences(date(2024, 2, 29), Frequency.YEARLY, 1, until=date(2026, 3, 1))
+    ) == [date(2024, 2, 29), date(2025, 2, 28), date(2026, 2, 28)]
+
+
+@pytest.mark.django_db
+def test_post_due_is_idempotent(salary_template):
+    details, skipped = RecurringTransaction.objects.post_due(date(2025, 3, 31))
+    assert skipped == []
+    assert [detail.xact_date for detail in details] == [
+        date(2025, 1, 31),
+        date(2025, 2, 28),
+        date(2025, 3, 31),
+    ]
+    assert RecurringTransaction.objects.post_due(date(2025, 3, 31)) == ([], [])
+    assert TransactionDetail.objects.count() == 3
+    assert TransactionEntry.objects.filter(memo="Direct deposit").count() == 3
+    salary_template.refresh_from_db()
+    assert salary_template.last_posted == date(2025, 3, 31)
+    assert MonthlyRollup.objects.filter(account__name="Salary").count() == 3
+
+
+@pytest.mark.django_db
+def test_post_due_respects_end_date(salary_template):
+    salary_template.end_date = date(2025, 2, 15)
+    salary_template.save()
+    assert len(RecurringTransaction.objects.post_due(date(2025, 12, 31)).details) == 1
+
+
+@pytest.mark.django_db
+def test_post_due_catch_up_is_batched(salary_template):
+    coffee = RecurringTransaction.objects.create(
+        description="Daily coffee",
+        frequency=Frequency.DAILY,
+        start_date=date(2024, 1, 1),
+    )
+    RecurringSplit.objects.create(
+        recurring=coffee,
+        account=Account.objects.get(name="Dining"),
+        amount=decimal.Decimal("3.50"),
+    )
+    RecurringSplit.objects.create(
+        recurring=coffee,
+        account=Account.objects.get(name="Example Bank 1"),
+        amount=decimal.Decimal("-3.50"),
+    )
+    with CaptureQueriesContext(connection) as queries:
+        details, _ = RecurringTransaction.objects.post_due(date(2024, 12, 31))
+    assert len(details) == 366
+    # Including one to skip templates due in a closed period
+    assert len(queries) <= 30
+    assert TransactionEntry.objects.count() == 732
+
+
+@pytest.fixture
+def rent_template(setup_example_accounts):
+    template = RecurringTransaction.objects.create(
+        description="Rent",
+        frequency=Frequency.MONTHLY,
+        start_date=date(2025, 1, 1),
+    )
+    RecurringSplit.objects.create(
+        recurring=template,
+        account=Account.objects.get(name="Dining"),
+        amount=decimal.Decimal("1000.00"),
+    )
+    RecurringSplit.objects.create(
+        recurring=template,
+        account=Account.objects.get(name="Example Bank 1"),
+        amount=decimal.Decimal("-1000.00"),
+    )
+    return template
+
+
+@pytest.mark.django_db
+def test_unbalanced_template_is_skipped(salary_template, rent_template):
+    split = salary_template.splits.first()
+    split.amount = decimal.Decimal("-1.00")
+    split.save()
+    details, skipped = RecurringTransaction.objects.post_due(date(2025, 3, 31))
+    assert skipped == [(salary_template, "Transaction is not balanced.")]
+    assert [detail.description for detail in details] == ["Rent"] * 3
+    salary_template.refresh_from_db()
+    assert salary_template.last_posted is None
+    rent_template.refresh_from_db()
+    assert rent_template.last_posted == date(2025, 3, 1)
+
+
+@pytest.mark.django_db
+def test_template_due_in_closed_period_is_skipped(salary_template, rent_template):
+    rent_template.last_posted = date(2025, 3, 1)
+    rent_template.save()
+    ClosedPeriod.objects.create(end_date=date(2025, 2, 28))
+    out, err = io.StringIO(), io.StringIO()
+    call_command("post_scheduled", "--until", "2025-04-30", stdout=out, stderr=err)
+    assert "Posted 1 scheduled transactions" in out.getvalue()
+    assert (
+        f"Skipped Paycheck ({salary_template.pk}): Transactions on or before "
+        "2025-02-28 are in a closed period." in err.getvalue()
+    )
+    salary_template.refresh_from_db()
+    assert salary_template.last_posted is None
+    assert TransactionDetail.objects.get().xact_date == date(2025, 4, 1)
+
+
+@pytest.mark.django_db
+def test_interval_must_be_positive(salary_template):
+    salary_template.interval = 0
+    with pytest.raises(ValidationError):
+        salary_template.full_clean()
+    with pytest.raises(ValueError):
+        list(occurrences(date(2025, 1, 1), Frequency.DAILY, 0))
+    with pytest.raises(IntegrityError), transaction.atomic():
+        salary_template.save()
+
+
+@pytest.mark.django_db
+def test_post_scheduled_command(salary_template):
+    out = io.StringIO()
+    call_command("post_scheduled", "--until", "2025-02-28", stdout=out)
+    assert "Posted 2 scheduled transactions" in out.getvalue()
+
+
+def test_project_is_pure_and_cumulative():
+    schedules = [
+        ScheduleSpec(
+            start_date=date(2025, 1, 31),
+            frequency=Frequency.MONTHLY,
+            interval=1,
+            end_date=None,
+            last_posted=date(2025, 1, 31),
+            splits=(
+                SplitSpec(1, 10, decimal.Decimal("100")),
+                SplitSpec(2, 20, decimal.Decimal("-100")),
+            ),
+        )
+    ]
+    projection = project(
+        {10: decimal.Decimal("50")}, schedules, date(2025, 2, 10), 3, {10}
+    )
+    assert projection == {10: [decimal.Decimal(v) for v in ("150", "250", "350")]}
+    what_if = project(
+        {10: decimal.Decimal("50")},
+        schedules,
+        date(2025, 2, 10),
+        3,
+        {10},
+        overrides={1: decimal.Decimal("200")},
+    )
+    assert what_if[10][-1] == decimal.Decimal("650")
+
+
+def test_project_puts_overdue_occurrences_in_first_month():
+    schedules = [
+        ScheduleSpec(
+            date(2025, 1, 1),
+            Frequency.WEEKLY,
+            1,
+            date(2025, 1, 22),
+            None,
+            (SplitSpec(1, 10, decimal.Decimal("1")),),
+        )
+    ]
+    assert project({}, schedules, date(2025, 3, 1), 2, {10}) == {
+        10: [decimal.Decimal(4), decimal.Decimal(4)]
+    }
+
+
+def test_month_ends():
+    assert month_ends(date(2024, 11, 15), 4) == [
+        date(2024, 11, 30),
+        date(2024, 12, 31),
+        date(2025, 1, 31),
+        date(2025, 2, 28),
+    ]
+
+
+# The view queries from the ORM thread pool, which must see committed rows
+@pytest.mark.django_db(transaction=True)
+def test_forecast_view_does_not_write(salary_template):
+    client = Client()
+    split = salary_template.splits.get(account__name="Example Bank 1")
+    res = client.get(
+        reverse("schedulemgr:forecast"), {"years": 2, f"split_{split.pk}": "10"}
+    )
+    assert res.status_code == 200
+    assert len(res.context["rows"]) == 24
+    assert TransactionDetail.objects.count() == 0
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import views
+
+app_name = "schedulemgr"
+urlpatterns = [
+    path("forecast", views.forecast, name="forecast"),
+]
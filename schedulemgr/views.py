@@ -0,0 +1,68 @@
+from django.shortcuts import render
+from django.http import HttpRequest
+from datetime import date
+import decimal
+
+from acctmgr.models import Account, AccountTypes
+from ledger.models import MonthlyRollup
+from .forecast import month_ends, project
+from .models import RecurringSplit, RecurringTransaction
+from privatefinance.offload import offload
+from privatefinance.routers import replica_reads
+
+
+def _overrides(request: HttpRequest) -> dict[int, decimal.Decimal]:
+    """What-if amounts passed as ?split_<split id>=<amount>"""
+    overrides = {}
+    for key, value in request.GET.items():
+        if not key.startswith("split_"):
+            continue
+        try:
+            overrides[int(key.removeprefix("split_"))] = decimal.Decimal(value)
+        except (ValueError, decimal.InvalidOperation):
+            continue
+    return overrides
+
+
+def _render_forecast(request: HttpRequest):
+    try:
+        years = min(max(int(request.GET.get("years", 1)), 1), 5)
+    except ValueError:
+        years = 1
+    today = date.today()
+    accounts = list(
+        Account.objects.filter(
+            acct_type__in=[AccountTypes.ASSET, AccountTypes.LIABILITY],
+            placeholder=False,
+        )
+        .select_related("currency")
+        .order_by("acct_type", "name")
+    )
+    overrides = _overrides(request)
+    projection = project(
+        MonthlyRollup.objects.balances(),
+        RecurringTransaction.objects.schedule_specs(),
+        today,
+        years * 12,
+        {account.pk for account in accounts},
+        overrides,
+    )
+    rows = [
+        (month_end, [projection[account.pk][index] for account in accounts])
+        for index, month_end in enumerate(month_ends(today, years * 12))
+    ]
+    context = {
+        "years": years,
+        "forecast_accounts": accounts,
+        "rows": rows,
+        "splits": [
+            (split, overrides.get(split.pk, split.amount))
+            for split in RecurringSplit.objects.select_related("recurring", "account")
+        ],
+    }
+    return render(request, "schedulemgr/forecast.html", context)
+
+
+@replica_reads
+async def forecast(request: HttpRequest):
+    return await offload(_render_forecast, request)
@@ -0,0 +1,56 @@
+import functools
+import time
+from django.template.backends.django import DjangoTemplates
+
+from .metrics import current
+
+
+def _timed_processor(processor):
+    name = processor.__name__
+
+    @functools.wraps(processor)
+    def wrapper(request):
+        metrics = current.get()
+        if metrics is None:
+            return processor(request)
+        start = time.perf_counter()
+        try:
+            return processor(request)
+        finally:
+            metrics.context_times[name] += time.perf_counter() - start
+
+    return wrapper
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+        self.origin = template.origin
+
+    def render(self, context=None, request=None):
+        metrics = current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders and context processors"""
+
+    def __init__(self, params):
+        super().__init__(params)
+        # Overrides the cached property holding the loaded processors
+        self.engine.template_context_processors = tuple(
+            _timed_processor(processor)
+            for processor in self.engine.template_context_processors
+        )
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
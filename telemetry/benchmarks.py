@@ -0,0 +1,159 @@
+import math
+import statistics
+import time
+import uuid
+from collections.abc import Callable
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from acctmgr.models import Account
+from acctmgr.sidebar import render as sidebar_html
+from ledger.models import (
+    LedgerVersion,
+    MonthlyRollup,
+    TransactionDetail,
+    TransactionEntry,
+)
+from .metrics import RequestMetrics
+
+
+def _time(name: str, run: Callable[[int], None], runs: int) -> dict:
+    """Time `run(i)` for i in range(runs), counting the queries of each run"""
+    timings, queries = [], []
+    for i in range(runs):
+        metrics = RequestMetrics()
+        with connection.execute_wrapper(metrics.record_query):
+            start = time.perf_counter()
+            run(i)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(metrics.queries)
+    timings.sort()
+    return {
+        "case": name,
+        "runs": runs,
+        "min_ms": round(timings[0], 2),
+        "median_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[math.ceil(0.95 * runs) - 1], 2),
+        "max_queries": max(queries),
+    }
+
+
+def _transaction_data(debit: Account, credit: Account, description: str) -> dict:
+    return {
+        "date": date.today().isoformat(),
+        "description": description,
+        "amount_1": "12.34",
+        "account_1": debit.pk,
+        "amount_2": "-12.34",
+        "account_2": credit.pk,
+        "selected_account": debit.pk,
+    }
+
+
+def run_benchmarks(runs: int = 5, throwaway: bool = False) -> list[dict]:
+    """Time the core ledger paths against whatever ledger is in the database
+
+    Posts, edits and then deletes `runs` transactions of its own, so the
+    ledger is left as it was found, except for its change log and versions.
+    Pass throwaway to confirm the database is a copy made for benchmarking.
+
+    Raises:
+    ValueError -- The database wasn't confirmed throwaway, is too small to
+    benchmark, or a write being timed failed
+    """
+    if not throwaway:
+        raise ValueError(
+            "The benchmark writes to the database. Run it against a throwaway "
+            "one, e.g. made by generate_ledger, and confirm with --throwaway."
+        )
+    busiest = (
+        TransactionEntry.objects.values("account_id")
+        .annotate(entries=Count("pk"))
+        .order_by("-entries")
+        .first()
+    )
+    if busiest is None:
+        raise ValueError("The ledger is empty, generate one first.")
+    account = Account.objects.get(pk=busiest["account_id"])
+    other = (
+        Account.objects.filter(placeholder=False, currency=account.currency)
+        .exclude(pk=account.pk)
+        .first()
+    )
+    if other is None:
+        raise ValueError("Two accounts in the same currency are required.")
+    # The test client's default host is only allowed under the test runner,
+    # otherwise use a configured host, or localhost which DEBUG allows
+    host = next(
+        (h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")),
+        "localhost",
+    )
+    client = Client(HTTP_HOST=host)
+    token = uuid.uuid4().hex[:8]
+
+    def account_page(i):
+        client.get(reverse("acctmgr:account-view", args=[account.pk]))
+
+    def sidebar(i):
+        # A new account tree version every run, so the fragment is rendered
+        LedgerVersion.objects.bump(LedgerVersion.ACCOUNTS)
+        sidebar_html()
+
+    def cached_sidebar(i):
+        sidebar_html()
+
+    def post(i):
+        client.post(
+            reverse("ledger:xact-create"),
+            _transaction_data(account, other, f"benchmark {token} {i}"),
+        )
+
+    def edit(i):
+        data = _transaction_data(other, account, f"benchmark {token} {i}")
+        data["selected_transaction"] = posted[i].pk
+        client.post(reverse("ledger:xact-create"), data)
+
+    def delete(i):
+        client.post(reverse("ledger:xact-delete"), {"transaction": posted[i].pk})
+
+    def balances(i):
+        TransactionEntry.objects.account_balances()
+
+    def rollup_balances(i):
+        cache.clear()
+        MonthlyRollup.objects.balances()
+
+    results = [
+        _time("account_page", account_page, runs),
+        _time("sidebar", sidebar, runs),
+        _time("cached_sidebar", cached_sidebar, runs),
+        _time("post", post, runs),
+    ]
+    posted = list(
+        TransactionDetail.objects.filter(
+            description__startswith=f"benchmark {token} "
+        ).order_by("pk")
+    )
+    if len(posted) != runs:
+        raise ValueError("Posting a benchmark transaction failed.")
+    results.append(_time("edit", edit, runs))
+    # Each edit swaps the accounts
+    if (
+        TransactionEntry.objects.filter(
+            transaction_id__in=posted, account=other, amount__gt=0
+        ).count()
+        != runs
+    ):
+        raise ValueError("Editing a benchmark transaction failed.")
+    results.append(_time("delete", delete, runs))
+    if TransactionDetail.objects.filter(pk__in=[xact.pk for xact in posted]).exists():
+        raise ValueError("Deleting a benchmark transaction failed.")
+    return results + [
+        _time("balances", balances, runs),
+        _time("rollup_balances", rollup_balances, runs),
+    ]
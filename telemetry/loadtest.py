@@ -0,0 +1,204 @@
+import asyncio
+import io
+import math
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from ledger.models import TransactionEntry
+from privatefinance import offload
+
+
+def _percentile(timings: list[float], fraction: float) -> float:
+    return round(timings[math.ceil(fraction * len(timings)) - 1], 1)
+
+
+def _summary(server: str, traffic: str, timings: list[float]) -> dict:
+    timings.sort()
+    return {
+        "server": server,
+        "traffic": traffic,
+        "requests": len(timings),
+        "p50_ms": _percentile(timings, 0.5),
+        "p95_ms": _percentile(timings, 0.95),
+        "p99_ms": _percentile(timings, 0.99),
+        "max_ms": round(timings[-1], 1),
+    }
+
+
+def _split(url: str) -> tuple[str, str]:
+    path, _, query = url.partition("?")
+    return path, query
+
+
+def _wsgi(
+    host: str, traffic: dict[str, list[str]], clients: dict[str, int], workers, until
+) -> dict[str, list[float]]:
+    """Closed-loop clients against a WSGI server with `workers` threads"""
+    app = WSGIHandler()
+    timings = {kind: [] for kind in traffic}
+
+    def handle(url: str):
+        path, query = _split(url)
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": host,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": host,
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http",
+        }
+        body = app(environ, lambda status, headers: None)
+        try:
+            for _ in body:
+                pass
+        finally:
+            body.close()
+
+    def client(kind: str, server: ThreadPoolExecutor):
+        urls = traffic[kind]
+        i = 0
+        while time.perf_counter() < until:
+            start = time.perf_counter()
+            server.submit(handle, urls[i % len(urls)]).result()
+            timings[kind].append((time.perf_counter() - start) * 1000)
+            i += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as server:
+        threads = [
+            threading.Thread(target=client, args=(kind, server))
+            for kind, count in clients.items()
+            for _ in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        offload.close_thread_connections(server, workers)
+    return timings
+
+
+async def _asgi(
+    host: str, traffic: dict[str, list[str]], clients: dict[str, int], until
+) -> dict[str, list[float]]:
+    """Closed-loop clients against an ASGI server with one event loop"""
+    app = ASGIHandler()
+    timings = {kind: [] for kind in traffic}
+
+    async def handle(url: str):
+        path, query = _split(url)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "query_string": query.encode(),
+            "headers": [(b"host", host.encode())],
+            "server": (host, 80),
+            "client": ("127.0.0.1", 0),
+        }
+        requested = False
+        done = asyncio.Event()
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # The client stays connected until the response is done
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                done.set()
+
+        await app(scope, receive, send)
+
+    async def client(kind: str):
+        urls = traffic[kind]
+        i = 0
+        while time.perf_counter() < until:
+            start = time.perf_counter()
+            await handle(urls[i % len(urls)])
+            timings[kind].append((time.perf_counter() - start) * 1000)
+            i += 1
+
+    await asyncio.gather(
+        *(client(kind) for kind, count in clients.items() for _ in range(count))
+    )
+    return timings
+
+
+def run_load_test(
+    seconds: float = 10,
+    workers: int = 4,
+    interactive_clients: int = 8,
+    report_clients: int = 4,
+) -> list[dict]:
+    """Compare request latency under WSGI and ASGI with mixed traffic
+
+    Interactive clients load the account index, description suggestions and a
+    transaction's splits while report clients pull five year forecasts and
+    the budget report export, each client sending its next request as soon as the last
+    one finished. The WSGI server has `workers` threads for every request;
+    under ASGI the report views offload their queries to ORM_THREADS threads,
+    set to `workers` too, so both hold as many connections for reports.
+
+    Both servers are driven in process through Django's handlers, so the
+    latencies leave out the network and HTTP parsing.
+
+    Returns one result per server and kind of traffic, with latency
+    percentiles in milliseconds
+    """
+    latest = TransactionEntry.objects.order_by("-transaction_id").first()
+    if latest is None:
+        raise ValueError("The ledger is empty, generate one first.")
+    traffic = {
+        "interactive": [
+            reverse("acctmgr:account-index"),
+            reverse("ledger:description-autocomplete") + "?q=a",
+            reverse("ledger:xact-splits") + f"?transaction={latest.transaction_id_id}",
+        ],
+        "report": [
+            reverse("schedulemgr:forecast") + "?years=5",
+            reverse("budgetmgr:budget-report-csv"),
+        ],
+    }
+    clients = {"interactive": interactive_clients, "report": report_clients}
+    host = next(
+        (h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")),
+        "localhost",
+    )
+
+    with warnings.catch_warnings():
+        # WSGI has to buffer the async exports, as it would in production
+        warnings.filterwarnings("ignore", "StreamingHttpResponse must consume")
+        wsgi = _wsgi(host, traffic, clients, workers, time.perf_counter() + seconds)
+    # A pool of the same size as the WSGI server, then back to the configured one
+    offload.shutdown()
+    try:
+        with override_settings(ORM_THREADS=workers):
+            asgi = asyncio.run(
+                _asgi(host, traffic, clients, time.perf_counter() + seconds)
+            )
+    finally:
+        offload.shutdown()
+    return [
+        _summary(server, kind, timings[kind])
+        for server, timings in (("wsgi", wsgi), ("asgi", asgi))
+        for kind in traffic
+    ]
@@ -0,0 +1,59 @@
+import json
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from acctmgr.models import Account
+from ledger.models import TransactionDetail, TransactionEntry
+from telemetry.benchmarks import run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the core ledger paths against the ledger in the database, e.g. "
+        "one made by generate_ledger. Posts, edits and deletes a few "
+        "transactions of its own, so only run it against a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument(
+            "--output",
+            help="Append the results as JSON lines to this file, to compare runs",
+        )
+        parser.add_argument(
+            "--throwaway",
+            action="store_true",
+            help="Confirm the database is a throwaway one the benchmark may write to",
+        )
+
+    def handle(self, *args, runs, output, throwaway, **options):
+        ledger = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "vendor": connection.vendor,
+            "accounts": Account.objects.count(),
+            "transactions": TransactionDetail.objects.count(),
+            "entries": TransactionEntry.objects.count(),
+        }
+        try:
+            results = run_benchmarks(runs, throwaway)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"{ledger['entries']} entries, {ledger['accounts']} accounts "
+            f"on {ledger['vendor']}"
+        )
+        self.stdout.write(
+            f"{'case':<16} {'min ms':>9} {'median ms':>10} {'p95 ms':>9} {'queries':>8}"
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['case']:<16} {result['min_ms']:>9} "
+                f"{result['median_ms']:>10} {result['p95_ms']:>9} "
+                f"{result['max_queries']:>8}"
+            )
+        if output:
+            with open(output, "a") as f:
+                for result in results:
+                    f.write(json.dumps({**ledger, **result}) + "\n")
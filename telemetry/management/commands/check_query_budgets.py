@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from telemetry.querybudgets import check_query_budgets
+
+
+class Command(BaseCommand):
+    help = (
+        "Run every view and ledger operation with a query budget against the "
+        "ledger in the database, e.g. one made by generate_ledger, and fail if "
+        "any runs more queries than its budget. Posts, edits and deletes "
+        "transactions of its own, so only run it against a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--throwaway",
+            action="store_true",
+            help="Confirm the database is a throwaway one the check may write to",
+        )
+
+    def handle(self, *args, throwaway, **options):
+        try:
+            results = check_query_budgets(throwaway)
+        except ValueError as e:
+            raise CommandError(str(e))
+        over = []
+        for result in results:
+            status = "ok" if result["queries"] <= result["budget"] else "OVER"
+            self.stdout.write(
+                f"{status:<4} {result['queries']:>5}/{result['budget']:<5} "
+                f"{result['name']}"
+            )
+            if status == "OVER":
+                over.append(result["name"])
+                for sql, count in result["duplicates"].items():
+                    self.stdout.write(f"       {count}x {sql}")
+        if over:
+            raise CommandError(f"Over the query budget: {', '.join(over)}")
@@ -0,0 +1,69 @@
+import json
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ledger.models import TransactionEntry
+from telemetry.loadtest import run_load_test
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare interactive and report latency under WSGI and ASGI with "
+        "mixed traffic, against the ledger in the database, e.g. one made by "
+        "generate_ledger. Only reads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--interactive-clients", type=int, default=8)
+        parser.add_argument("--report-clients", type=int, default=4)
+        parser.add_argument(
+            "--output",
+            help="Append the results as JSON lines to this file, to compare runs",
+        )
+
+    def handle(
+        self,
+        *args,
+        seconds,
+        workers,
+        interactive_clients,
+        report_clients,
+        output,
+        **options,
+    ):
+        run = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "vendor": connection.vendor,
+            "entries": TransactionEntry.objects.count(),
+            "workers": workers,
+            "interactive_clients": interactive_clients,
+            "report_clients": report_clients,
+        }
+        try:
+            results = run_load_test(
+                seconds, workers, interactive_clients, report_clients
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"{run['entries']} entries on {run['vendor']}, {workers} workers, "
+            f"{interactive_clients} interactive and {report_clients} report clients"
+        )
+        self.stdout.write(
+            f"{'server':<7} {'traffic':<12} {'requests':>8} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['server']:<7} {result['traffic']:<12} "
+                f"{result['requests']:>8} {result['p50_ms']:>8} "
+                f"{result['p95_ms']:>8} {result['p99_ms']:>8} {result['max_ms']:>8}"
+            )
+        if output:
+            with open(output, "a") as f:
+                for result in results:
+                    f.write(json.dumps({**run, **result}) + "\n")
@@ -0,0 +1,60 @@
+import io
+import pstats
+from collections import Counter
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarize the hottest functions across the captured request profiles "
+        "in PROFILE_DIR"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--view", help="Only profiles of this view name")
+        parser.add_argument("--limit", type=int, default=20)
+
+    def handle(self, *args, view, limit, **options):
+        root = Path(settings.PROFILE_DIR)
+        if view:
+            directories = [root / view.replace(":", ".")]
+        else:
+            directories = sorted(root.iterdir()) if root.is_dir() else []
+        prof = [p for d in directories if d.is_dir() for p in sorted(d.glob("*.prof"))]
+        collapsed = [
+            p for d in directories if d.is_dir() for p in sorted(d.glob("*.collapsed"))
+        ]
+        if not prof and not collapsed:
+            raise CommandError(f"No profiles found in {root}.")
+
+        if prof:
+            self.stdout.write(f"Sampled requests ({len(prof)} cProfile runs):")
+            report = io.StringIO()
+            stats = pstats.Stats(*map(str, prof), stream=report)
+            stats.strip_dirs().sort_stats(pstats.SortKey.TIME).print_stats(limit)
+            self.stdout.write(report.getvalue())
+
+        if collapsed:
+            # Samples in which each function was running (self) or on the stack
+            # (total), counting a recursive function once per sample
+            own, total = Counter(), Counter()
+            samples = 0
+            for path in collapsed:
+                for line in path.read_text().splitlines():
+                    stack, _, count = line.rpartition(" ")
+                    frames = stack.split(";")
+                    own[frames[-1]] += int(count)
+                    for frame in set(frames):
+                        total[frame] += int(count)
+                    samples += int(count)
+            self.stdout.write(
+                f"Slow requests ({len(collapsed)} profiles, {samples} samples):"
+            )
+            self.stdout.write(f"{'self %':>7} {'total %':>7}  function")
+            for frame, count in own.most_common(limit):
+                self.stdout.write(
+                    f"{100 * count / samples:7.1f} "
+                    f"{100 * total[frame] / samples:7.1f}  {frame}"
+                )
@@ -0,0 +1,146 @@
+import bisect
+import contextvars
+import re
+import threading
+import time
+from collections import Counter, deque
+
+# Metrics of the request being served, None outside a request
+current = contextvars.ContextVar("request_metrics", default=None)
+
+# Collapse IN (%s, %s, ...) lists so queries differing only in length match
+_PARAM_LIST = re.compile(r"\((?:%s, )*%s\)")
+
+
+def fingerprint(sql: str) -> str:
+    return _PARAM_LIST.sub("(...)", sql)
+
+
+class RequestMetrics:
+    """What one request spent its time on"""
+
+    __slots__ = ("queries", "db_time", "template_time", "context_times", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.context_times = Counter()
+        self.statements = Counter()
+
+    def record_query(self, execute, sql, params, many, context):
+        """A connection execute_wrapper timing every query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.statements[sql] += 1
+
+    def duplicates(self) -> dict[str, int]:
+        """Query fingerprints run more than once, most repeated first"""
+        fingerprints = Counter()
+        for sql, count in self.statements.items():
+            fingerprints[fingerprint(sql)] += count
+        return {sql: count for sql, count in fingerprints.most_common() if count > 1}
+
+
+def record_current(execute, sql, params, many, context):
+    """An execute_wrapper on every connection, timing queries into the
+    metrics of the request being served
+
+    Installed on the connection rather than per request, so the queries a
+    request runs in other threads (sync views under ASGI, ORM work offloaded
+    by async views) count too, as its context goes with them.
+    """
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver adding record_current to new connections"""
+    if record_current not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_current)
+
+
+class Histogram:
+    """Request latencies per view over a rolling window
+
+    Counts go into fixed latency buckets, one set per slot of `slot_seconds`,
+    and slots older than the window are dropped.
+    """
+
+    # Upper bounds of the buckets in milliseconds, the last one is unbounded
+    BOUNDS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self, slot_seconds: int = 60, slots: int = 15):
+        self.slot_seconds = slot_seconds
+        self.slots = slots
+        self._lock = threading.Lock()
+        # view name -> deque of (slot, bucket counts, queries)
+        self._views = {}
+
+    def record(self, view: str, milliseconds: float, queries: int, now=None):
+        slot = int((time.time() if now is None else now) // self.slot_seconds)
+        bucket = bisect.bisect_left(self.BOUNDS, milliseconds)
+        with self._lock:
+            history = self._views.setdefault(view, deque(maxlen=self.slots))
+            if not history or history[-1][0] != slot:
+                history.append((slot, [0] * (len(self.BOUNDS) + 1), [0]))
+            history[-1][1][bucket] += 1
+            history[-1][2][0] += queries
+
+    def snapshot(self, now=None) -> dict[str, dict]:
+        """Bucket counts and percentile estimates for every view in the window"""
+        oldest = (
+            int((time.time() if now is None else now) // self.slot_seconds)
+            - self.slots
+            + 1
+        )
+        with self._lock:
+            views = {
+                view: [
+                    (counts, queries[0])
+                    for slot, counts, queries in history
+                    if slot >= oldest
+                ]
+                for view, history in self._views.items()
+            }
+        summary = {}
+        for view, slots in views.items():
+            counts = [sum(bucket) for bucket in zip(*(c for c, _ in slots))]
+            total = sum(counts)
+            if not total:
+                continue
+            summary[view] = {
+                "requests": total,
+                "mean_queries": round(sum(q for _, q in slots) / total, 1),
+                "buckets_ms": {
+                    str(bound): count
+                    for bound, count in zip((*self.BOUNDS, "inf"), counts)
+                },
+                **{
+                    f"p{p}_ms": self._percentile(counts, total, p / 100)
+                    for p in (50, 95, 99)
+                },
+            }
+        return summary
+
+    def _percentile(self, counts, total, fraction):
+        """Upper bound of the bucket holding the percentile, None if unbounded"""
+        seen = 0
+        for bound, count in zip((*self.BOUNDS, None), counts):
+            seen += count
+            if seen >= fraction * total:
+                return bound
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+histogram = Histogram()
@@ -0,0 +1,93 @@
+import json
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpRequest
+
+from .metrics import RequestMetrics, current, histogram
+
+logger = logging.getLogger("telemetry.requests")
+
+
+class RequestMetricsMiddleware:
+    """Time each request's queries, templates and context processors
+
+    Reported in a Server-Timing header, a JSON log line per request, and the
+    per view histogram served by telemetry.views.histogram. Queries are
+    counted by the record_current wrapper every connection gets. A streamed
+    response is reported once its headers are ready, before its body runs.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self._report(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request: HttpRequest):
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self._report(request, response, metrics, time.perf_counter() - start)
+
+    def _report(
+        self, request: HttpRequest, response, metrics: RequestMetrics, total: float
+    ):
+
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        context_time = sum(metrics.context_times.values())
+        timings = [
+            ("db", metrics.db_time, f"{metrics.queries} queries"),
+            ("tpl", metrics.template_time - context_time, "templates"),
+            *(
+                (f"cp-{name}", seconds, "context processor")
+                for name, seconds in metrics.context_times.items()
+            ),
+            ("total", total, view),
+        ]
+        response["Server-Timing"] = ", ".join(
+            f'{name};dur={seconds * 1000:.1f};desc="{desc}"'
+            for name, seconds, desc in timings
+        )
+        histogram.record(view, total * 1000, metrics.queries)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                json.dumps(
+                    {
+                        "view": view,
+                        "method": request.method,
+                        "status": response.status_code,
+                        "ms": round(total * 1000, 1),
+                        "queries": metrics.queries,
+                        "db_ms": round(metrics.db_time * 1000, 1),
+                        "template_ms": round(
+                            (metrics.template_time - context_time) * 1000, 1
+                        ),
+                        "context_ms": {
+                            name: round(seconds * 1000, 1)
+                            for name, seconds in metrics.context_times.items()
+                        },
+                        "duplicates": metrics.duplicates(),
+                    }
+                )
+            )
+        return response
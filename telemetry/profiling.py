@@ -0,0 +1,221 @@
+import cProfile
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpRequest
+
+logger = logging.getLogger(__name__)
+
+
+def frame_stack(frame) -> str:
+    """A frame's call stack in collapsed form, outermost call first"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_filename}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Samples the stacks of registered threads from a background thread
+
+    Each start() collects into a counter of its own, so a thread can be
+    sampled for several requests at once, as the event loop thread is under
+    ASGI. The thread only runs while something is registered.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        # id(stacks): (thread idents, stacks)
+        self._samples = {}
+        self._thread = None
+
+    def start(self, ident: int) -> Counter:
+        """Sample the thread into the returned counter until stop()"""
+        stacks = Counter()
+        with self._lock:
+            self._samples[id(stacks)] = ([ident], stacks)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return stacks
+
+    def add(self, stacks: Counter, ident: int):
+        """Sample another thread into the same counter"""
+        with self._lock:
+            if id(stacks) in self._samples:
+                idents = self._samples[id(stacks)][0]
+                if ident not in idents:
+                    idents.append(ident)
+
+    def stop(self, stacks: Counter) -> Counter:
+        with self._lock:
+            self._samples.pop(id(stacks), None)
+        return stacks
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._samples:
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                for idents, stacks in self._samples.values():
+                    for ident in idents:
+                        frame = frames.get(ident)
+                        if frame is not None:
+                            stacks[frame_stack(frame)] += 1
+
+
+def write_profile(view: str, milliseconds: float, suffix: str, write):
+    """Write one profile under PROFILE_DIR/<view>, dropping the oldest ones
+    beyond PROFILE_KEEP, or none at all if that is 0"""
+    if settings.PROFILE_KEEP <= 0:
+        return
+    directory = Path(settings.PROFILE_DIR) / view.replace(":", ".")
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    write(directory / f"{stamp}-{milliseconds:.0f}ms{suffix}")
+    profiles = sorted(
+        p for p in directory.iterdir() if p.suffix in (".prof", ".collapsed")
+    )
+    for old in profiles[: -settings.PROFILE_KEEP]:
+        old.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """Profile a sample of requests, and any request slower than a threshold
+
+    PROFILE_SAMPLE_RATE of requests run under cProfile and are saved as
+    pstats files. With PROFILE_SLOW_MS set, every other request has its stack
+    sampled every PROFILE_INTERVAL_MS, saved in collapsed-stack form if it
+    turns out slower than the threshold. With both off, or PROFILE_KEEP 0,
+    the middleware removes itself at startup.
+
+    cProfile runs one profile at a time, and a request sampled while another
+    one runs goes unprofiled. Under ASGI a profile also covers whatever else
+    the process ran meanwhile, and a sync view is sampled in the thread it
+    runs in, which process_view is called from. Failing to profile never
+    fails the request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE
+        self.slow_ms = settings.PROFILE_SLOW_MS
+        if (not self.sample_rate and not self.slow_ms) or settings.PROFILE_KEEP <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sampler = StackSampler(settings.PROFILE_INTERVAL_MS / 1000)
+        # Held while cProfile runs, which can't run twice at once
+        self._profiling = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.sample_rate and random.random() < self.sample_rate:
+            if profiler := self._start_profile():
+                start = time.perf_counter()
+                try:
+                    return self.get_response(request)
+                finally:
+                    self._finish_profile(request, profiler, start)
+        if self.slow_ms:
+            stacks = self._start_sample(request)
+            start = time.perf_counter()
+            try:
+                return self.get_response(request)
+            finally:
+                self._finish_sample(request, stacks, start)
+        return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest):
+        if self.sample_rate and random.random() < self.sample_rate:
+            if profiler := self._start_profile():
+                start = time.perf_counter()
+                try:
+                    return await self.get_response(request)
+                finally:
+                    self._finish_profile(request, profiler, start)
+        if self.slow_ms:
+            stacks = self._start_sample(request)
+            start = time.perf_counter()
+            try:
+                return await self.get_response(request)
+            finally:
+                self._finish_sample(request, stacks, start)
+        return await self.get_response(request)
+
+    def process_view(self, request: HttpRequest, view, view_args, view_kwargs):
+        # Called from the thread a sync view runs in, which under ASGI isn't
+        # the one the request started in
+        stacks = getattr(request, "_sampled_stacks", None)
+        if stacks is not None:
+            self.sampler.add(stacks, threading.get_ident())
+
+    def _view(self, request: HttpRequest) -> str:
+        match = request.resolver_match
+        return match.view_name if match else "unresolved"
+
+    def _start_profile(self) -> cProfile.Profile | None:
+        """A running profiler, or None if one can't run now"""
+        if not self._profiling.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool, e.g. a debugger or coverage, is active
+            self._profiling.release()
+            return None
+        return profiler
+
+    def _finish_profile(
+        self, request: HttpRequest, profiler: cProfile.Profile, start: float
+    ):
+        try:
+            profiler.disable()
+            milliseconds = (time.perf_counter() - start) * 1000
+            write_profile(
+                self._view(request), milliseconds, ".prof", profiler.dump_stats
+            )
+        except Exception:
+            logger.exception("Saving the profile of %s failed", request.path)
+        finally:
+            self._profiling.release()
+
+    def _start_sample(self, request: HttpRequest) -> Counter:
+        stacks = self.sampler.start(threading.get_ident())
+        request._sampled_stacks = stacks
+        return stacks
+
+    def _finish_sample(self, request: HttpRequest, stacks: Counter, start: float):
+        self.sampler.stop(stacks)
+        milliseconds = (time.perf_counter() - start) * 1000
+        if milliseconds < self.slow_ms or not stacks:
+            return
+
+        def write(path: Path):
+            path.write_text(
+                "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+            )
+
+        try:
+            write_profile(self._view(request), milliseconds, ".collapsed", write)
+        except Exception:
+            logger.exception("Saving the stacks of %s failed", request.path)
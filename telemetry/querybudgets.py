@@ -0,0 +1,256 @@
+import uuid
+from collections.abc import Callable
+from datetime import date
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from acctmgr.models import Account
+from ledger.forms import TransactionDeleteForm
+from ledger.models import TransactionDetail, TransactionEntry
+from ledger.views import PARTIAL_HEADER
+from .metrics import RequestMetrics
+
+
+def _change_log(appends: int) -> int:
+    """Statements appending to the change log `appends` times: one each,
+    after the log's write lock on PostgreSQL"""
+    return appends * (2 if connection.vendor == "postgresql" else 1)
+
+
+def _receivers(added: bool) -> int:
+    """Statements the receivers of one entries_added (or entries_removed)
+    signal run"""
+    return (
+        # The rollups: a savepoint around reading the changed cells, inserting
+        # the missing ones and updating them
+        6
+        # The cleared balances reconciliation keeps
+        + 1
+        # The version counters conditional requests read
+        + 1
+        # The search index, where SQLite's FTS5 table can't upsert an added
+        # transaction's row, so deletes it first
+        + (2 if added and connection.vendor == "sqlite" else 1)
+        + _change_log(1)
+    )
+
+
+def query_budgets() -> dict[str, int]:
+    """Most queries each view or ledger operation may run on this database
+
+    Counted for the scenarios in check_query_budgets (transactions have three
+    splits), including transaction statements. None of them may grow with the
+    size of the ledger, so these hold from a ten account fixture up to a
+    generated ledger of millions of entries. The test suite checks the
+    counts are exact, so a new statement has to be itemized here.
+    """
+    # A savepoint and its release, for each atomic block
+    atomic = 2
+    # Validating a three split transaction: its accounts, and the closed
+    # periods and the date of a transaction being edited
+    transaction_form = 3 + 2
+    # Validating a transaction to delete: it, and the closed periods
+    delete_form = 2
+    # The partial response's cleared balance
+    partial = 1
+    # The closed periods, the insert and reading back the entries for the
+    # signal
+    create_balanced = atomic + 3 + _receivers(added=True)
+    return {
+        "acctmgr.views.index": (
+            # Editing a transaction: the version counters, the account, the
+            # transaction and its entries, the register and closed periods,
+            # and the form's account choices
+            7 + delete_form
+        ),
+        "acctmgr.views.account_editor": (
+            # The account, and the form's currency and parent choices and
+            # references
+            1
+            + 5
+            + atomic
+            # Saving validates the references again, then updates the row
+            + 2
+            + 1
+            # The account tree's version and the change log
+            + 1
+            + _change_log(1)
+        ),
+        "ledger.views.xact_create": (
+            # Editing: locking the transaction, removing its entries and
+            # updating it
+            transaction_form
+            + atomic
+            + 1
+            + _receivers(added=False)
+            + 2
+            + _change_log(1)
+            + create_balanced
+            + partial
+        ),
+        "ledger.views.xact_delete": (
+            delete_form
+            + atomic
+            # The closed periods again, and the ids of the transactions
+            + 2
+            + _receivers(added=False)
+            # Logging the transactions, then deleting them and their entries
+            + _change_log(1)
+            + 2
+            + partial
+        ),
+        # Plus the currencies of entries built without them
+        "ledger.models.TransactionManager.create_balanced_transaction": (
+            create_balanced + 1
+        ),
+    }
+
+
+def _count(run: Callable[[], object]) -> RequestMetrics:
+    metrics = RequestMetrics()
+    with connection.execute_wrapper(metrics.record_query):
+        run()
+    return metrics
+
+
+def check_query_budgets(throwaway: bool = False) -> list[dict]:
+    """Exercise every budgeted view and operation against the ledger in the
+    database, leaving it as it was found
+
+    Posts, edits and deletes transactions and saves an account on the way,
+    so as with run_benchmarks, pass throwaway to confirm the database is a
+    copy made for it.
+
+    Returns one result per budget, the worst of its scenarios:
+    {"name": str, "budget": int, "queries": int, "duplicates": {sql: count}}
+
+    Raises:
+    ValueError -- The database wasn't confirmed throwaway, or the ledger is
+    too small to exercise
+    """
+    if not throwaway:
+        raise ValueError(
+            "Checking the query budgets writes to the database. Run it against "
+            "a throwaway one, e.g. made by generate_ledger, and confirm with "
+            "--throwaway."
+        )
+    busiest = (
+        TransactionEntry.objects.values("account_id")
+        .annotate(entries=Count("pk"))
+        .order_by("-entries")
+        .first()
+    )
+    if busiest is None:
+        raise ValueError("The ledger is empty, generate one first.")
+    account = Account.objects.get(pk=busiest["account_id"])
+    other = (
+        Account.objects.filter(placeholder=False, currency=account.currency)
+        .exclude(pk=account.pk)
+        .first()
+    )
+    if other is None:
+        raise ValueError("Two accounts in the same currency are required.")
+    existing = TransactionEntry.objects.filter(account=account).latest("pk")
+    host = next(
+        (h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")),
+        "localhost",
+    )
+    client = Client(HTTP_HOST=host)
+    PARTIAL = {PARTIAL_HEADER: "register"}
+    token = f"query budget {uuid.uuid4().hex[:8]}"
+    transaction_data = {
+        "date": date.today().isoformat(),
+        "description": token,
+        "amount_1": "1.00",
+        "account_1": account.pk,
+        "amount_2": "-0.50",
+        "account_2": other.pk,
+        "amount_3": "-0.50",
+        "account_3": other.pk,
+        "selected_account": account.pk,
+    }
+
+    def posted() -> int:
+        return (
+            TransactionDetail.objects.filter(description=token)
+            .values_list("pk", flat=True)
+            .latest("pk")
+        )
+
+    # Each scenario yields the calls to count; the code between them sets up
+    # and cleans up without being counted
+    def index():
+        yield lambda: client.get(reverse("acctmgr:account-view", args=[account.pk]))
+        edit_url = reverse(
+            "acctmgr:edit-xact-view", args=[account.pk, existing.transaction_id_id]
+        )
+        yield lambda: client.get(edit_url)
+
+    def account_editor():
+        url = reverse("acctmgr:account-editor", args=[account.pk])
+        yield lambda: client.get(url)
+        data = {
+            "name": account.name,
+            "currency": account.currency_id,
+            "acct_type": account.acct_type,
+            "description": account.description,
+            "parent": account.parent_id or "",
+            "placeholder": "",
+        }
+        yield lambda: client.post(url, data)
+
+    def xact_create():
+        url = reverse("ledger:xact-create")
+        yield lambda: client.post(url, transaction_data)
+        edit = {**transaction_data, "selected_transaction": posted()}
+        yield lambda: client.post(url, edit)
+        # The same, answered with the changed register rows
+        yield lambda: client.post(url, transaction_data, headers=PARTIAL)
+        edit = {**transaction_data, "selected_transaction": posted()}
+        yield lambda: client.post(url, edit, headers=PARTIAL)
+
+    def xact_delete():
+        data = {"transaction": posted()}
+        yield lambda: client.post(reverse("ledger:xact-delete"), data)
+        data = {"transaction": posted(), "redirect_account": account.pk}
+        yield lambda: client.post(reverse("ledger:xact-delete"), data, headers=PARTIAL)
+
+    def create_balanced_transaction():
+        detail = TransactionDetail.objects.create(description=token)
+        entries = [
+            TransactionEntry(transaction_id=detail, account=account, amount=2),
+            TransactionEntry(transaction_id=detail, account=other, amount=-1),
+            TransactionEntry(transaction_id=detail, account=other, amount=-1),
+        ]
+        yield lambda: TransactionEntry.objects.create_balanced_transaction(entries)
+        form = TransactionDeleteForm({"transaction": detail.pk})
+        if form.is_valid():
+            form.save()
+
+    budgets = query_budgets()
+    scenarios = {
+        "acctmgr.views.index": index,
+        "acctmgr.views.account_editor": account_editor,
+        "ledger.views.xact_create": xact_create,
+        "ledger.views.xact_delete": xact_delete,
+        "ledger.models.TransactionManager.create_balanced_transaction": (
+            create_balanced_transaction
+        ),
+    }
+    results = []
+    for name, scenario in scenarios.items():
+        worst = max(
+            (_count(run) for run in scenario()), key=lambda metrics: metrics.queries
+        )
+        results.append(
+            {
+                "name": name,
+                "budget": budgets[name],
+                "queries": worst.queries,
+                "duplicates": worst.duplicates(),
+            }
+        )
+    return results
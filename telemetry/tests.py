@@ -0,0 +1,290 @@
+import cProfile
+import io
+import json
+import logging
+import pytest
+import threading
+import time
+from collections import Counter
+from asgiref.sync import async_to_sync
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import AsyncClient, Client
+from django.shortcuts import reverse
+
+from ledger.generate import generate_ledger
+from ledger.models import TransactionEntry
+from .benchmarks import run_benchmarks
+from .metrics import Histogram, fingerprint, histogram
+from .loadtest import run_load_test
+from .querybudgets import check_query_budgets
+from .profiling import ProfilingMiddleware, StackSampler, write_profile
+
+
+def test_fingerprint_collapses_in_lists():
+    assert fingerprint('SELECT 1 FROM "a" WHERE "id" IN (%s, %s, %s)') == (
+        'SELECT 1 FROM "a" WHERE "id" IN (...)'
+    )
+    assert fingerprint('WHERE "id" IN (%s)') == 'WHERE "id" IN (...)'
+
+
+def test_histogram_rolls_over():
+    h = Histogram(slot_seconds=60, slots=2)
+    h.record("view", 3, 1, now=0)
+    h.record("view", 40, 3, now=61)
+    assert h.snapshot(now=61)["view"]["requests"] == 2
+    assert h.snapshot(now=61)["view"]["mean_queries"] == 2
+    assert h.snapshot(now=61)["view"]["p50_ms"] == 5
+    assert h.snapshot(now=61)["view"]["p99_ms"] == 50
+    # The first slot fell out of the window
+    assert h.snapshot(now=130)["view"]["requests"] == 1
+
+
+@pytest.mark.django_db
+def test_request_metrics(setup_example_accounts, caplog):
+    histogram.clear()
+    with caplog.at_level(logging.INFO, logger="telemetry.requests"):
+        res = Client().get(reverse("acctmgr:account-index"))
+    timing = res["Server-Timing"]
+    assert "db;dur=" in timing
+    assert "tpl;dur=" in timing
+    assert "cp-account_context;dur=" in timing
+    assert 'desc="acctmgr:account-index"' in timing
+
+    line = json.loads(caplog.records[-1].getMessage())
+    assert line["view"] == "acctmgr:account-index"
+    assert line["queries"] > 0
+    assert "account_context" in line["context_ms"]
+
+    res = Client().get(reverse("telemetry:histogram"))
+    assert res.json()["views"]["acctmgr:account-index"]["requests"] == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_request_metrics_async(setup_example_accounts, caplog):
+    # Queries offloaded by an async view to the ORM threads still count
+    with caplog.at_level(logging.INFO, logger="telemetry.requests"):
+        res = async_to_sync(AsyncClient().get)(reverse("budgetmgr:budget-report"))
+    assert res.status_code == 200
+    assert 'desc="budgetmgr:budget-report"' in res["Server-Timing"]
+    line = json.loads(caplog.records[-1].getMessage())
+    assert line["view"] == "budgetmgr:budget-report"
+    assert line["queries"] > 0
+    assert line["template_ms"] > 0
+
+
+@pytest.mark.django_db
+def test_histogram_is_local_only():
+    res = Client(REMOTE_ADDR="192.0.2.1").get(reverse("telemetry:histogram"))
+    assert res.status_code == 404
+
+
+def test_profiling_off_by_default(tmp_path, settings):
+    with pytest.raises(MiddlewareNotUsed):
+        ProfilingMiddleware(lambda request: None)
+    # and when no profile would be kept
+    settings.PROFILE_SAMPLE_RATE = 1
+    settings.PROFILE_KEEP = 0
+    with pytest.raises(MiddlewareNotUsed):
+        ProfilingMiddleware(lambda request: None)
+    settings.PROFILE_DIR = tmp_path
+    write_profile("ledger:xact-create", 600, ".prof", lambda path: path.touch())
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.django_db
+def test_sampled_request_profiled(setup_example_accounts, tmp_path, settings):
+    settings.PROFILE_SAMPLE_RATE = 1
+    settings.PROFILE_DIR = tmp_path
+    Client().get(reverse("acctmgr:account-index"))
+    assert len(list((tmp_path / "acctmgr.account-index").glob("*.prof"))) == 1
+
+    out = io.StringIO()
+    call_command("profile_summary", "--view", "acctmgr:account-index", stdout=out)
+    assert "1 cProfile runs" in out.getvalue()
+    assert "function calls" in out.getvalue()
+
+
+class BusyProfile(cProfile.Profile):
+    def enable(self, *args, **kwargs):
+        raise ValueError("Another profiling tool is already active")
+
+
+def test_profiling_never_fails_requests(tmp_path, settings, monkeypatch, rf):
+    settings.PROFILE_SAMPLE_RATE = 1
+    settings.PROFILE_DIR = tmp_path
+    response = HttpResponse()
+    middleware = ProfilingMiddleware(lambda request: response)
+    # One profile runs at a time, a request sampled meanwhile goes unprofiled
+    with middleware._profiling:
+        assert middleware(rf.get("/")) is response
+    # as does one sampled while another tool profiles
+    monkeypatch.setattr(cProfile, "Profile", BusyProfile)
+    assert middleware(rf.get("/")) is response
+    assert list(tmp_path.iterdir()) == []
+    monkeypatch.undo()
+    # and failing to save the profile is only logged
+    settings.PROFILE_DIR = tmp_path / "not a directory"
+    settings.PROFILE_DIR.write_text("")
+    assert middleware(rf.get("/")) is response
+    assert not middleware._profiling.locked()
+
+
+def test_slow_requests_sampled(tmp_path, settings, rf, caplog):
+    settings.PROFILE_SLOW_MS = 20
+    settings.PROFILE_DIR = tmp_path
+    settings.PROFILE_INTERVAL_MS = 1
+    response = HttpResponse()
+
+    def slow(request):
+        time.sleep(0.05)
+        return response
+
+    assert ProfilingMiddleware(slow)(rf.get("/")) is response
+    [saved] = (tmp_path / "unresolved").glob("*.collapsed")
+    assert "telemetry/tests.py:slow" in saved.read_text()
+    # Faster requests are left out
+    assert ProfilingMiddleware(lambda request: response)(rf.get("/")) is response
+    assert len(list((tmp_path / "unresolved").iterdir())) == 1
+    # and failing to save the stacks is only logged
+    settings.PROFILE_DIR = tmp_path / "not a directory"
+    settings.PROFILE_DIR.write_text("")
+    with caplog.at_level(logging.ERROR, logger="telemetry.profiling"):
+        assert ProfilingMiddleware(slow)(rf.get("/")) is response
+    assert "Saving the stacks of / failed" in caplog.text
+
+
+def test_async_request_unprofiled_while_busy(tmp_path, settings, rf):
+    settings.PROFILE_SAMPLE_RATE = 1
+    settings.PROFILE_DIR = tmp_path
+    response = HttpResponse()
+
+    async def view(request):
+        return response
+
+    middleware = ProfilingMiddleware(view)
+    with middleware._profiling:
+        assert async_to_sync(middleware)(rf.get("/")) is response
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.django_db
+def test_profiling_under_asgi(setup_example_accounts, tmp_path, settings, monkeypatch):
+    settings.PROFILE_SAMPLE_RATE = 1
+    settings.PROFILE_DIR = tmp_path
+    res = async_to_sync(AsyncClient().get)(reverse("acctmgr:account-index"))
+    assert res.status_code == 200
+    assert len(list((tmp_path / "acctmgr.account-index").glob("*.prof"))) == 1
+
+    settings.PROFILE_SAMPLE_RATE = 0
+    settings.PROFILE_SLOW_MS = 1
+    sampled = []
+    monkeypatch.setattr(
+        StackSampler, "start", lambda self, ident: sampled.append(ident) or Counter()
+    )
+    monkeypatch.setattr(
+        StackSampler, "add", lambda self, stacks, ident: sampled.append(ident)
+    )
+    res = async_to_sync(AsyncClient().get)(reverse("acctmgr:account-index"))
+    assert res.status_code == 200
+    # The event loop's thread, and the one the sync view ran in (this one,
+    # which async_to_sync was called from)
+    assert len(sampled) == 2
+    assert sampled[1] == threading.get_ident() != sampled[0]
+
+
+def test_stack_sampler_and_rotation(tmp_path, settings):
+    settings.PROFILE_DIR = tmp_path
+    settings.PROFILE_KEEP = 2
+    sampler = StackSampler(0.001)
+    stacks = sampler.start(threading.get_ident())
+    time.sleep(0.05)
+    assert sampler.stop(stacks) is stacks
+    assert any("test_stack_sampler_and_rotation" in stack for stack in stacks)
+
+    # Another thread sampled into the same counter, until it stops
+    done = threading.Event()
+    other = threading.Thread(target=done.wait)
+    other.start()
+    stacks = sampler.start(threading.get_ident())
+    sampler.add(stacks, other.ident)
+    sampler.add(stacks, other.ident)
+    time.sleep(0.05)
+    sampler.stop(stacks)
+    sampler.add(stacks, other.ident)
+    done.set()
+    other.join()
+    assert any("threading.py:wait" in stack for stack in stacks)
+
+    def write(path):
+        path.write_text("".join(f"{s} {c}\n" for s, c in stacks.items()))
+
+    for _ in range(3):
+        write_profile("ledger:xact-create", 600, ".collapsed", write)
+    assert len(list((tmp_path / "ledger.xact-create").iterdir())) == 2
+
+    out = io.StringIO()
+    call_command("profile_summary", stdout=out)
+    assert "Slow requests (2 profiles" in out.getvalue()
+    assert "time.sleep" not in out.getvalue()  # C functions aren't frames
+    assert "test_stack_sampler_and_rotation" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_benchmarks_leave_the_ledger_as_found():
+    generate_ledger(accounts=20, years=1, entries_per_day=5)
+    entries = TransactionEntry.objects.count()
+    with pytest.raises(ValueError, match="throwaway"):
+        run_benchmarks(runs=2)
+    results = run_benchmarks(runs=2, throwaway=True)
+    assert [result["case"] for result in results] == [
+        "account_page",
+        "sidebar",
+        "cached_sidebar",
+        "post",
+        "edit",
+        "delete",
+        "balances",
+        "rollup_balances",
+    ]
+    queries = {result["case"]: result["max_queries"] for result in results}
+    # Just the account tree's version
+    assert queries.pop("cached_sidebar") == 1
+    assert all(count > 0 for count in queries.values())
+    assert TransactionEntry.objects.count() == entries
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test_covers_both_servers():
+    generate_ledger(accounts=20, years=1, entries_per_day=5)
+    results = run_load_test(
+        seconds=0.5, workers=2, interactive_clients=1, report_clients=1
+    )
+    assert [(result["server"], result["traffic"]) for result in results] == [
+        ("wsgi", "interactive"),
+        ("wsgi", "report"),
+        ("asgi", "interactive"),
+        ("asgi", "report"),
+    ]
+    assert all(result["requests"] > 0 for result in results)
+
+
+@pytest.mark.django_db
+def test_query_budgets():
+    generate_ledger(accounts=50, years=1, entries_per_day=20)
+    entries = TransactionEntry.objects.count()
+    with pytest.raises(ValueError, match="throwaway"):
+        check_query_budgets()
+    # Exact, so a statement added to any of them has to be itemized in
+    # query_budgets()
+    for result in check_query_budgets(throwaway=True):
+        assert result["queries"] == result["budget"], result
+    assert TransactionEntry.objects.count() == entries
+
+    with pytest.raises(CommandError, match="throwaway"):
+        call_command("check_query_budgets")
+    out = io.StringIO()
+    call_command("check_query_budgets", "--throwaway", stdout=out)
+    assert [line.split()[0] for line in out.getvalue().splitlines()] == ["ok"] * 5
+    assert TransactionEntry.objects.count() == entries
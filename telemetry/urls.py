@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import views
+
+app_name = "telemetry"
+urlpatterns = [
+    path("histogram", views.request_histogram, name="histogram"),
+]
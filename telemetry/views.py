@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.http import Http404, HttpRequest, JsonResponse
+
+from .metrics import histogram
+
+
+def request_histogram(request: HttpRequest):
+    """Rolling latency histogram per view, only served to INTERNAL_IPS"""
+    if request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS:
+        raise Http404
+    return JsonResponse(
+        {
+            "window_seconds": histogram.slot_seconds * histogram.slots,
+            "views": histogram.snapshot(),
+        }
+    )